@@ -1,2 +1,3 @@
 # infortisa_orders/__init__.py
+from . import controllers
 from . import models
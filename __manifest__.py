@@ -1,7 +1,7 @@
 {
     "name": "Infortisa Orders",
     "summary": "Envío de pedidos a Infortisa, tracking de estado y factura proveedor por API",
-    "version": "18.0.7.7",
+    "version": "18.0.8.0",
     "author": "Nexus Antonio",
     "website": "",
     "category": "Sales",
@@ -20,8 +20,19 @@
         "security/ir.model.access.csv",
         "views/sale_order_views.xml",
         "data/ir_cron.xml",
+        "data/infortisa_data.xml",
+        "data/mail_template.xml",
         "views/res_config_settings_views.xml",
 	"views/raw_wizard_views.xml",   # <-- añade esta línea
+        "views/send_queue_views.xml",
+        "views/api_log_views.xml",
+        "views/send_wizard_views.xml",
+        "views/account_batch_payment_views.xml",
+        "views/account_move_views.xml",
+        "views/tracking_outbox_views.xml",
+        "views/order_trace_views.xml",
+        "views/api_circuit_views.xml",
+        "views/status_inbox_views.xml",
     ],
 }
 
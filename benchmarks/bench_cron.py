@@ -0,0 +1,155 @@
+"""Benchmark del cron de estado y de ``action_confirm`` contra el mock local.
+
+Se ejecuta dentro de ``odoo-bin shell`` (necesita ``env``) con el módulo
+instalado y ``benchmarks/mock_infortisa.py`` arrancado::
+
+    python3 benchmarks/mock_infortisa.py --port 8077 --auto-create &
+    BENCH_SIZES=1000,10000,50000 BENCH_CONFIRMS=200 \\
+        odoo-bin shell -d <bd> --no-http < benchmarks/bench_cron.py
+
+Variables de entorno:
+
+- ``BENCH_MOCK_URL``: URL del mock (``http://127.0.0.1:8077``).
+- ``BENCH_SIZES``: pedidos vivos a sembrar por escenario (``1000,10000,50000``).
+- ``BENCH_CONFIRMS``: pedidos borrador a confirmar para medir ``action_confirm`` (``200``).
+- ``BENCH_JSON=1``: una línea JSON por resultado.
+
+Todo ocurre en una transacción que se deshace al final (los crons no hacen
+commit porque el hilo se marca como ``testing``), así que la base de datos
+queda como estaba.
+"""
+import json
+import os
+import statistics
+import threading
+import time
+
+if "env" not in globals():
+    raise SystemExit("Ejecutar con: odoo-bin shell -d <bd> --no-http < benchmarks/bench_cron.py")
+
+MOCK_URL = os.environ.get("BENCH_MOCK_URL", "http://127.0.0.1:8077")
+SIZES = [int(x) for x in os.environ.get("BENCH_SIZES", "1000,10000,50000").split(",") if x.strip()]
+CONFIRMS = int(os.environ.get("BENCH_CONFIRMS", "200"))
+AS_JSON = os.environ.get("BENCH_JSON") == "1"
+SEED_BATCH = 1000
+
+
+def _report(name, **values):
+    if AS_JSON:
+        print(json.dumps(dict(bench=name, **values)), flush=True)
+    else:
+        print(f"{name:28s} " + "  ".join(f"{k}={v}" for k, v in values.items()), flush=True)
+
+
+def _pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def _setup(env):
+    ICP = env["ir.config_parameter"].sudo()
+    ICP.set_param("infortisa.base_url", MOCK_URL)
+    if not ICP.get_param("infortisa.api_key"):
+        ICP.set_param("infortisa.api_key", "bench")
+    ICP.set_param("infortisa.auto_create_bill", "False")
+    env.registry.clear_cache()
+
+    vendor = env["res.partner"].create({"name": "Infortisa (bench)", "is_company": True})
+    ICP.set_param("infortisa.vendor_id", str(vendor.id))
+    env.registry.clear_cache()
+    product = env["product.product"].create({
+        "name": "Producto Infortisa (bench)",
+        "default_code": "INF-BENCH-1",
+        "type": "consu",
+        "list_price": 10.0,
+        "seller_ids": [(0, 0, {"partner_id": vendor.id, "price": 7.0})],
+    })
+    customer = env["res.partner"].create({
+        "name": "Cliente bench", "street": "Calle 1", "zip": "28001", "city": "Madrid",
+        "country_id": env.ref("base.es").id, "email": "bench@example.com",
+    })
+    return product, customer
+
+
+def _seed_live_orders(env, customer, count):
+    """Pedidos ya enviados y vencidos para el cron (sin líneas: el cron sólo consulta estado)."""
+    Order = env["sale.order"]
+    ids = []
+    for start in range(0, count, SEED_BATCH):
+        n = min(SEED_BATCH, count - start)
+        ids += Order.create([{"partner_id": customer.id} for _i in range(n)]).ids
+    env.flush_all()
+    env.cr.execute(
+        """
+        UPDATE sale_order
+           SET infortisa_sent = TRUE, infortisa_allowed = TRUE, state = 'sale',
+               infortisa_customer_ref = 'BENCH' || id, infortisa_poll_tier = 'fast',
+               infortisa_next_poll_at = (now() at time zone 'UTC') - interval '1 minute'
+         WHERE id = ANY(%s)
+        """,
+        (ids,),
+    )
+    env.invalidate_all()
+    return Order.browse(ids)
+
+
+def bench_cron(env, customer, size):
+    orders = _seed_live_orders(env, customer, size)
+    ICP = env["ir.config_parameter"].sudo()
+    ICP.set_param("infortisa.poll_batch_limit", str(size))
+    ICP.set_param("infortisa.poll_time_budget", "3600")
+    env.registry.clear_cache()
+    Order = env["sale.order"].with_context(infortisa_from_cron=True)
+
+    started = time.monotonic()
+    runs = 0
+    while runs < 100:
+        runs += 1
+        Order.cron_infortisa_poll_status()
+        env.flush_all()
+        if not Order.search_count([("id", "in", orders.ids)] + Order._infortisa_due_poll_domain()):
+            break
+    elapsed = time.monotonic() - started
+    _report(
+        f"cron_poll_status[{size}]",
+        orders=size, runs=runs, seconds=round(elapsed, 2), orders_per_s=round(size / elapsed, 1),
+    )
+
+
+def bench_confirm(env, product, customer, count):
+    Order = env["sale.order"]
+    drafts = Order.create([{
+        "partner_id": customer.id,
+        "order_line": [(0, 0, {"product_id": product.id, "product_uom_qty": 1})],
+    } for _i in range(count)])
+    env.flush_all()
+    samples = []
+    for order in drafts:
+        t0 = time.perf_counter()
+        order.action_confirm()
+        env.flush_all()
+        samples.append((time.perf_counter() - t0) * 1000)
+    _report(
+        "action_confirm",
+        orders=count,
+        p50_ms=round(statistics.median(samples), 2),
+        p99_ms=round(_pct(samples, 0.99), 2),
+        mean_ms=round(statistics.fmean(samples), 2),
+    )
+
+
+def run(env):
+    threading.current_thread().testing = True  # sin commits: todo se deshace al final
+    try:
+        product, customer = _setup(env)
+        if CONFIRMS:
+            bench_confirm(env, product, customer, CONFIRMS)
+        for size in SIZES:
+            bench_cron(env, customer, size)
+    finally:
+        env.cr.rollback()
+        env.registry.clear_cache()
+        threading.current_thread().testing = False
+
+
+run(env)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Micro-benchmark del parser de OrderStatusResponse.
+
+Uso (no necesita Odoo)::
+
+    python3 benchmarks/bench_parser.py [--repeat 200] [--json]
+
+Mide el tiempo de ``parse_order_status`` por respuesta para cada fixture de
+``benchmarks/fixtures``. Con ``--json`` imprime una línea JSON por fixture
+para poder guardar y comparar resultados entre versiones.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+PARSER_PATH = os.path.join(HERE, os.pardir, "models", "infortisa_parser.py")
+
+
+def _load_parser():
+    # Carga directa del fichero: importar el paquete del módulo arrastraría Odoo
+    spec = importlib.util.spec_from_file_location("infortisa_parser", PARSER_PATH)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _bench(fn, body, repeat):
+    samples = []
+    for _i in range(repeat):
+        t0 = time.perf_counter()
+        try:
+            fn(body)
+        except ValueError:
+            pass  # malformado: también se mide el camino de error
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return {
+        "p50_us": statistics.median(samples) * 1e6,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+        "mean_us": statistics.fmean(samples) * 1e6,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="una línea JSON por fixture")
+    args = parser.parse_args(argv)
+
+    mod = _load_parser()
+    for name in sorted(os.listdir(FIXTURES)):
+        with open(os.path.join(FIXTURES, name), encoding="utf-8") as fh:
+            body = fh.read()
+        try:
+            st = mod.parse_order_status(body)
+            summary = f"state={st.state!r} products={len(st.products)}"
+        except mod.InfortisaParseError as e:
+            summary = f"parse error: {e}"
+        res = _bench(mod.parse_order_status, body, args.repeat)
+        if args.json:
+            print(json.dumps(dict(fixture=name, bytes=len(body), **res)))
+        else:
+            print(f"{name:32s} {len(body):>8d} B  p50 {res['p50_us']:9.1f} us  "
+                  f"p99 {res['p99_us']:9.1f} us  ({summary})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Servidor local que imita la API de Infortisa para pruebas y benchmarks.
+
+Uso (no necesita Odoo)::
+
+    python3 benchmarks/mock_infortisa.py [--port 8077] [--latency-ms 80] [--jitter-ms 40]
+                                         [--error-rate 0.01] [--malformed-rate 0.005]
+                                         [--stage-seconds 60] [--auto-create]
+
+y en Ajustes > Infortisa poner *URL base de la API* = ``http://127.0.0.1:8077``.
+
+Atiende ``POST /api/order/create``, ``GET /api/order/status`` y
+``POST /api/order/blockorder``. Las respuestas de estado se generan a partir
+de ``benchmarks/fixtures`` y avanzan con el tiempo: importando, pendiente de
+transferencia (``VR/``) y en transporte con tracking, una etapa cada
+``--stage-seconds``. Como la API real, la consulta de un pedido que no se ha
+creado aquí responde HTTP 404; con ``--auto-create`` empieza su ciclo en la
+primera consulta (para pedidos sembrados directamente en la base de datos,
+como en ``bench_cron.py``). ``--error-rate`` devuelve HTTP 503 y
+``--malformed-rate`` XML truncado.
+"""
+import argparse
+import itertools
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+
+STAGES = ("status_importing.xml", "status_pending_transfer.xml", "status_in_transit.xml")
+_CUSTOMER_REF_RE = re.compile(r"<CustomerReference>(.*?)</CustomerReference>", re.S)
+
+
+def _load(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as fh:
+        return fh.read()
+
+
+class MockState:
+    """Pedidos conocidos: CustomerReference -> (ref. interna, instante de creación)."""
+
+    def __init__(self, stage_seconds, auto_create=False):
+        self.stage_seconds = stage_seconds
+        self.auto_create = auto_create
+        self.templates = [_load(name) for name in STAGES]
+        self.orders = {}
+        self.lock = threading.Lock()
+        self.seq = itertools.count(1)
+
+    def create(self, customer_ref):
+        with self.lock:
+            if customer_ref not in self.orders:
+                self.orders[customer_ref] = ("EXT%07d" % next(self.seq), time.time())
+            return self.orders[customer_ref][0]
+
+    def status_body(self, customer_ref):
+        """Respuesta de /api/order/status, o None si el pedido no se ha creado (y no hay ``auto_create``)."""
+        if self.auto_create:
+            self.create(customer_ref)
+        elif customer_ref not in self.orders:
+            return None
+        created = self.orders[customer_ref][1]
+        stage = min(int((time.time() - created) / max(self.stage_seconds, 0.001)), len(self.templates) - 1)
+        return self.stage_body(customer_ref, stage)
+
+    def stage_body(self, customer_ref, stage):
+        """Respuesta de estado del pedido en la etapa ``stage`` (índice de ``STAGES``)."""
+        internal_ref = self.create(customer_ref)
+        num = internal_ref[3:]
+        return (
+            self.templates[stage]
+            .replace("EXT1234567", internal_ref)
+            .replace("000123", num[-6:])
+            .replace("SE123456789ES", "SE%sES" % num)
+        )
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "MockInfortisa/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive, como la API real
+
+    def log_message(self, fmt, *args):
+        if self.server.opts.verbose:
+            super().log_message(fmt, *args)
+
+    def _delay_and_fault(self):
+        """Simula latencia y errores. Devuelve True si ya se respondió con un error."""
+        opts = self.server.opts
+        latency = max(0.0, random.gauss(opts.latency_ms, opts.jitter_ms)) / 1000.0
+        if latency:
+            time.sleep(latency)
+        if opts.error_rate and random.random() < opts.error_rate:
+            self._reply(503, "Service Unavailable\n", "text/plain")
+            return True
+        return False
+
+    def _reply(self, status, body, content_type="text/xml; charset=utf-8"):
+        data = body.encode("utf-8")
+        if status == 200 and self.server.opts.malformed_rate and random.random() < self.server.opts.malformed_rate:
+            data = data[: max(1, len(data) // 2)]
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        for enc in ("utf-16", "utf-8"):
+            try:
+                return raw.decode(enc)
+            except UnicodeDecodeError:
+                continue
+        return raw.decode("latin-1")
+
+    def _authorized(self):
+        if self.headers.get("Authorization-Token"):
+            return True
+        self._reply(401, "Missing Authorization-Token\n", "text/plain")
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/api/order/status":
+            return self._reply(404, "Not found\n", "text/plain")
+        if not self._authorized() or self._delay_and_fault():
+            return
+        ref = (parse_qs(url.query).get("CustomerReference") or [""])[0]
+        if not ref:
+            return self._reply(400, "CustomerReference requerido\n", "text/plain")
+        body = self.server.state.status_body(ref)
+        if body is None:
+            return self._reply(404, "Order not found\n", "text/plain")
+        self._reply(200, body)
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path not in ("/api/order/create", "/api/order/blockorder"):
+            return self._reply(404, "Not found\n", "text/plain")
+        body = self._read_body()
+        if not self._authorized() or self._delay_and_fault():
+            return
+        m = _CUSTOMER_REF_RE.search(body)
+        ref = (m.group(1).strip() if m else "")
+        if not ref:
+            return self._reply(200, '<?xml version="1.0" encoding="utf-8"?>\n'
+                                    "<OrderResponse><HasErrors>true</HasErrors>"
+                                    "<Errors>CustomerReference vacío</Errors></OrderResponse>")
+        if path.endswith("create"):
+            internal_ref = self.server.state.create(ref)
+            return self._reply(200, '<?xml version="1.0" encoding="utf-8"?>\n'
+                                    "<OrderResponse><HasErrors>false</HasErrors>"
+                                    f"<InternalReference>{internal_ref}</InternalReference>"
+                                    f"<DeliveryComment>Pedido web {internal_ref}</DeliveryComment>"
+                                    "</OrderResponse>")
+        self._reply(200, '<?xml version="1.0" encoding="utf-8"?>\n'
+                         "<BlockOrderResponse><HasErrors>false</HasErrors></BlockOrderResponse>")
+
+
+def make_server(host="127.0.0.1", port=8077, **opts):
+    """Servidor listo para ``serve_forever()`` (útil para lanzarlo en un hilo desde otros scripts)."""
+    defaults = dict(latency_ms=80.0, jitter_ms=40.0, error_rate=0.0, malformed_rate=0.0,
+                    stage_seconds=60.0, auto_create=False, verbose=False)
+    defaults.update(opts)
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.opts = argparse.Namespace(**defaults)
+    server.state = MockState(defaults["stage_seconds"], auto_create=defaults["auto_create"])
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8077)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="latencia media por petición")
+    parser.add_argument("--jitter-ms", type=float, default=40.0, help="desviación típica de la latencia")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de respuestas HTTP 503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fracción de respuestas con XML truncado")
+    parser.add_argument("--stage-seconds", type=float, default=60.0, help="segundos por etapa del pedido")
+    parser.add_argument("--auto-create", action="store_true",
+                        help="consultar un pedido no creado aquí lo crea (en vez de HTTP 404)")
+    parser.add_argument("--verbose", action="store_true", help="registrar cada petición")
+    args = parser.parse_args(argv)
+
+    opts = {k: v for k, v in vars(args).items() if k not in ("host", "port")}
+    server = make_server(args.host, args.port, **opts)
+    print(f"Mock Infortisa en http://{args.host}:{args.port} "
+          f"(latencia {args.latency_ms}±{args.jitter_ms} ms, errores {args.error_rate:.1%}, "
+          f"malformados {args.malformed_rate:.1%})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
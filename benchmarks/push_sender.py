@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Emisor local de notificaciones de estado que hace de Infortisa contra ``/infortisa/status``.
+
+Uso (no necesita Odoo en este proceso)::
+
+    python3 benchmarks/push_sender.py --url http://127.0.0.1:8069/infortisa/status \\
+        --token <infortisa.push_token> [--db <bd>] --ref S00012 --ref S00013 \\
+        [--stages 0,1,2] [--interval 2] [--concurrency 8] [--repeat 1]
+
+Cada ``--ref`` (o cada línea de ``--refs-file``) es la CustomerReference de un
+pedido ya enviado. Para cada pedido envía, en orden, las respuestas de estado
+de ``benchmarks/fixtures`` (las mismas etapas que ``mock_infortisa.py``:
+0 importando, 1 pendiente de transferencia, 2 en transporte con tracking),
+esperando ``--interval`` segundos entre etapas. ``--repeat`` manda cada
+notificación varias veces, como un emisor que reintenta. Al final muestra los
+códigos HTTP recibidos y la latencia p50/p99 del endpoint.
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from mock_infortisa import STAGES, MockState
+
+
+def _pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def send(url, token, customer_ref, body, db=None, timeout=30):
+    """POST de una notificación. Devuelve ``(http_status, latencia_ms)``; 0 si no hubo respuesta."""
+    params = {"CustomerReference": customer_ref}
+    if db:
+        params["db"] = db
+    req = Request(
+        "%s?%s" % (url, urlencode(params)),
+        data=body.encode("utf-8"),
+        method="POST",
+        headers={
+            "Authorization": "Bearer %s" % token,
+            "Content-Type": "text/xml; charset=utf-8",
+            "X-Correlation-ID": uuid.uuid4().hex,
+        },
+    )
+    started = time.monotonic()
+    try:
+        with urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except HTTPError as e:
+        status = e.code
+    except (URLError, OSError):
+        status = 0
+    return status, (time.monotonic() - started) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8069/infortisa/status")
+    parser.add_argument("--token", required=True, help="infortisa.push_token de Odoo")
+    parser.add_argument("--db", help="base de datos (si el servidor tiene varias)")
+    parser.add_argument("--ref", action="append", default=[], help="CustomerReference (repetible)")
+    parser.add_argument("--refs-file", help="fichero con una CustomerReference por línea")
+    parser.add_argument("--stages", default=",".join(str(i) for i in range(len(STAGES))),
+                        help="etapas a enviar, en orden (índices de %s)" % ", ".join(STAGES))
+    parser.add_argument("--interval", type=float, default=0.0, help="segundos entre etapas")
+    parser.add_argument("--concurrency", type=int, default=8, help="peticiones simultáneas")
+    parser.add_argument("--repeat", type=int, default=1, help="envíos de cada notificación")
+    args = parser.parse_args(argv)
+
+    refs = list(args.ref)
+    if args.refs_file:
+        with open(args.refs_file, encoding="utf-8") as fh:
+            refs += [line.strip() for line in fh if line.strip()]
+    if not refs:
+        parser.error("indica al menos un --ref o --refs-file")
+    stages = [int(x) for x in args.stages.split(",") if x.strip()]
+
+    state = MockState(stage_seconds=0)
+    statuses = {}
+    latencies = []
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        for n, stage in enumerate(stages):
+            if n and args.interval:
+                time.sleep(args.interval)
+            jobs = [(ref, state.stage_body(ref, stage)) for ref in refs for _ in range(max(1, args.repeat))]
+            results = pool.map(lambda job: send(args.url, args.token, job[0], job[1], db=args.db), jobs)
+            for status, latency_ms in results:
+                statuses[status] = statuses.get(status, 0) + 1
+                latencies.append(latency_ms)
+            print(f"etapa {stage} ({STAGES[stage]}): {len(jobs)} notificaciones", flush=True)
+
+    summary = ", ".join(f"HTTP {code or 'sin respuesta'}: {count}" for code, count in sorted(statuses.items()))
+    print(f"{len(latencies)} envíos ({summary}); latencia p50 {statistics.median(latencies):.1f} ms, "
+          f"p99 {_pct(latencies, 0.99):.1f} ms")
+    return 0 if set(statuses) <= {202} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# infortisa_orders/controllers/__init__.py
+from . import main
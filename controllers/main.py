@@ -0,0 +1,107 @@
+# infortisa_orders/controllers/main.py
+import codecs
+import hmac
+
+from odoo import http
+from odoo.http import request
+
+from ..models.infortisa_parser import customer_reference
+from ..models.infortisa_trace import CORRELATION_HEADER
+
+# Tamaño máximo de una notificación de estado (un OrderStatusResponse de 500 líneas ocupa ~300 KB)
+PUSH_MAX_BYTES = 5 * 1024 * 1024
+
+
+def _text_response(body, status):
+    return request.make_response(body, headers=[("Content-Type", "text/plain")], status=status)
+
+
+def _check_bearer(param):
+    """None si ``Authorization: Bearer`` coincide con el parámetro ``param``; si no, la respuesta a devolver.
+
+    Sin token configurado el endpoint no existe (404).
+    """
+    if not request.db:
+        return request.not_found()
+    token = request.env["ir.config_parameter"].sudo().get_param(param) or ""
+    auth = request.httprequest.headers.get("Authorization", "")
+    given = auth[len("Bearer "):] if auth.startswith("Bearer ") else ""
+    if not token:
+        return request.not_found()
+    if not hmac.compare_digest(given.encode(), token.encode()):
+        return _text_response("Unauthorized\n", 401)
+    return None
+
+
+def _read_limited(stream, limit):
+    """Hasta ``limit + 1`` bytes del cuerpo: basta para saber si se pasa sin leerlo entero."""
+    chunks = []
+    size = 0
+    while size <= limit:
+        chunk = stream.read(min(64 * 1024, limit + 1 - size))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks)
+
+
+def _decode_body(data, charset=None):
+    """Cuerpo de la petición como texto (Infortisa usa UTF-16 con BOM en sus propios envíos)."""
+    if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return data.decode("utf-16")
+    try:
+        return data.decode(charset or "utf-8-sig")
+    except (LookupError, UnicodeDecodeError):
+        return data.decode("latin-1")
+
+
+class InfortisaMetricsController(http.Controller):
+
+    @http.route("/infortisa/metrics", type="http", auth="none", methods=["GET"], csrf=False, save_session=False)
+    def metrics(self, **kw):
+        """Métricas en formato Prometheus. Requiere ``Authorization: Bearer <infortisa.metrics_token>``."""
+        denied = _check_bearer("infortisa.metrics_token")
+        if denied is not None:
+            return denied
+        body = request.env["infortisa.metric"].sudo()._render_prometheus()
+        return request.make_response(body, headers=[("Content-Type", "text/plain; version=0.0.4; charset=utf-8")])
+
+
+class InfortisaStatusController(http.Controller):
+
+    @http.route("/infortisa/status", type="http", auth="none", methods=["POST"], csrf=False, save_session=False)
+    def status(self, **kw):
+        """Notificación de estado/tracking: el mismo ``OrderStatusResponse`` que /api/order/status.
+
+        Requiere ``Authorization: Bearer <infortisa.push_token>``. El pedido se
+        identifica por ``?CustomerReference=`` (como en la consulta) o por un
+        elemento ``CustomerReference`` en el XML; si vienen los dos, deben
+        coincidir. Sólo se encola: responde 202 y el cron de notificaciones lo
+        aplica en segundo plano.
+        """
+        denied = _check_bearer("infortisa.push_token")
+        if denied is not None:
+            return denied
+        httprequest = request.httprequest
+        if (httprequest.content_length or 0) > PUSH_MAX_BYTES:
+            return _text_response("Payload too large\n", 413)
+        # Sin Content-Length (chunked) el límite se comprueba leyendo
+        data = _read_limited(httprequest.stream, PUSH_MAX_BYTES)
+        if len(data) > PUSH_MAX_BYTES:
+            return _text_response("Payload too large\n", 413)
+        body = _decode_body(data, httprequest.mimetype_params.get("charset"))
+        if "<OrderStatusResponse" not in body:
+            return _text_response("Se esperaba un OrderStatusResponse\n", 400)
+        query_ref = (kw.get("CustomerReference") or "").strip()
+        body_ref = customer_reference(body).strip()
+        if query_ref and body_ref and query_ref != body_ref:
+            return _text_response("CustomerReference de la URL y del XML no coinciden\n", 400)
+        customer_ref = query_ref or body_ref
+        if not customer_ref:
+            return _text_response("CustomerReference requerido\n", 400)
+        correlation_id = (httprequest.headers.get(CORRELATION_HEADER) or "")[:64]
+        entry = request.env["infortisa.status.inbox"].sudo()._receive(customer_ref, body, correlation_id)
+        if not entry:
+            return _text_response("Pedido desconocido\n", 404)
+        return _text_response("Accepted\n", 202)
@@ -0,0 +1,45 @@
+# infortisa_orders/migrations/18.0.8.0/post-migrate.py
+"""Pasa el XML crudo de ``sale_order`` (antes columnas ``infortisa_last_payload`` /
+``infortisa_last_response``) al historial ``infortisa.api.log`` y borra las columnas.
+
+Los campos son ahora computados sobre el historial: sin esto, los pedidos
+anteriores a la actualización mostrarían el XML enviado y la última respuesta vacíos.
+"""
+import logging
+
+from odoo import SUPERUSER_ID, api
+from odoo.tools.sql import column_exists
+
+_logger = logging.getLogger(__name__)
+
+LEGACY_COLUMNS = ("infortisa_last_payload", "infortisa_last_response")
+BATCH = 1000
+
+
+def migrate(cr, version):
+    if not version or not all(column_exists(cr, "sale_order", col) for col in LEGACY_COLUMNS):
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    Log = env["infortisa.api.log"]
+    cr.execute("""
+        SELECT id FROM sale_order
+         WHERE COALESCE(infortisa_last_payload, '') <> '' OR COALESCE(infortisa_last_response, '') <> ''
+         ORDER BY id
+    """)
+    ids = [row[0] for row in cr.fetchall()]
+    for start in range(0, len(ids), BATCH):
+        cr.execute(
+            "SELECT id, infortisa_last_payload, infortisa_last_response FROM sale_order WHERE id = ANY(%s) ORDER BY id",
+            (ids[start:start + BATCH],),
+        )
+        vals_list = []
+        for order_id, payload, response in cr.fetchall():
+            order = env["sale.order"].browse(order_id)
+            # Una entrada por pedido: el XML enviado cuenta como petición de order/create
+            endpoint = "order/create" if payload else "order/status"
+            vals_list.append(Log._prepare_vals(order, endpoint, request=payload or None, response=response or None))
+        Log.create(vals_list)
+        env.invalidate_all()
+    for col in LEGACY_COLUMNS:
+        cr.execute(f"ALTER TABLE sale_order DROP COLUMN {col}")
+    _logger.info("Infortisa: XML crudo de %s pedidos pasado al historial API.", len(ids))
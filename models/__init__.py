@@ -1,3 +1,15 @@
 # infortisa_orders/models/__init__.py
 from . import sale_order
+from . import product
+from . import api_log
 from . import raw_wizard
+from . import send_queue
+from . import send_wizard
+from . import account_batch_payment
+from . import account_move
+from . import tracking_outbox
+from . import metric
+from . import order_trace
+from . import api_circuit
+from . import rate_bucket
+from . import status_inbox
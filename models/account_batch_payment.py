@@ -0,0 +1,247 @@
+# infortisa_orders/models/account_batch_payment.py
+import base64
+import logging
+import threading
+
+from psycopg2 import errors as pg_errors
+
+from odoo import api, fields, models, _
+
+from .infortisa_metrics import METRICS
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountBatchPayment(models.Model):
+    _inherit = "account.batch.payment"
+
+    # Lote diario abierto (modo agregado): acumula los pagos Infortisa de un día
+    # por diario y método, y se cierra con un único fichero ISO20022.
+    infortisa_aggregate = fields.Boolean("Lote diario Infortisa", copy=False, readonly=True, index=True)
+    infortisa_batch_date = fields.Date("Día del lote Infortisa", copy=False, readonly=True)
+
+    def init(self):
+        super().init()
+        # Un solo lote diario abierto por diario/método/día aunque dos workers lo creen a la vez
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS account_batch_payment_infortisa_open_daily_uniq
+                ON account_batch_payment (journal_id, payment_method_id, infortisa_batch_date)
+             WHERE infortisa_aggregate AND state = 'draft'
+        """)
+
+    @api.model
+    def _infortisa_open_daily_batch(self, payment, pm):
+        """Lote diario abierto para el diario/método/fecha del pago (lo crea si no existe).
+
+        Vacío si otra transacción acaba de crearlo (índice único): esta no lo ve
+        hasta terminar, así que el pago queda sin lote y se añade al cerrarlo
+        (``action_infortisa_close_daily``).
+        """
+        today = fields.Date.context_today(self)
+        batch = self.sudo().search([
+            ("infortisa_aggregate", "=", True),
+            ("state", "=", "draft"),
+            ("journal_id", "=", payment.journal_id.id),
+            ("payment_method_id", "=", pm.id),
+            ("infortisa_batch_date", "=", today),
+        ], limit=1)
+        if batch:
+            return batch
+        batch_vals = {
+            "name": _("Infortisa %s") % fields.Date.to_string(today),
+            "journal_id": payment.journal_id.id,
+            "batch_type": payment.payment_type,
+            "payment_method_id": pm.id,
+            "payment_method_code": pm.code or False,
+            "company_id": payment.company_id.id,
+            "currency_id": payment.currency_id.id,
+            "date": today,
+            "file_generation_enabled": True,
+            "infortisa_aggregate": True,
+            "infortisa_batch_date": today,
+        }
+        try:
+            with self.env.cr.savepoint():
+                return self.sudo().create({k: v for k, v in batch_vals.items() if v})
+        except (pg_errors.UniqueViolation, pg_errors.SerializationFailure):
+            _logger.info("Infortisa: lote diario %s abierto por otro proceso", fields.Date.to_string(today))
+            return self.browse()
+
+    def _infortisa_adopt_orphan_payments(self):
+        """Añade al lote diario los pagos Infortisa del mismo diario/método que se quedaron sin lote."""
+        self.ensure_one()
+        orders = self.env["sale.order"].sudo().search([
+            ("infortisa_payment_state", "=", "to_export"),
+            ("infortisa_vendor_payment_id.batch_payment_id", "=", False),
+            ("infortisa_vendor_payment_id.journal_id", "=", self.journal_id.id),
+        ])
+        payments = orders.infortisa_vendor_payment_id.filtered(lambda p: p.payment_method_id == self.payment_method_id)
+        if payments:
+            self.write({"payment_ids": [(4, p.id) for p in payments]})
+
+    def _infortisa_normalize_export(self, ret, payment=None):
+        """Extrae ``(xml_bytes, nombre)`` de lo que devuelva la exportación del lote
+        (dict de acción, campos binarios o adjuntos según la versión de account_iso20022).
+        """
+        self.ensure_one()
+        batch = self
+        filename = f"iso20022_{batch.name or batch.id}.xml"
+        candidates = []
+
+        if isinstance(ret, dict):
+            f = ret.get("file")
+            if isinstance(f, dict):
+                if f.get("filename"):
+                    filename = f["filename"]
+                candidates.append(f.get("file"))
+            else:
+                candidates.append(f)
+            if ret.get("filename"):
+                filename = ret["filename"]
+
+        xml_field = getattr(batch, "export_file", False)
+        if xml_field:
+            candidates.append(xml_field)
+        export_file_id = getattr(batch, "export_file_id", False)
+        if export_file_id and getattr(export_file_id, "datas", False):
+            candidates.append(export_file_id.datas)
+            filename = export_file_id.name or filename
+        sepa_xml = getattr(batch, "sepa_xml_file", False)
+        if sepa_xml:
+            candidates.append(sepa_xml)
+
+        Att = self.env["ir.attachment"].sudo()
+        xml_att = Att.search([
+            ("res_model", "=", "account.batch.payment"),
+            ("res_id", "=", batch.id),
+            "|", ("mimetype", "ilike", "xml"), ("name", "ilike", ".xml"),
+        ], order="id desc", limit=1)
+        if xml_att and xml_att.datas:
+            try:
+                decoded = base64.b64decode(xml_att.datas)
+            except Exception:
+                decoded = b""
+            if decoded:
+                return decoded, (xml_att.name or filename)
+
+        if payment:
+            xml_att2 = Att.search([
+                ("res_model", "=", "account.payment"),
+                ("res_id", "=", payment.id),
+                "|", ("mimetype", "ilike", "xml"), ("name", "ilike", ".xml"),
+            ], order="id desc", limit=1)
+            if xml_att2 and xml_att2.datas:
+                try:
+                    decoded = base64.b64decode(xml_att2.datas)
+                except Exception:
+                    decoded = b""
+                if decoded:
+                    return decoded, (xml_att2.name or filename)
+
+        if hasattr(batch, "_generate_export_file"):
+            try:
+                candidates.append(batch._generate_export_file())
+            except Exception:
+                pass
+
+        for c in candidates:
+            if not c:
+                continue
+            if isinstance(c, (bytes, bytearray, memoryview)):
+                raw = bytes(c)
+                try:
+                    decoded = base64.b64decode(raw, validate=True)
+                    if decoded.strip().startswith(b'<?xml'):
+                        return decoded, filename
+                except Exception:
+                    pass
+                return raw, filename
+            if isinstance(c, str):
+                s = c.strip()
+                try:
+                    decoded = base64.b64decode(s, validate=True)
+                    if decoded.strip().startswith(b'<?xml'):
+                        return decoded, filename
+                except Exception:
+                    pass
+                return s.encode("utf-8"), filename
+        return None, filename
+
+    def _infortisa_generate_export(self, payment=None):
+        """Valida el lote, genera el fichero ISO20022 y lo deja adjunto al lote.
+
+        Devuelve el ``ir.attachment`` (vacío si no se obtuvo contenido).
+        """
+        self.ensure_one()
+        with METRICS.timer("infortisa_phase_seconds", phase="payment_export"):
+            ret = None
+            if hasattr(self, "action_validate_generate_file"):
+                ret = self.action_validate_generate_file()
+            elif hasattr(self, "action_validate_generate_xml"):
+                ret = self.action_validate_generate_xml()
+
+            xml_bytes, export_name = self._infortisa_normalize_export(ret, payment)
+            Att = self.env["ir.attachment"].sudo()
+            if not xml_bytes:
+                return Att
+            att = Att.search([
+                ("res_model", "=", "account.batch.payment"),
+                ("res_id", "=", self.id),
+                ("name", "=", export_name),
+            ], limit=1)
+            if not att:
+                att = Att.create({
+                    "name": export_name,
+                    "res_model": "account.batch.payment",
+                    "res_id": self.id,
+                    "type": "binary",
+                    "datas": base64.b64encode(xml_bytes),
+                    "mimetype": "application/xml",
+                })
+            self.message_post(body=_("XML ISO20022 generado."), attachment_ids=[att.id])
+            return att
+
+    def action_infortisa_close_daily(self):
+        """Cierra lotes diarios Infortisa: un único fichero ISO20022 con todas sus transferencias."""
+        Order = self.env["sale.order"].sudo()
+        closed = self.browse()
+        for batch in self.filtered(lambda b: b.infortisa_aggregate and b.state == "draft"):
+            batch._infortisa_adopt_orphan_payments()
+            if not batch.payment_ids:
+                continue
+            orders = Order.search([("infortisa_vendor_payment_id", "in", batch.payment_ids.ids)])
+            try:
+                with self.env.cr.savepoint():
+                    att = batch._infortisa_generate_export()
+            except Exception as e:
+                _logger.exception("Infortisa: error generando el XML del lote %s", batch.display_name)
+                orders.write({"infortisa_payment_state": "failed"})
+                orders._message_log_batch(
+                    bodies={o.id: _("Error al generar el XML del lote %s: %s") % (batch.display_name, e) for o in orders}
+                )
+                continue
+            if att:
+                orders.write({"infortisa_payment_state": "exported"})
+                body = _("XML ISO20022 generado en el lote diario %s.") % batch.display_name
+            else:
+                body = _("No se obtuvo contenido para el XML ISO20022 del lote diario %s.") % batch.display_name
+            orders._message_log_batch(bodies={o.id: body for o in orders})
+            closed |= batch
+        return closed
+
+    @api.model
+    def cron_infortisa_close_daily_batches(self):
+        """Cierra los lotes diarios de días anteriores (o todos con ``include_today``)."""
+        today = fields.Date.context_today(self)
+        op = "<=" if self.env.context.get("infortisa_include_today") else "<"
+        batches = self.sudo().search([
+            ("infortisa_aggregate", "=", True),
+            ("state", "=", "draft"),
+            ("infortisa_batch_date", op, today),
+        ])
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        for batch in batches:
+            batch.action_infortisa_close_daily()
+            if auto_commit:
+                self.env.cr.commit()
+        _logger.info("Infortisa: %s lotes diarios de pago cerrados.", len(batches))
@@ -0,0 +1,95 @@
+# infortisa_orders/models/account_move.py
+import logging
+import threading
+
+from odoo import api, fields, models, _
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    # Factura consolidada (modo por periodo o por referencia de transferencia):
+    # queda en borrador acumulando una línea por pedido hasta que se cierra.
+    infortisa_consolidation = fields.Selection(
+        [("daily", "Diaria"), ("transfer", "Por referencia de transferencia")],
+        string="Consolidación Infortisa",
+        copy=False,
+        readonly=True,
+        index="btree_not_null",
+    )
+    infortisa_period_date = fields.Date("Periodo Infortisa", copy=False, readonly=True)
+    infortisa_transfer_ref = fields.Char("Referencia transferencia (Infortisa)", copy=False, readonly=True)
+    infortisa_order_ids = fields.One2many(
+        "sale.order", "infortisa_vendor_bill_id", string="Pedidos Infortisa", readonly=True
+    )
+
+    def init(self):
+        super().init()
+        # Una sola factura consolidada abierta por periodo/referencia, aunque dos crons
+        # de estado (ver infortisa.poll_shards) la creen a la vez: el segundo falla y
+        # su pedido se factura en la siguiente consulta, sobre la factura ya existente.
+        # Índices sobre las columnas tal cual: una expresión con ``date::text`` no es
+        # IMMUTABLE y PostgreSQL no la admite en un índice.
+        for mode, column in (("daily", "infortisa_period_date"), ("transfer", "infortisa_transfer_ref")):
+            self.env.cr.execute(f"""
+                CREATE UNIQUE INDEX IF NOT EXISTS account_move_infortisa_open_{mode}_uniq
+                    ON account_move (journal_id, partner_id, currency_id, {column})
+                 WHERE state = 'draft' AND move_type = 'in_invoice' AND infortisa_consolidation = '{mode}'
+            """)
+
+    @api.model
+    def _infortisa_open_consolidated_bill_domain(self, mode, partner, journal, currency, transfer_ref=None):
+        domain = [
+            ("move_type", "=", "in_invoice"),
+            ("state", "=", "draft"),
+            ("infortisa_consolidation", "=", mode),
+            ("partner_id", "=", partner.id),
+            ("journal_id", "=", journal.id),
+            ("currency_id", "=", currency.id),
+        ]
+        if mode == "daily":
+            domain.append(("infortisa_period_date", "=", fields.Date.context_today(self)))
+        else:
+            domain.append(("infortisa_transfer_ref", "=", transfer_ref))
+        return domain
+
+    def action_infortisa_close_consolidated(self):
+        """Contabiliza las facturas consolidadas en borrador y lanza el pago de sus pedidos."""
+        bills = self.filtered(lambda m: m.infortisa_consolidation and m.state == "draft")
+        if not bills:
+            return True
+        bills.action_post()
+        orders = bills.infortisa_order_ids
+        if orders:
+            orders._auto_make_payment_if_ready()
+        return True
+
+    @api.model
+    def cron_infortisa_close_consolidated_bills(self):
+        """Cierra las facturas consolidadas de periodos anteriores (una por ejecución y commit)."""
+        bills = self.sudo().search([
+            ("infortisa_consolidation", "!=", False),
+            ("state", "=", "draft"),
+            ("infortisa_period_date", "<", fields.Date.context_today(self)),
+        ])
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        for bill in bills:
+            try:
+                with self.env.cr.savepoint():
+                    bill.action_infortisa_close_consolidated()
+            except Exception as e:
+                _logger.exception("Infortisa: no se pudo cerrar la factura consolidada %s", bill.display_name)
+                bill.message_post(body=_("No se pudo cerrar la factura consolidada: %s") % e)
+            if auto_commit:
+                self.env.cr.commit()
+        _logger.info("Infortisa: %s facturas consolidadas cerradas.", len(bills))
+
+
+class AccountMoveLine(models.Model):
+    _inherit = "account.move.line"
+
+    infortisa_order_id = fields.Many2one(
+        "sale.order", string="Pedido Infortisa", copy=False, readonly=True, index="btree_not_null"
+    )
@@ -0,0 +1,167 @@
+# infortisa_orders/models/api_circuit.py
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+from .infortisa_breaker import CircuitBreaker, CircuitOpenError, adaptive_timeout, ewma
+from .infortisa_metrics import METRICS
+
+_logger = logging.getLogger(__name__)
+
+CIRCUIT_KEY = "api"
+
+
+class InfortisaCircuitOpen(UserError, CircuitOpenError):
+    """Circuito abierto al pedir un cliente: se muestra al usuario como un error normal."""
+
+    def __init__(self, message, retry_at=None):
+        # Ni UserError.__init__ ni CircuitOpenError.__init__: el primero encadena con el segundo
+        Exception.__init__(self, message)
+        self.retry_at = retry_at
+
+
+class InfortisaApiCircuit(models.Model):
+    """Estado del circuit breaker de la API, compartido por todos los workers.
+
+    Se lee y actualiza siempre con un cursor propio y transacciones cortas
+    (ver ``_acquire`` / ``_report``): el estado debe verse enseguida en los
+    demás workers y no deshacerse si la transacción del pedido falla.
+    """
+
+    _name = "infortisa.api.circuit"
+    _description = "Circuit breaker de la API de Infortisa"
+    _rec_name = "name"
+
+    name = fields.Char("Clave", required=True, readonly=True)
+    state = fields.Selection(
+        [("closed", "Cerrado (normal)"), ("open", "Abierto (API caída)"), ("half_open", "Semiabierto (sondeando)")],
+        string="Estado",
+        default="closed",
+        required=True,
+        readonly=True,
+    )
+    consecutive_failures = fields.Integer("Fallos consecutivos", readonly=True)
+    open_until = fields.Datetime("Abierto hasta", readonly=True)
+    probe_until = fields.Datetime("Sonda en curso hasta", readonly=True)
+    latency_ewma_ms = fields.Float("Latencia media (ms)", readonly=True)
+    last_error = fields.Char("Último error", readonly=True)
+    last_change = fields.Datetime("Último cambio de estado", readonly=True)
+
+    _sql_constraints = [
+        ("name_uniq", "unique(name)", "Circuito duplicado."),
+    ]
+
+    @api.model
+    def _fetch_row(self, cr, lock=False):
+        query = (
+            "SELECT state, open_until, probe_until, consecutive_failures, latency_ewma_ms"
+            "  FROM infortisa_api_circuit WHERE name = %s" + (" FOR UPDATE" if lock else "")
+        )
+        cr.execute(query, (CIRCUIT_KEY,))
+        row = cr.fetchone()
+        if row is None:
+            cr.execute(
+                """
+                INSERT INTO infortisa_api_circuit (name, state, consecutive_failures, latency_ewma_ms)
+                VALUES (%s, 'closed', 0, 0) ON CONFLICT (name) DO NOTHING
+                """,
+                (CIRCUIT_KEY,),
+            )
+            cr.execute(query, (CIRCUIT_KEY,))
+            row = cr.fetchone()
+        return row
+
+    @api.model
+    def _acquire(self):
+        """``CircuitBreaker`` para un cliente nuevo; lanza ``InfortisaCircuitOpen`` si el circuito está abierto.
+
+        Pasado el enfriamiento, sólo el primer worker que llega obtiene la sonda
+        (un breaker que deja pasar una única llamada); los demás siguen viendo
+        el circuito abierto hasta que la sonda informe o caduque.
+        """
+        cfg = self.env["sale.order"]._infortisa_config()
+        now = fields.Datetime.now()
+        probe = False
+        with self.env.registry.cursor() as cr:
+            state, open_until, probe_until, failures, latency = self._fetch_row(cr)
+            if state != "closed":
+                state, open_until, probe_until, failures, latency = self._fetch_row(cr, lock=True)
+            retry_at = open_until if state == "open" else probe_until
+            if state != "closed" and retry_at and now < retry_at:
+                raise InfortisaCircuitOpen(_(
+                    "La API de Infortisa no responde; se reintentará automáticamente a partir de %s (UTC)."
+                ) % fields.Datetime.to_string(retry_at), retry_at)
+            if state != "closed":
+                probe = True
+                lease = timedelta(seconds=cfg.connect_timeout + cfg.read_timeout + 5)
+                cr.execute(
+                    "UPDATE infortisa_api_circuit SET state = 'half_open', probe_until = %s WHERE name = %s",
+                    (now + lease, CIRCUIT_KEY),
+                )
+        return CircuitBreaker(
+            probe=probe,
+            failure_threshold=cfg.breaker_failures,
+            slow_ms=cfg.breaker_slow_ms,
+            consecutive_failures=failures,
+            read_timeout=adaptive_timeout(latency, max(1, cfg.read_timeout)),
+        )
+
+    @api.model
+    def _report(self, breaker):
+        """Incorpora al estado compartido los resultados de un ``CircuitBreaker``."""
+        if not breaker.calls and not breaker.probe:
+            return
+        cfg = self.env["sale.order"]._infortisa_config()
+        now = fields.Datetime.now()
+        with self.env.registry.cursor() as cr:
+            state, _open_until, _probe_until, failures, latency = self._fetch_row(cr, lock=True)
+            vals = {"latency_ewma_ms": ewma(latency, breaker.latencies_ms)}
+            if breaker.successes:
+                failures = breaker.trailing_failures
+            else:
+                failures += breaker.failures
+            vals["consecutive_failures"] = failures
+            released = breaker.probe and not breaker.calls
+            if released:
+                # Sonda concedida pero no usada: otro worker puede sondear ya
+                new_state = "open"
+                vals["open_until"] = now
+            elif breaker.tripped or failures >= max(1, cfg.breaker_failures):
+                new_state = "open"
+                vals["open_until"] = now + timedelta(seconds=max(1, cfg.breaker_cooldown))
+            elif breaker.successes:
+                new_state = "closed"
+            else:
+                new_state = state
+            vals["state"] = new_state
+            if breaker.last_error:
+                vals["last_error"] = breaker.last_error[:250]
+            if new_state != state:
+                vals["last_change"] = now
+            cr.execute(
+                "UPDATE infortisa_api_circuit SET %s WHERE name = %%s" % ", ".join("%s = %%s" % k for k in vals),
+                (*vals.values(), CIRCUIT_KEY),
+            )
+        if new_state != state and not released:
+            METRICS.inc("infortisa_circuit_transitions_total", state=new_state)
+            if new_state == "open":
+                _logger.warning(
+                    "Infortisa: circuito ABIERTO tras %s fallos consecutivos (%s); próxima sonda en %ss.",
+                    failures, breaker.last_error, cfg.breaker_cooldown,
+                )
+            else:
+                _logger.info("Infortisa: circuito %s.", new_state)
+        self.invalidate_model()
+
+    def action_reset(self):
+        """Cierra el circuito a mano (p. ej. tras confirmar que la API ha vuelto)."""
+        self.write({
+            "state": "closed",
+            "consecutive_failures": 0,
+            "open_until": False,
+            "probe_until": False,
+            "last_change": fields.Datetime.now(),
+        })
+        return True
@@ -0,0 +1,111 @@
+# infortisa_orders/models/api_log.py
+import base64
+import logging
+import zlib
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+def _compress(text):
+    if not text:
+        return False
+    return base64.b64encode(zlib.compress(text.encode("utf-8"), 6))
+
+
+def _decompress(value):
+    if not value:
+        return ""
+    try:
+        return zlib.decompress(base64.b64decode(value)).decode("utf-8", "replace")
+    except (zlib.error, ValueError):
+        return ""
+
+
+class InfortisaApiLog(models.Model):
+    """Historial (sólo inserción) de llamadas a la API, con cuerpos comprimidos con zlib.
+
+    Sustituye a las columnas de texto crudo que antes se reescribían en ``sale_order``.
+    """
+
+    _name = "infortisa.api.log"
+    _description = "Intercambio con la API de Infortisa"
+    _order = "id desc"
+    _rec_name = "endpoint"
+
+    order_id = fields.Many2one("sale.order", string="Pedido", index=True, ondelete="cascade", readonly=True)
+    endpoint = fields.Char("Endpoint", required=True, index=True, readonly=True)
+    correlation_id = fields.Char("Id. de correlación", index="btree_not_null", readonly=True)
+    http_status = fields.Integer("HTTP", readonly=True)
+    latency_ms = fields.Integer("Latencia (ms)", readonly=True)
+    error = fields.Char("Error", readonly=True)
+    request_body_z = fields.Binary("Petición (zlib)", attachment=False, readonly=True)
+    response_body_z = fields.Binary("Respuesta (zlib)", attachment=False, readonly=True)
+    request_body = fields.Text("Petición", compute="_compute_bodies")
+    response_body = fields.Text("Respuesta", compute="_compute_bodies")
+
+    @api.depends("request_body_z", "response_body_z")
+    def _compute_bodies(self):
+        # En formularios llega bin_size=True y el binario se leería como "1.2 Kb"
+        for log, raw in zip(self, self.with_context(bin_size=False)):
+            log.request_body = _decompress(raw.request_body_z)
+            log.response_body = _decompress(raw.response_body_z)
+
+    @api.model
+    def _prepare_vals(self, order, endpoint, request=None, response=None, http_status=0, latency_ms=0, error=None,
+                      correlation_id=None):
+        return {
+            "order_id": order.id if order else False,
+            "endpoint": endpoint,
+            "correlation_id": correlation_id or False,
+            "http_status": http_status or 0,
+            "latency_ms": int(latency_ms or 0),
+            "error": (str(error)[:250] if error else False),
+            "request_body_z": _compress(request),
+            "response_body_z": _compress(response),
+        }
+
+    @api.model
+    def _log(self, order, endpoint, **kw):
+        """Crea la entrada en una transacción propia, confirmada enseguida.
+
+        La acción que hizo la llamada puede fallar después (HTTP de error,
+        ``HasErrors``, savepoint de la cola) y su rollback no debe llevarse
+        justo la entrada que explica el fallo. Si no se puede (p. ej. el pedido
+        aún no está confirmado en la base de datos o esta misma transacción lo
+        tiene bloqueado), se crea en la transacción de quien llama.
+        """
+        vals = self._prepare_vals(order, endpoint, **kw)
+        try:
+            with self.env.registry.cursor() as cr:
+                # Nunca esperar por un bloqueo de la propia transacción principal
+                cr.execute("SET LOCAL lock_timeout = '2s'")
+                log_id = self.with_env(self.env(cr=cr, su=True)).create(vals).id
+        except Exception as e:
+            _logger.info("Infortisa: historial API de %s en la transacción principal (%s)", endpoint, e)
+            return self.sudo().create(vals)
+        return self.browse(log_id)
+
+    @api.model
+    def _purge(self, limit_date):
+        self.env.cr.execute("DELETE FROM infortisa_api_log WHERE create_date < %s", (limit_date,))
+        count = self.env.cr.rowcount
+        self.invalidate_model()
+        return count
+
+    @api.model
+    def cron_purge_history(self):
+        """Purga el historial API, las trazas de pedidos lentos y las notificaciones ya aplicadas.
+
+        Todos comparten la retención ``infortisa.api_log_retention_days``; cada
+        modelo decide qué puede borrar en su ``_purge``.
+        """
+        days = self.env["sale.order"]._infortisa_config().api_log_retention_days
+        if days <= 0:
+            return
+        limit_date = fields.Datetime.now() - timedelta(days=days)
+        for model in ("infortisa.api.log", "infortisa.order.trace", "infortisa.status.inbox"):
+            count = self.env[model]._purge(limit_date)
+            _logger.info("Infortisa: %s registros de %s purgados (> %s días).", count, model, days)
@@ -0,0 +1,82 @@
+# infortisa_orders/models/infortisa_breaker.py
+"""Circuit breaker de la API de Infortisa (vista local de un lote de llamadas).
+
+El estado compartido entre workers (cerrado / abierto / semiabierto, fallos
+consecutivos y latencia media) vive en ``infortisa.api.circuit``. Cada cliente
+recibe un ``CircuitBreaker`` al crearse: cuenta los resultados de sus llamadas
+(también desde los hilos del pool) y, si se acumulan fallos, corta el resto del
+lote sin esperar a los timeouts. En modo sonda sólo deja pasar una llamada. No
+depende de Odoo.
+"""
+import threading
+
+# Timeout de lectura adaptativo: FACTOR veces la latencia media, entre FLOOR y el configurado
+ADAPTIVE_TIMEOUT_FACTOR = 4.0
+ADAPTIVE_TIMEOUT_FLOOR = 5.0
+EWMA_ALPHA = 0.2
+
+
+class CircuitOpenError(Exception):
+    """La API se considera caída: la llamada no se hace."""
+
+    def __init__(self, retry_at=None):
+        super().__init__("API de Infortisa no disponible (circuito abierto)")
+        self.retry_at = retry_at
+
+
+def ewma(current, samples, alpha=EWMA_ALPHA):
+    """Media móvil exponencial de ``current`` con las muestras nuevas."""
+    for sample in samples:
+        current = sample if not current else alpha * sample + (1 - alpha) * current
+    return current
+
+
+def adaptive_timeout(latency_ewma_ms, ceiling, floor=ADAPTIVE_TIMEOUT_FLOOR, factor=ADAPTIVE_TIMEOUT_FACTOR):
+    """Timeout de lectura (s) según la latencia observada; sin datos, el configurado."""
+    if not latency_ewma_ms:
+        return ceiling
+    return max(min(floor, ceiling), min(ceiling, latency_ewma_ms * factor / 1000.0))
+
+
+class CircuitBreaker:
+
+    def __init__(self, probe=False, failure_threshold=5, slow_ms=0, consecutive_failures=0, read_timeout=None):
+        self.probe = probe
+        self.failure_threshold = max(1, failure_threshold)
+        self.slow_ms = slow_ms
+        self.read_timeout = read_timeout
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.trailing_failures = consecutive_failures
+        self.latencies_ms = []
+        self.tripped = False
+        self.last_error = ""
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.tripped or (self.probe and self.calls):
+                raise CircuitOpenError()
+            self.calls += 1
+
+    def cancel_call(self):
+        """La llamada autorizada por ``before_call`` no llegó a hacerse."""
+        with self._lock:
+            self.calls = max(0, self.calls - 1)
+
+    def record(self, ok, latency_ms, error=""):
+        """Resultado de una llamada. Una respuesta correcta pero más lenta que ``slow_ms`` cuenta como fallo."""
+        with self._lock:
+            if ok:
+                self.latencies_ms.append(latency_ms)
+                if not (self.slow_ms and latency_ms >= self.slow_ms):
+                    self.successes += 1
+                    self.trailing_failures = 0
+                    return
+                error = "latencia %.0f ms" % latency_ms
+            self.failures += 1
+            self.trailing_failures += 1
+            self.last_error = error or self.last_error
+            if self.probe or self.trailing_failures >= self.failure_threshold:
+                self.tripped = True
@@ -0,0 +1,53 @@
+# infortisa_orders/models/infortisa_changeset.py
+"""Acumulador de cambios de un pedido durante una consulta de estado.
+
+En lugar de escribir campo a campo (cada ``write`` dispara recálculos y
+tracking de mail), se comparan los valores nuevos con los actuales y se
+aplican todos los cambios en un único ``write`` y un único mensaje.
+"""
+
+FLOAT_TOLERANCE = 0.005
+
+
+class InfortisaChangeSet:
+
+    def __init__(self, record):
+        record.ensure_one()
+        self.record = record
+        self.vals = {}
+        self.messages = []
+
+    def get(self, fname):
+        """Valor pendiente si lo hay; si no, el actual del registro."""
+        return self.vals[fname] if fname in self.vals else self.record[fname]
+
+    def _same(self, old, new):
+        if isinstance(new, float) or isinstance(old, float):
+            return abs((old or 0.0) - (new or 0.0)) < FLOAT_TOLERANCE
+        return (old or False) == (new or False)
+
+    def set(self, fname, value, message=None):
+        """Registra ``fname = value`` sólo si cambia. Devuelve True si hubo cambio."""
+        if self._same(self.get(fname), value):
+            return False
+        self.vals[fname] = value
+        if message:
+            self.messages.append(message)
+        return True
+
+    def update(self, vals):
+        """Añade valores sin comparar (p. ej. la planificación de la próxima consulta)."""
+        self.vals.update(vals)
+
+    def note(self, message):
+        if message:
+            self.messages.append(message)
+
+    def flush(self):
+        """Un único ``write`` con lo pendiente."""
+        if self.vals:
+            self.record.write(self.vals)
+            self.vals = {}
+
+    def message_body(self, separator="<br/>"):
+        return separator.join(str(m) for m in self.messages)
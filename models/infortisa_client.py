@@ -0,0 +1,121 @@
+# infortisa_orders/models/infortisa_client.py
+"""Cliente HTTP compartido para la API de Infortisa.
+
+Mantiene una ``requests.Session`` keep-alive por proceso (los workers de Odoo
+hacen fork, así que la sesión se indexa por PID) para no repetir el handshake
+TLS en cada llamada. No toca el ORM: se puede usar desde hilos del pool.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .infortisa_metrics import METRICS
+
+_logger = logging.getLogger(__name__)
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _get_session(pool_size):
+    pid = os.getpid()
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(pid)
+        if session is None or getattr(session, "_infortisa_pool_size", 0) < pool_size:
+            if session is not None:
+                session.close()
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session._infortisa_pool_size = pool_size
+            # Una sesión heredada del proceso padre no debe reutilizarse tras el fork
+            _SESSIONS.clear()
+            _SESSIONS[pid] = session
+        return session
+
+
+class InfortisaClient:
+    """Llamadas a /api/order/* con timeouts separados y reintentos en GET."""
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, base_url, headers, connect_timeout=5.0, read_timeout=60.0,
+                 get_retries=2, backoff=0.5, pool_size=16, breaker=None, limiter=None):
+        self.breaker = breaker
+        self.limiter = limiter
+        self.base_url = (base_url or "").rstrip("/")
+        self.headers = dict(headers or {})
+        self.timeout = (connect_timeout, read_timeout)
+        self.get_retries = max(0, int(get_retries or 0))
+        self.backoff = backoff
+        self.session = _get_session(max(1, int(pool_size or 1)))
+
+    def _url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _send(self, method, path, headers=None, **kw):
+        """Una petición HTTP, con su latencia y estado registrados en ``METRICS``.
+
+        ``headers`` se añaden a las de la sesión (p. ej. ``X-Correlation-ID``).
+        Con circuit breaker, lanza ``CircuitOpenError`` sin llamar si está abierto;
+        con limitador, espera su turno o lanza ``RateLimitedError``.
+        """
+        if self.breaker is not None:
+            self.breaker.before_call()
+        if self.limiter is not None:
+            try:
+                self.limiter.acquire()
+            except Exception:
+                if self.breaker is not None:
+                    self.breaker.cancel_call()
+                raise
+        headers = dict(self.headers, **headers) if headers else self.headers
+        endpoint = path.strip("/").split("api/", 1)[-1]
+        started = time.monotonic()
+        status = "error"
+        error = ""
+        try:
+            resp = self.session.request(method, self._url(path), headers=headers, timeout=self.timeout, **kw)
+            status = str(resp.status_code)
+            return resp
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            METRICS.inc("infortisa_api_requests_total", endpoint=endpoint, status=status)
+            METRICS.observe("infortisa_api_latency_seconds", elapsed, endpoint=endpoint, status=status)
+            if self.breaker is not None:
+                ok = status != "error" and int(status) not in self.RETRY_STATUSES
+                self.breaker.record(ok, elapsed * 1000, error or ("HTTP %s" % status))
+
+    def _sleep_before_retry(self, attempt):
+        # Backoff exponencial con "full jitter" para no sincronizar reintentos entre hilos/workers
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def get(self, path, params=None, headers=None):
+        """GET idempotente: reintenta errores de red y respuestas 429/5xx."""
+        attempt = 0
+        while True:
+            try:
+                resp = self._send("GET", path, headers=headers, params=params)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.get_retries:
+                    raise
+                _logger.info("Infortisa GET %s: %s (reintento %s)", path, e, attempt + 1)
+            else:
+                if resp.status_code not in self.RETRY_STATUSES or attempt >= self.get_retries:
+                    return resp
+                _logger.info("Infortisa GET %s: HTTP %s (reintento %s)", path, resp.status_code, attempt + 1)
+            self._sleep_before_retry(attempt)
+            attempt += 1
+
+    def post(self, path, data, headers=None):
+        """POST sin reintentos: crear/bloquear pedidos no es idempotente."""
+        return self._send("POST", path, headers=headers, data=data)
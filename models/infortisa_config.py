@@ -0,0 +1,83 @@
+# infortisa_orders/models/infortisa_config.py
+"""Instantánea tipada de los parámetros ``infortisa.*``.
+
+Se construye una vez por registro (ver ``SaleOrder._infortisa_config``, con
+``ormcache``) y se invalida al guardar los ajustes o cualquier
+``ir.config_parameter``. Sólo guarda valores primitivos e ids, nunca
+recordsets, porque la caché se comparte entre entornos.
+"""
+from dataclasses import dataclass, fields as dc_fields
+
+_TRUE_VALUES = ("true", "1", "yes", "y", "t")
+
+
+def _to_bool(val, default):
+    if val in (None, False, ""):
+        return default
+    return str(val).strip().lower() in _TRUE_VALUES
+
+
+def _to_int(val, default):
+    if val in (None, False, ""):
+        return default
+    try:
+        return int(val)
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(frozen=True)
+class InfortisaConfig:
+    # Conexión
+    api_key: str = ""
+    base_url: str = ""
+    test_mode: bool = False
+    default_block: bool = False
+    connect_timeout: int = 5
+    read_timeout: int = 60
+    get_retries: int = 2
+    breaker_failures: int = 5
+    breaker_cooldown: int = 60
+    breaker_slow_ms: int = 20000
+    rate_limit_per_minute: int = 0
+    rate_burst: int = 20
+    rate_reserve: int = 5
+    # Facturación / pagos (ids ya resueltos y comprobados)
+    auto_create_bill: bool = False
+    vendor_id: int = 0
+    product_purchase_id: int = 0
+    product_shipping_id: int = 0
+    purchase_journal_id: int = 0
+    bank_journal_id: int = 0
+    bill_mode: str = "order"
+    payment_batch_mode: str = "order"
+    # Cron de estado
+    poll_workers: int = 8
+    poll_batch_limit: int = 500
+    poll_chunk_size: int = 50
+    poll_time_budget: int = 50
+    poll_shards: int = 1
+    slow_order_ms: int = 5000
+    # Notificaciones push: con token, el cron de estado sólo concilia
+    push_token: str = ""
+    push_poll_factor: int = 6
+    # Cola de envío e historial
+    send_max_attempts: int = 8
+    send_batch_size: int = 50
+    api_log_retention_days: int = 30
+    tracking_digest: bool = False
+
+    @classmethod
+    def from_params(cls, params, **resolved):
+        """Construye la instantánea desde ``{clave sin prefijo: valor}`` de ir.config_parameter."""
+        vals = {}
+        for f in dc_fields(cls):
+            if f.name in resolved:
+                vals[f.name] = resolved[f.name]
+            elif f.type is bool or f.type == "bool":
+                vals[f.name] = _to_bool(params.get(f.name), f.default)
+            elif f.type is int or f.type == "int":
+                vals[f.name] = _to_int(params.get(f.name), f.default)
+            else:
+                vals[f.name] = params.get(f.name) or f.default
+        return cls(**vals)
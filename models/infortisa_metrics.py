@@ -0,0 +1,108 @@
+# infortisa_orders/models/infortisa_metrics.py
+"""Métricas en memoria (contadores e histogramas) en formato Prometheus.
+
+Cada proceso acumula deltas en ``METRICS`` (seguro entre hilos: el pool HTTP
+también registra). ``InfortisaMetric._flush_metrics`` los suma en la tabla
+``infortisa_metric`` para agregar todos los workers, y el controlador
+``/infortisa/metrics`` los expone. No depende de Odoo.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites (segundos) de los histogramas de latencia/duración
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+METRIC_HELP = {
+    "infortisa_api_requests_total": ("counter", "Llamadas a la API de Infortisa por endpoint y estado HTTP."),
+    "infortisa_api_latency_seconds": ("histogram", "Latencia de la API de Infortisa por endpoint y estado HTTP."),
+    "infortisa_cron_runs_total": ("counter", "Ejecuciones de crons Infortisa."),
+    "infortisa_cron_duration_seconds": ("histogram", "Duración de las ejecuciones de crons Infortisa."),
+    "infortisa_cron_orders_total": ("counter", "Pedidos tratados por los crons Infortisa por resultado."),
+    "infortisa_phase_seconds": ("histogram", "Tiempo por fase (parse, orm_write, billing, payment_export)."),
+    "infortisa_slow_orders_total": ("counter", "Pedidos cuya consulta de estado superó el umbral de pedido lento."),
+    "infortisa_circuit_transitions_total": ("counter", "Cambios de estado del circuit breaker de la API."),
+    "infortisa_rate_wait_seconds": ("histogram", "Espera por cupo del límite de llamadas, por carril."),
+    "infortisa_rate_limited_total": ("counter", "Llamadas abandonadas por falta de cupo, por carril."),
+}
+
+
+def labels_key(labels):
+    """Etiquetas en forma canónica ``k="v",...`` (ordenadas) para usar como clave."""
+    return ",".join(
+        '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " "))
+        for k, v in sorted(labels.items())
+    )
+
+
+class MetricsRegistry:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values = {}  # (nombre_muestra, etiquetas) -> delta
+
+    def _add(self, sample, key, value):
+        self._values[(sample, key)] = self._values.get((sample, key), 0.0) + value
+
+    def inc(self, name, value=1.0, **labels):
+        with self._lock:
+            self._add(name, labels_key(labels), value)
+
+    def observe(self, name, value, **labels):
+        """Histograma acumulativo: _bucket{le=...}, _sum y _count."""
+        with self._lock:
+            for le in self.buckets:
+                if value <= le:
+                    self._add(name + "_bucket", labels_key(dict(labels, le=repr(le))), 1.0)
+            self._add(name + "_bucket", labels_key(dict(labels, le="+Inf")), 1.0)
+            key = labels_key(labels)
+            self._add(name + "_sum", key, value)
+            self._add(name + "_count", key, 1.0)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, **labels)
+
+    def drain(self):
+        """Devuelve y pone a cero los deltas acumulados: ``[(muestra, etiquetas, valor)]``."""
+        with self._lock:
+            values, self._values = self._values, {}
+        return [(sample, key, value) for (sample, key), value in values.items()]
+
+    def restore(self, rows):
+        """Devuelve deltas a la memoria si no se pudieron guardar."""
+        with self._lock:
+            for sample, key, value in rows:
+                self._add(sample, key, value)
+
+
+METRICS = MetricsRegistry()
+
+
+def _base_name(sample):
+    for suffix in ("_bucket", "_sum", "_count"):
+        if sample.endswith(suffix) and sample[: -len(suffix)] in METRIC_HELP:
+            return sample[: -len(suffix)]
+    return sample
+
+
+def render_prometheus(rows):
+    """Texto de exposición Prometheus (v0.0.4) a partir de ``[(muestra, etiquetas, valor)]``."""
+    by_metric = {}
+    for sample, key, value in rows:
+        by_metric.setdefault(_base_name(sample), []).append((sample, key, value))
+    out = []
+    for name in sorted(by_metric):
+        kind, help_text = METRIC_HELP.get(name, ("untyped", ""))
+        if help_text:
+            out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        for sample, key, value in sorted(by_metric[name]):
+            labels = "{%s}" % key if key else ""
+            out.append(f"{sample}{labels} {value:.17g}")
+    return "\n".join(out) + "\n"
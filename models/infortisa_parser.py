@@ -0,0 +1,189 @@
+# infortisa_orders/models/infortisa_parser.py
+"""Parser de ``OrderStatusResponse`` (/api/order/status).
+
+Recorre el elemento ``Operation`` una sola vez y devuelve un ``OrderStatus``
+con importes, códigos, tracking y líneas de producto. No depende de Odoo, así
+que se puede medir aislado (ver ``benchmarks/bench_parser.py``).
+"""
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+
+NS_MODELS = "http://schemas.datacontract.org/2004/07/BackEnd.Data.Npoco.Models"
+_OPERATION_TAG = "{%s}Operation" % NS_MODELS
+
+# Orden de preferencia para la referencia de transferencia
+TRANSFER_REF_TAGS = ("PaymentReference", "BankTransferReference", "TransferReference", "Reference", "Code")
+_EXT_REF_RE = re.compile(r"\bEXT\d+\b")
+_CUSTOMER_REF_RE = re.compile(r"<(?:\w+:)?CustomerReference\b[^>]*>\s*([^<]*?)\s*</", re.S)
+
+
+class InfortisaParseError(ValueError):
+    """La respuesta dice ser un OrderStatusResponse pero no es XML válido o trae un importe que no es un número."""
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1] if "}" in tag else tag
+
+
+def _to_float(text):
+    """Importe vacío o nulo -> 0.0; uno mal formado lanza ``InfortisaParseError`` (nunca se factura un 0 inventado)."""
+    if not text or not text.strip():
+        return 0.0
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        try:
+            # Algunos importes llegan con coma decimal
+            return float(text.strip().replace(",", "."))
+        except (TypeError, ValueError):
+            raise InfortisaParseError("Importe no numérico: %r" % text) from None
+
+
+@dataclass
+class ProductRow:
+    name: str
+    sku: str
+    pn: str
+    qty: float
+    price_wo: float
+    canon_raw: float
+
+
+@dataclass
+class OrderStatus:
+    """Resultado del parseo. ``has_operation`` es False si no venía ``Operation``."""
+
+    has_operation: bool = False
+    state: str = None
+    code: str = ""
+    internal_ref: str = ""
+    transfer_ref: str = ""
+    shipping: float = 0.0
+    tax: float = 0.0
+    total: float = 0.0
+    canon_op: float = 0.0
+    other_cost: float = 0.0
+    tracking_url: str = ""
+    tracking_number: str = ""
+    tracking_status: str = ""
+    tracking_status_dt: str = ""
+    tracking_status_detail: str = ""
+    shipping_agent: str = ""
+    products: list = field(default_factory=list)
+
+    @property
+    def base_products(self):
+        return sum(r.price_wo * r.qty for r in self.products)
+
+    @property
+    def canon_is_unit(self):
+        """El API a veces da CanonLPI unitario y a veces total de línea: se deduce por el de operación."""
+        sum_units = sum(r.canon_raw * r.qty for r in self.products)
+        sum_as_is = sum(r.canon_raw for r in self.products)
+
+        def _close(a, b):
+            return abs(a - b) <= max(0.01, 0.01 * max(a, b))
+
+        return not (_close(self.canon_op, sum_as_is) and not _close(self.canon_op, sum_units))
+
+    @property
+    def canon_amount(self):
+        if self.canon_op:
+            return self.canon_op
+        if self.canon_is_unit:
+            return sum(r.canon_raw * r.qty for r in self.products)
+        return sum(r.canon_raw for r in self.products)
+
+
+def _parse_product(el):
+    vals = {}
+    for child in el:
+        tag = _local(child.tag)
+        if tag not in vals:
+            vals[tag] = child.text
+    sku = vals.get("SKU") or ""
+    pn = vals.get("Partnumber") or ""
+    desc = vals.get("ProductDescription") or ""
+    return ProductRow(
+        name=desc or pn or sku,
+        sku=sku,
+        pn=pn,
+        qty=_to_float(vals.get("Quantity")),
+        price_wo=_to_float(vals.get("PriceWithoutCanon")),
+        canon_raw=_to_float(vals.get("CanonLPI")),
+    )
+
+
+def _parse_operation(op):
+    vals = {}
+    products = []
+    for child in op:
+        tag = _local(child.tag)
+        if tag == "Products":
+            products.extend(_parse_product(p) for p in child if _local(p.tag) == "Product")
+        elif tag not in vals:
+            vals[tag] = child.text
+
+    def _s(tag):
+        return (vals.get(tag) or "").strip()
+
+    internal_ref = _s("InternalReference")
+    if not internal_ref and vals.get("DeliveryComment"):
+        m = _EXT_REF_RE.search(vals["DeliveryComment"])
+        if m:
+            internal_ref = m.group(0)
+
+    transfer_ref = ""
+    for tag in TRANSFER_REF_TAGS:
+        if vals.get(tag):
+            transfer_ref = vals[tag].strip()
+            break
+    if not transfer_ref:
+        transfer_ref = _s("InternalReference")
+
+    return OrderStatus(
+        has_operation=True,
+        state=vals.get("Status"),
+        code=_s("Code"),
+        internal_ref=internal_ref,
+        transfer_ref=transfer_ref,
+        shipping=_to_float(vals.get("Shippingcost")),
+        tax=_to_float(vals.get("Tax")),
+        total=_to_float(vals.get("Total")),
+        canon_op=_to_float(vals.get("CanonLPI")),
+        other_cost=_to_float(vals.get("OtherCost")),
+        tracking_url=_s("TrackingUrl"),
+        tracking_number=_s("TrackingNumber"),
+        tracking_status=_s("TrackingStatus"),
+        tracking_status_dt=_s("TrackingStatusDateTime"),
+        tracking_status_detail=_s("TrackingStatusDetail"),
+        shipping_agent=_s("ShippingAgent"),
+        products=products,
+    )
+
+
+def parse_order_status(body):
+    """Parsea el cuerpo de /api/order/status.
+
+    Sin ``Operation`` devuelve el estado textual ("State of Order: ...") o
+    "Desconocido". Lanza ``InfortisaParseError`` si el XML está mal formado.
+    """
+    body = body or ""
+    if "<OrderStatusResponse" in body:
+        try:
+            root = ET.fromstring(body)
+        except (ET.ParseError, ValueError) as e:
+            raise InfortisaParseError(str(e)) from e
+        op = next(root.iter(_OPERATION_TAG), None)
+        if op is not None:
+            return _parse_operation(op)
+    if "State of Order:" in body:
+        return OrderStatus(state=body.split("State of Order:")[1].split("<")[0].strip())
+    return OrderStatus(state="Desconocido")
+
+
+def customer_reference(body):
+    """``CustomerReference`` incluido en el cuerpo (notificaciones push), o "" si no viene."""
+    m = _CUSTOMER_REF_RE.search(body or "")
+    return m.group(1) if m else ""
@@ -0,0 +1,19 @@
+# infortisa_orders/models/infortisa_payment_context.py
+"""Datos comunes a todos los pagos ISO20022 de una ejecución.
+
+Diario de banco, método de pago y módulos instalados son los mismos para
+todos los pedidos: se resuelven una vez por ejecución del cron o acción
+masiva (ver ``SaleOrder._infortisa_payment_context``) y se pasan a
+``_create_vendor_payment_and_xml``. No se cachea entre peticiones porque
+contiene recordsets.
+"""
+from dataclasses import dataclass, field
+
+
+@dataclass
+class InfortisaPaymentContext:
+    bank_journal: object
+    pm_line: object
+    modules_error: str = ""
+    # partner_id -> res.partner.bank, se rellena bajo demanda
+    vendor_banks: dict = field(default_factory=dict)
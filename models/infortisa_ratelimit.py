@@ -0,0 +1,78 @@
+# infortisa_orders/models/infortisa_ratelimit.py
+"""Token bucket de la API de Infortisa con dos carriles.
+
+El cubo es único para todos los workers (``infortisa.rate.bucket``); aquí sólo
+está la aritmética y la vista local de un cliente. El carril ``interactive``
+(botones de usuario) puede gastar todo el cubo; el carril ``bulk`` (crons,
+cola, envío masivo) deja siempre una reserva para el interactivo, así un clic
+nunca espera detrás de un cron. No depende de Odoo.
+"""
+import threading
+import time
+
+from .infortisa_metrics import METRICS
+
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+# Espera máxima por llamada antes de rendirse, por carril (segundos)
+MAX_WAIT = {LANE_INTERACTIVE: 10.0, LANE_BULK: 30.0}
+
+
+class RateLimitedError(Exception):
+    """No hubo cupo para la llamada dentro de la espera máxima del carril."""
+
+    def __init__(self, lane=LANE_BULK):
+        super().__init__("Límite de llamadas a la API de Infortisa alcanzado (carril %s)" % lane)
+        self.lane = lane
+
+
+def refill(tokens, elapsed_s, rate_per_s, capacity):
+    return min(float(capacity), tokens + max(0.0, elapsed_s) * rate_per_s)
+
+
+def grant(tokens, wanted, floor=0.0):
+    """Fichas enteras que se pueden entregar sin bajar de ``floor``."""
+    return max(0, min(int(wanted), int(tokens - floor)))
+
+
+class RateLimiter:
+    """Fichas pedidas al cubo compartido en bloques de ``prefetch`` y gastadas una por llamada.
+
+    ``take(lane, wanted)`` devuelve ``(concedidas, segundos_hasta_la_siguiente)``;
+    se llama desde el hilo que se queda sin fichas, así que no debe usar el
+    cursor de la petición.
+    """
+
+    def __init__(self, take, lane=LANE_INTERACTIVE, prefetch=1, max_wait=None):
+        self.take = take
+        self.lane = lane
+        self.prefetch = max(1, prefetch)
+        self.max_wait = MAX_WAIT[lane] if max_wait is None else max_wait
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Con el lock tomado: los hilos del pool esperan en fila a que haya cupo
+        with self._lock:
+            if self.tokens:
+                self.tokens -= 1
+                return
+            started = time.monotonic()
+            while True:
+                granted, wait = self.take(self.lane, self.prefetch)
+                if granted:
+                    self.tokens = granted - 1
+                    waited = time.monotonic() - started
+                    if waited:
+                        METRICS.observe("infortisa_rate_wait_seconds", waited, lane=self.lane)
+                    return
+                if time.monotonic() - started + wait > self.max_wait:
+                    METRICS.inc("infortisa_rate_limited_total", lane=self.lane)
+                    raise RateLimitedError(self.lane)
+                time.sleep(max(wait, 0.05))
+
+    def unused(self):
+        """Fichas pedidas y no gastadas (se devuelven al cubo al terminar)."""
+        with self._lock:
+            tokens, self.tokens = self.tokens, 0
+        return tokens
@@ -0,0 +1,90 @@
+# infortisa_orders/models/infortisa_trace.py
+"""Trazas ligeras por pedido: tiempo por etapa e id de correlación.
+
+Una ``OrderTrace`` acompaña a un pedido durante la consulta de estado (HTTP,
+parseo, tracking, HTML, escritura ORM, factura, pago, chatter). El id de
+correlación viaja a la API en la cabecera ``X-Correlation-ID`` y se guarda en
+``infortisa.api.log``. Opcionalmente captura un perfil cProfile de las fases
+ORM. No depende de Odoo.
+"""
+import cProfile
+import io
+import pstats
+import time
+import uuid
+from contextlib import contextmanager
+
+CORRELATION_HEADER = "X-Correlation-ID"
+
+
+def new_correlation_id():
+    return uuid.uuid4().hex
+
+
+class OrderTrace:
+
+    def __init__(self, order_name="", correlation_id=None, profile=False):
+        self.order_name = order_name or ""
+        self.correlation_id = correlation_id or new_correlation_id()
+        self.stages = {}  # etapa -> segundos acumulados
+        self._profiler = cProfile.Profile() if profile else None
+        self._profiled = False
+
+    @property
+    def headers(self):
+        return {CORRELATION_HEADER: self.correlation_id}
+
+    @property
+    def profiled(self):
+        return self._profiled
+
+    @property
+    def total_ms(self):
+        return sum(self.stages.values()) * 1000
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + max(0.0, seconds)
+
+    @contextmanager
+    def span(self, stage):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(stage, time.monotonic() - started)
+
+    @contextmanager
+    def run(self):
+        """Envuelve una fase ORM: perfila (si se pidió) y anota como ``other`` el tiempo sin etapa."""
+        before = sum(self.stages.values())
+        started = time.monotonic()
+        profiling = False
+        if self._profiler is not None:
+            try:
+                self._profiler.enable()
+                profiling = True
+            except ValueError:
+                # Otro perfilador activo en el hilo (p. ej. el de Odoo): se omite el perfil
+                self._profiler = None
+        try:
+            yield self
+        finally:
+            if profiling:
+                self._profiler.disable()
+                self._profiled = True
+            spanned = sum(self.stages.values()) - before
+            self.add("other", (time.monotonic() - started) - spanned)
+
+    def breakdown(self):
+        """``{etapa: ms}`` de mayor a menor."""
+        return {
+            stage: round(seconds * 1000, 1)
+            for stage, seconds in sorted(self.stages.items(), key=lambda kv: -kv[1])
+        }
+
+    def profile_text(self, limit=40):
+        if not self._profiled:
+            return ""
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
@@ -0,0 +1,77 @@
+# infortisa_orders/models/metric.py
+import logging
+import time
+
+from odoo import api, fields, models
+
+from .infortisa_metrics import METRICS, render_prometheus
+
+_logger = logging.getLogger(__name__)
+
+# Vuelcos oportunistas (fuera de crons y del endpoint) como mucho cada tantos segundos por proceso
+FLUSH_INTERVAL = 30.0
+_last_flush = [0.0]
+
+
+class InfortisaMetric(models.Model):
+    """Valores acumulados de las métricas Infortisa de todos los workers.
+
+    Cada proceso suma sus deltas en memoria con un único UPSERT (ver
+    ``_flush_metrics``); el endpoint Prometheus lee esta tabla.
+    """
+
+    _name = "infortisa.metric"
+    _description = "Métrica Infortisa"
+    _log_access = False
+    _order = "name, labels"
+
+    name = fields.Char("Muestra", required=True, readonly=True)
+    labels = fields.Char("Etiquetas", default="", readonly=True)
+    value = fields.Float("Valor", readonly=True)
+
+    _sql_constraints = [
+        ("name_labels_uniq", "unique(name, labels)", "Métrica duplicada."),
+    ]
+
+    @api.model
+    def _flush_metrics(self, min_interval=0.0):
+        """Vuelca a la base de datos los deltas acumulados en este proceso.
+
+        Con un cursor propio que se confirma enseguida: si la transacción de
+        quien llama se deshace después (un error HTTP, un ``UserError``), los
+        contadores, justo los de errores, no se pierden con ella.
+        ``min_interval`` limita los vuelcos oportunistas de los workers HTTP.
+        """
+        now = time.monotonic()
+        if min_interval and now - _last_flush[0] < min_interval:
+            return 0
+        _last_flush[0] = now
+        rows = METRICS.drain()
+        if not rows:
+            return 0
+        values = ", ".join(["(%s, %s, %s)"] * len(rows))
+        params = [p for row in rows for p in row]
+        try:
+            with self.env.registry.cursor() as cr:
+                cr.execute(
+                    f"""
+                    INSERT INTO infortisa_metric (name, labels, value) VALUES {values}
+                    ON CONFLICT (name, labels) DO UPDATE SET value = infortisa_metric.value + EXCLUDED.value
+                    """,
+                    params,
+                )
+        except Exception:
+            _logger.exception("Infortisa: no se pudieron guardar las métricas")
+            METRICS.restore(rows)
+            return 0
+        self.invalidate_model()
+        return len(rows)
+
+    @api.model
+    def _render_prometheus(self):
+        self._flush_metrics()
+        # Cursor nuevo: la instantánea de la petición es anterior al vuelco
+        with self.env.registry.cursor() as cr:
+            cr.execute("SELECT name, labels, value FROM infortisa_metric")
+            rows = cr.fetchall()
+        return render_prometheus([(n, l or "", v) for n, l, v in rows])
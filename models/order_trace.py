@@ -0,0 +1,73 @@
+# infortisa_orders/models/order_trace.py
+import logging
+
+from odoo import api, fields, models
+
+from .infortisa_metrics import METRICS
+
+_logger = logging.getLogger(__name__)
+
+
+class InfortisaOrderTrace(models.Model):
+    """Pedidos lentos (o perfilados) en la consulta de estado, con su desglose por etapa.
+
+    Sólo se guardan los que superan ``infortisa.slow_order_ms`` o los que se
+    perfilaron con el contexto ``infortisa_profile``; ver ``OrderTrace``.
+    """
+
+    _name = "infortisa.order.trace"
+    _description = "Traza de pedido Infortisa"
+    _order = "id desc"
+    _rec_name = "correlation_id"
+
+    order_id = fields.Many2one("sale.order", string="Pedido", index=True, ondelete="cascade", readonly=True)
+    correlation_id = fields.Char("Id. de correlación", index=True, readonly=True)
+    source = fields.Selection([("manual", "Manual"), ("cron", "Cron"), ("push", "Notificación")], string="Origen", readonly=True)
+    total_ms = fields.Integer("Total (ms)", readonly=True)
+    slowest_stage = fields.Char("Etapa más lenta", readonly=True)
+    stage_ms = fields.Json("Etapas (ms)", readonly=True)
+    breakdown = fields.Char("Desglose", compute="_compute_breakdown")
+    profile = fields.Text("Perfil (cProfile)", readonly=True)
+
+    @api.depends("stage_ms")
+    def _compute_breakdown(self):
+        for rec in self:
+            rec.breakdown = " · ".join(f"{stage} {ms:.0f} ms" for stage, ms in (rec.stage_ms or {}).items())
+
+    @api.model
+    def _prepare_vals(self, order, trace, source):
+        stages = trace.breakdown()
+        return {
+            "order_id": order.id,
+            "correlation_id": trace.correlation_id,
+            "source": source,
+            "total_ms": int(trace.total_ms),
+            "slowest_stage": next(iter(stages), False),
+            "stage_ms": stages,
+            "profile": trace.profile_text() or False,
+        }
+
+    @api.model
+    def _purge(self, limit_date):
+        self.env.cr.execute("DELETE FROM infortisa_order_trace WHERE create_date < %s", (limit_date,))
+        count = self.env.cr.rowcount
+        self.invalidate_model()
+        return count
+
+    @api.model
+    def _record(self, traces, source):
+        """Guarda las trazas ``{pedido: OrderTrace}`` lentas o perfiladas (un único create)."""
+        threshold = self.env["sale.order"]._infortisa_config().slow_order_ms
+        vals_list = []
+        for order, trace in traces.items():
+            slow = threshold > 0 and trace.total_ms >= threshold
+            if not (slow or trace.profiled):
+                continue
+            if slow:
+                METRICS.inc("infortisa_slow_orders_total", source=source)
+                _logger.info(
+                    "Infortisa: pedido lento %s (%.0f ms, correlación %s): %s",
+                    order.name, trace.total_ms, trace.correlation_id, trace.breakdown(),
+                )
+            vals_list.append(self._prepare_vals(order, trace, source))
+        return self.sudo().create(vals_list) if vals_list else self.browse()
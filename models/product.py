@@ -0,0 +1,82 @@
+# infortisa_orders/models/product.py
+from odoo import api, fields, models
+
+
+class ProductTemplate(models.Model):
+    _inherit = "product.template"
+
+    # Se mantiene explícitamente desde product.supplierinfo y al cambiar el proveedor
+    # configurado; no es un compute para no arrastrar recálculos sobre pedidos históricos.
+    infortisa_product = fields.Boolean(
+        "Producto Infortisa",
+        index=True,
+        copy=False,
+        readonly=True,
+        help="El proveedor Infortisa configurado figura entre los proveedores del producto.",
+    )
+
+    @api.model
+    def _infortisa_refresh_product_flags(self, template_ids=None):
+        """Recalcula ``infortisa_product`` en SQL (todas las plantillas si ``template_ids`` es None)
+        y propaga el cambio a ``infortisa_allowed`` de los pedidos abiertos afectados.
+        """
+        if template_ids is not None and not template_ids:
+            return []
+        self.env["product.supplierinfo"].flush_model(["partner_id", "product_tmpl_id"])
+        self.flush_model(["infortisa_product"])
+        vendor_id = self.env["sale.order"]._infortisa_config().vendor_id
+        query = """
+            UPDATE product_template pt
+               SET infortisa_product = t.flag
+              FROM (
+                    SELECT p.id,
+                           EXISTS (
+                               SELECT 1 FROM product_supplierinfo si
+                                WHERE si.product_tmpl_id = p.id AND si.partner_id = %(vendor)s
+                           ) AS flag
+                      FROM product_template p
+                     WHERE %(all)s OR p.id = ANY(%(ids)s)
+                   ) t
+             WHERE pt.id = t.id
+               AND COALESCE(pt.infortisa_product, FALSE) IS DISTINCT FROM t.flag
+         RETURNING pt.id
+        """
+        self.env.cr.execute(query, {
+            "vendor": vendor_id or 0,
+            "all": template_ids is None,
+            "ids": list(template_ids or []),
+        })
+        changed = [r[0] for r in self.env.cr.fetchall()]
+        if changed:
+            self.invalidate_model(["infortisa_product"])
+            self.env["product.product"].invalidate_model(["infortisa_product"])
+            self.env["sale.order"]._infortisa_recompute_allowed_sql(changed)
+        return changed
+
+
+class ProductSupplierinfo(models.Model):
+    _inherit = "product.supplierinfo"
+
+    def _infortisa_templates(self):
+        return self.product_tmpl_id | self.product_id.product_tmpl_id
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env["product.template"]._infortisa_refresh_product_flags(records._infortisa_templates().ids)
+        return records
+
+    def write(self, vals):
+        if not {"partner_id", "product_tmpl_id", "product_id"} & set(vals):
+            return super().write(vals)
+        templates = self._infortisa_templates()
+        res = super().write(vals)
+        templates |= self._infortisa_templates()
+        self.env["product.template"]._infortisa_refresh_product_flags(templates.ids)
+        return res
+
+    def unlink(self):
+        templates = self._infortisa_templates()
+        res = super().unlink()
+        self.env["product.template"]._infortisa_refresh_product_flags(templates.exists().ids)
+        return res
@@ -0,0 +1,91 @@
+# infortisa_orders/models/rate_bucket.py
+from odoo import api, fields, models
+
+from .infortisa_ratelimit import LANE_BULK, LANE_INTERACTIVE, RateLimiter, grant, refill
+
+BUCKET_KEY = "api"
+
+
+def _lock_bucket(cr, capacity):
+    """``(fichas, segundos desde la última actualización)`` con la fila bloqueada; la crea llena si falta."""
+    query = (
+        "SELECT tokens, EXTRACT(EPOCH FROM (clock_timestamp() AT TIME ZONE 'UTC' - updated_at))"
+        "  FROM infortisa_rate_bucket WHERE name = %s FOR UPDATE"
+    )
+    cr.execute(query, (BUCKET_KEY,))
+    row = cr.fetchone()
+    if row is None:
+        cr.execute(
+            """
+            INSERT INTO infortisa_rate_bucket (name, tokens, updated_at)
+            VALUES (%s, %s, clock_timestamp() AT TIME ZONE 'UTC') ON CONFLICT (name) DO NOTHING
+            """,
+            (BUCKET_KEY, float(capacity)),
+        )
+        cr.execute(query, (BUCKET_KEY,))
+        row = cr.fetchone()
+    return row[0] or 0.0, float(row[1] or 0.0)
+
+
+class InfortisaRateBucket(models.Model):
+    """Cubo de fichas (token bucket) de la API, compartido por todos los workers.
+
+    Como el circuit breaker, se lee y actualiza con un cursor propio en
+    transacciones muy cortas (``SELECT ... FOR UPDATE`` de una fila), y con el
+    reloj de PostgreSQL para no depender de la hora de cada nodo.
+    """
+
+    _name = "infortisa.rate.bucket"
+    _description = "Límite de llamadas a la API de Infortisa"
+    _log_access = False
+    _rec_name = "name"
+
+    name = fields.Char("Clave", required=True, readonly=True)
+    tokens = fields.Float("Fichas disponibles", readonly=True)
+    updated_at = fields.Datetime("Actualizado", readonly=True)
+
+    _sql_constraints = [
+        ("name_uniq", "unique(name)", "Cubo duplicado."),
+    ]
+
+    @api.model
+    def _limiter(self, lane=LANE_INTERACTIVE, prefetch=1):
+        """``RateLimiter`` del carril, o None si no hay límite configurado."""
+        cfg = self.env["sale.order"]._infortisa_config()
+        if cfg.rate_limit_per_minute <= 0:
+            return None
+        rate = cfg.rate_limit_per_minute / 60.0
+        capacity = max(1, cfg.rate_burst)
+        floor = min(max(0, cfg.rate_reserve), capacity - 1) if lane == LANE_BULK else 0
+        registry = self.env.registry
+
+        def take(lane, wanted):
+            # Se ejecuta también en los hilos del pool: sólo el registro, nunca self.env
+            with registry.cursor() as cr:
+                tokens, elapsed = _lock_bucket(cr, capacity)
+                tokens = refill(tokens, elapsed, rate, capacity)
+                granted = grant(tokens, wanted, floor)
+                tokens -= granted
+                cr.execute(
+                    "UPDATE infortisa_rate_bucket SET tokens = %s, updated_at = clock_timestamp() AT TIME ZONE 'UTC'"
+                    " WHERE name = %s",
+                    (tokens, BUCKET_KEY),
+                )
+            return granted, (0.0 if granted else (floor + 1 - tokens) / rate)
+
+        return RateLimiter(take, lane=lane, prefetch=prefetch)
+
+    @api.model
+    def _give_back(self, limiter):
+        """Devuelve al cubo las fichas que el cliente pidió y no llegó a gastar."""
+        if limiter is None:
+            return
+        unused = limiter.unused()
+        if not unused:
+            return
+        capacity = max(1, self.env["sale.order"]._infortisa_config().rate_burst)
+        with self.env.registry.cursor() as cr:
+            cr.execute(
+                "UPDATE infortisa_rate_bucket SET tokens = LEAST(%s, tokens + %s) WHERE name = %s",
+                (float(capacity), unused, BUCKET_KEY),
+            )
@@ -11,10 +11,15 @@ class InfortisaRawWizard(models.TransientModel):
 
     @api.model
     def open_for_order(self, order_id):
-        order = self.env["sale.order"].browse(order_id)
+        Log = self.env["infortisa.api.log"].sudo()
+        last = Log.search([("order_id", "=", order_id)], limit=1)
+        last_req = Log.search([
+            ("order_id", "=", order_id),
+            ("endpoint", "in", ("order/create", "order/blockorder")),
+        ], limit=1)
         wiz = self.create({
-            "payload": order.infortisa_last_payload or "",
-            "response": order.infortisa_last_response or "",
+            "payload": last_req.request_body or "",
+            "response": last.response_body or "",
         })
         return {
             "type": "ir.actions.act_window",
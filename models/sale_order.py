@@ -1,21 +1,80 @@
 # -*- coding: utf-8 -*-
 import logging
-import requests
 import json
 import xml.etree.ElementTree as ET
 import re
-import base64
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
 
 from xml.sax.saxutils import escape as xml_escape
-from odoo import api, fields, models, _
+
+import requests
+
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError
 
+from .infortisa_breaker import CircuitOpenError
+from .infortisa_changeset import InfortisaChangeSet
+from .infortisa_client import InfortisaClient
+from .infortisa_config import InfortisaConfig
+from .infortisa_metrics import METRICS
+from .infortisa_payment_context import InfortisaPaymentContext
+from .infortisa_parser import parse_order_status
+from .infortisa_ratelimit import LANE_BULK, LANE_INTERACTIVE, RateLimitedError
+from .infortisa_trace import OrderTrace
+from .metric import FLUSH_INTERVAL
+
 _logger = logging.getLogger(__name__)
 
+# URL por defecto; se puede cambiar con infortisa.base_url (p. ej. benchmarks/mock_infortisa.py)
 INFORTISA_BASE = "https://apiv2.infortisa.com"
 # Estados en los que NO debemos intentar crear factura/pago/XML
 BLOCKED_CODE_PREFIXES = ("VX/", "VN/", "VA/", "HR/")  # sin stock, anulado, empaquetado, pagado
 
+# Planificador de consultas de estado: (intervalo base, intervalo máximo) en minutos por tier.
+# Si una consulta no trae cambios, el intervalo se duplica hasta el máximo (backoff).
+POLL_TIERS = {
+    "fast": (1, 10),        # Importing / sin codigo de operacion todavia
+    "normal": (5, 60),      # pendiente de transferencia, preparacion...
+    "transit": (30, 240),   # en transporte o ya pagado, esperando entrega
+}
+# Etiquetas de OrderStatusResponse que cambian en cada consulta sin que cambie el pedido;
+# se ignoran al calcular la huella de la respuesta.
+VOLATILE_STATUS_TAGS = ("ResponseDate", "ResponseDateTime", "RequestDate", "ServerDateTime", "Timestamp", "ExecutionTime")
+_VOLATILE_STATUS_RE = re.compile(
+    r"<(?:\w+:)?(%s)\b[^>]*?(?:/>|>.*?</(?:\w+:)?\1\s*>)" % "|".join(VOLATILE_STATUS_TAGS), re.S
+)
+# Respuesta de estado de una CustomerReference que Infortisa no conoce
+_NOT_FOUND_STATUS_RE = re.compile(r"not\s+found|no\s+encontrad|no\s+existe", re.I)
+# Crons adicionales del cron de estado (ver infortisa.poll_shards); reclaman bloques disjuntos
+POLL_SHARD_CRONS = (
+    "infortisa_orders.ir_cron_infortisa_poll_status_shard_2",
+    "infortisa_orders.ir_cron_infortisa_poll_status_shard_3",
+    "infortisa_orders.ir_cron_infortisa_poll_status_shard_4",
+)
+# Primera clave de los advisory locks de la consulta manual (la segunda es el id del pedido)
+MANUAL_POLL_LOCK_KEY = 7461
+CANCELLED_CODE_PREFIXES = ("VN/",)
+DELIVERED_TRACKING_MARKERS = ("ENTREGAD", "DELIVERED")
+# Campos de dirección usados por _infortisa_build_shipping_values / _is_ceuta_address
+SHIPPING_ADDRESS_FIELDS = (
+    "name", "phone", "mobile", "street", "street2", "zip", "city",
+    "country_id.code", "state_id.name", "state_id.code",
+)
+
+
+class InfortisaSendError(UserError):
+    """Infortisa no aceptó el pedido. ``retryable``: fallo suyo (HTTP 429/5xx), no del pedido."""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
 
 class ResConfigSettings(models.TransientModel):
     _inherit = "res.config.settings"
@@ -70,17 +129,178 @@ class ResConfigSettings(models.TransientModel):
         default=False,
     )
 
+    def set_values(self):
+        old_cfg = self.env["sale.order"]._infortisa_config()
+        super().set_values()
+        # Fuerza reconstruir la instantánea de configuración (también diarios/productos resueltos)
+        self.env.registry.clear_cache()
+        cfg = self.env["sale.order"]._infortisa_config()
+        if cfg.vendor_id != old_cfg.vendor_id:
+            # Un único recálculo en bloque (productos y pedidos abiertos) en vez de uno por registro
+            self.env["product.template"]._infortisa_refresh_product_flags()
+        if cfg.test_mode != old_cfg.test_mode:
+            self.env["sale.order"]._infortisa_refresh_mode_display()
+        if cfg.poll_shards != old_cfg.poll_shards:
+            self.env["sale.order"]._infortisa_apply_poll_shards(cfg.poll_shards)
+
+    # Cron de estado: descarga concurrente
+    infortisa_poll_workers = fields.Integer(
+        string="Hilos de consulta concurrentes",
+        config_parameter="infortisa.poll_workers",
+        default=8,
+    )
+    infortisa_poll_batch_limit = fields.Integer(
+        string="Pedidos máximos por ejecución del cron",
+        config_parameter="infortisa.poll_batch_limit",
+        default=500,
+    )
+
+    infortisa_poll_chunk_size = fields.Integer(
+        string="Pedidos por bloque (commit)",
+        config_parameter="infortisa.poll_chunk_size",
+        default=50,
+    )
+    infortisa_poll_time_budget = fields.Integer(
+        string="Tiempo máximo por ejecución del cron (s)",
+        config_parameter="infortisa.poll_time_budget",
+        default=50,
+    )
+    infortisa_poll_shards = fields.Integer(
+        string="Crons de estado en paralelo",
+        config_parameter="infortisa.poll_shards",
+        default=1,
+        help="De 1 a %s. Cada cron adicional puede ejecutarse en otro worker o nodo." % (len(POLL_SHARD_CRONS) + 1),
+    )
+    infortisa_slow_order_ms = fields.Integer(
+        string="Umbral de pedido lento (ms)",
+        config_parameter="infortisa.slow_order_ms",
+        default=5000,
+    )
+
+    # Cliente HTTP
+    infortisa_base_url = fields.Char(
+        string="URL base de la API",
+        config_parameter="infortisa.base_url",
+        help="Vacío = %s. Útil para apuntar a un servidor de pruebas local." % INFORTISA_BASE,
+    )
+    infortisa_connect_timeout = fields.Integer(
+        string="Timeout de conexión (s)",
+        config_parameter="infortisa.connect_timeout",
+        default=5,
+    )
+    infortisa_read_timeout = fields.Integer(
+        string="Timeout de lectura (s)",
+        config_parameter="infortisa.read_timeout",
+        default=60,
+    )
+    infortisa_get_retries = fields.Integer(
+        string="Reintentos en consultas (GET)",
+        config_parameter="infortisa.get_retries",
+        default=2,
+    )
+    infortisa_breaker_failures = fields.Integer(
+        string="Fallos para abrir el circuito",
+        config_parameter="infortisa.breaker_failures",
+        default=5,
+    )
+    infortisa_breaker_cooldown = fields.Integer(
+        string="Espera con el circuito abierto (s)",
+        config_parameter="infortisa.breaker_cooldown",
+        default=60,
+    )
+    infortisa_breaker_slow_ms = fields.Integer(
+        string="Latencia considerada fallo (ms)",
+        config_parameter="infortisa.breaker_slow_ms",
+        default=20000,
+    )
+    infortisa_rate_limit_per_minute = fields.Integer(
+        string="Llamadas por minuto",
+        config_parameter="infortisa.rate_limit_per_minute",
+        default=0,
+    )
+    infortisa_rate_burst = fields.Integer(
+        string="Ráfaga máxima",
+        config_parameter="infortisa.rate_burst",
+        default=20,
+    )
+    infortisa_rate_reserve = fields.Integer(
+        string="Reserva para usuarios",
+        config_parameter="infortisa.rate_reserve",
+        default=5,
+    )
+
+    # Facturas de proveedor
+    infortisa_bill_mode = fields.Selection(
+        [
+            ("order", "Una factura por pedido"),
+            ("daily", "Factura diaria consolidada"),
+            ("transfer", "Factura por referencia de transferencia"),
+        ],
+        string="Agrupación de facturas proveedor",
+        config_parameter="infortisa.bill_mode",
+        default="order",
+    )
+
+    # Lotes de pago ISO20022
+    infortisa_payment_batch_mode = fields.Selection(
+        [("order", "Un lote por pedido"), ("daily", "Lote diario agregado")],
+        string="Agrupación de pagos ISO20022",
+        config_parameter="infortisa.payment_batch_mode",
+        default="order",
+    )
+
+    # Métricas Prometheus (/infortisa/metrics)
+    infortisa_metrics_token = fields.Char(
+        string="Token de métricas",
+        config_parameter="infortisa.metrics_token",
+    )
+
+    # Notificaciones de estado (/infortisa/status)
+    infortisa_push_token = fields.Char(
+        string="Token de notificaciones",
+        config_parameter="infortisa.push_token",
+    )
+    infortisa_push_poll_factor = fields.Integer(
+        string="Consulta de conciliación (x intervalo)",
+        config_parameter="infortisa.push_poll_factor",
+        default=6,
+    )
+
+    # Cola de envío
+    infortisa_api_log_retention_days = fields.Integer(
+        string="Días de historial API",
+        config_parameter="infortisa.api_log_retention_days",
+        default=30,
+    )
+    infortisa_send_max_attempts = fields.Integer(
+        string="Intentos máximos de envío",
+        config_parameter="infortisa.send_max_attempts",
+        default=8,
+    )
+    infortisa_tracking_digest = fields.Boolean(
+        string="Agrupar seguimientos por cliente",
+        config_parameter="infortisa.tracking_digest",
+        default=False,
+    )
+    infortisa_send_batch_size = fields.Integer(
+        string="Envíos por ejecución de la cola",
+        config_parameter="infortisa.send_batch_size",
+        default=50,
+    )
+
 
 class SaleOrder(models.Model):
     _inherit = "sale.order"
 
     # ---- Trazas de Infortisa
-    infortisa_customer_ref = fields.Char("Ref. Cliente (Infortisa)", copy=False)
+    infortisa_customer_ref = fields.Char("Ref. Cliente (Infortisa)", copy=False, index="btree_not_null")
     infortisa_internal_ref = fields.Char("Ref. Interna (Infortisa)", copy=False, readonly=True)
     infortisa_op_code = fields.Char("Codigo operacion (Infortisa)", copy=False, readonly=True)
     infortisa_state = fields.Char("Estado Infortisa", copy=False, readonly=True)
-    infortisa_last_payload = fields.Text("XML enviado (crudo)", copy=False, readonly=True)
-    infortisa_last_response = fields.Text("Ultima respuesta (crudo)", copy=False, readonly=True)
+    # XML crudo: se lee del historial infortisa.api.log (no se guarda en sale_order)
+    infortisa_last_payload = fields.Text("XML enviado (crudo)", compute="_compute_infortisa_last_exchange")
+    infortisa_last_response = fields.Text("Ultima respuesta (crudo)", compute="_compute_infortisa_last_exchange")
+    infortisa_api_log_ids = fields.One2many("infortisa.api.log", "order_id", string="Historial API Infortisa")
     infortisa_sent = fields.Boolean("Enviado a Infortisa", default=False, copy=False)
 
     # ---- Importes del API (se actualizan al consultar estado)
@@ -95,18 +315,18 @@ class SaleOrder(models.Model):
     # Detalle productos del API renderizado (HTML de solo lectura)
     infortisa_products_html = fields.Html("Detalle productos (API)", readonly=True, sanitize=False)
 
-    # --- Resumen humano (solo lectura)
+    # --- Resumen humano (solo lectura, almacenado: no se recalcula en cada lectura/listado)
     infortisa_mode_display = fields.Char(
-        "Modo Infortisa", readonly=True, compute="_compute_infortisa_summary", store=False
+        "Modo Infortisa", readonly=True, compute="_compute_infortisa_summary", store=True
     )
     infortisa_delivery_type = fields.Char(
-        "Tipo de envio", readonly=True, compute="_compute_infortisa_summary", store=False
+        "Tipo de envio", readonly=True, compute="_compute_infortisa_summary", store=True
     )
     infortisa_shipping_display = fields.Text(
-        "Direccion de entrega", readonly=True, compute="_compute_infortisa_summary", store=False
+        "Direccion de entrega", readonly=True, compute="_compute_infortisa_summary", store=True
     )
     infortisa_comment_display = fields.Char(
-        "Comentarios", readonly=True, compute="_compute_infortisa_summary", store=False
+        "Comentarios", readonly=True, compute="_compute_infortisa_summary", store=True
     )
 
     # ---- Enlace a la factura de proveedor creada desde Infortisa
@@ -118,6 +338,10 @@ class SaleOrder(models.Model):
         domain=[("move_type", "=", "in_invoice")],
     )
 
+    infortisa_vendor_bill_line_ids = fields.One2many(
+        "account.move.line", "infortisa_order_id", string="Líneas factura proveedor Infortisa", readonly=True
+    )
+
     # ---- Referencia transferencia + pago proveedor
     infortisa_transfer_ref = fields.Char("Referencia transferencia (Infortisa)", copy=False, readonly=True)
     infortisa_vendor_payment_id = fields.Many2one(
@@ -164,46 +388,146 @@ class SaleOrder(models.Model):
         readonly=True,
     )
 
+    # --- Cola de envío asíncrono
+    infortisa_send_queue_ids = fields.One2many(
+        "infortisa.send.queue", "order_id", string="Cola de envío Infortisa", readonly=True
+    )
+
+    # --- Planificador de consultas de estado (cron)
+    infortisa_poll_tier = fields.Selection(
+        [
+            ("fast", "Rápido (importando)"),
+            ("normal", "Normal"),
+            ("transit", "En tránsito"),
+            ("stopped", "Detenido (estado final)"),
+        ],
+        string="Frecuencia consulta Infortisa",
+        default="fast",
+        copy=False,
+        readonly=True,
+    )
+    infortisa_next_poll_at = fields.Datetime(
+        "Próxima consulta Infortisa", index="btree_not_null", copy=False, readonly=True
+    )
+    # Reserva del pedido por un cron de estado (ver _infortisa_claim_due_orders)
+    infortisa_poll_lease_until = fields.Datetime("Consulta Infortisa en curso hasta", copy=False, readonly=True)
+    infortisa_poll_misses = fields.Integer(
+        "Consultas sin cambios (Infortisa)", default=0, copy=False, readonly=True
+    )
+    infortisa_status_digest = fields.Char("Huella última respuesta (Infortisa)", copy=False, readonly=True)
+    infortisa_poll_skipped_count = fields.Integer(
+        "Consultas omitidas por respuesta idéntica", default=0, copy=False, readonly=True
+    )
+
     # ====================== UTILIDADES ======================
+    @api.model
+    @tools.ormcache("self.env.company.id")
+    def _infortisa_config(self):
+        """Instantánea de la configuración Infortisa, una vez por registro y compañía.
+
+        Se invalida al guardar los ajustes o escribir cualquier ir.config_parameter.
+        """
+        params = {
+            p["key"][len("infortisa."):]: p["value"]
+            for p in self.env["ir.config_parameter"].sudo().search_read(
+                [("key", "=like", "infortisa.%")], ["key", "value"]
+            )
+        }
+
+        def _existing(model, key):
+            try:
+                rid = int(params.get(key) or 0)
+            except (TypeError, ValueError):
+                rid = 0
+            return rid if rid and self.env[model].sudo().browse(rid).exists() else 0
+
+        Journal = self.env["account.journal"].sudo()
+        company_dom = [("company_id", "=", self.env.company.id)]
+        purchase_journal_id = _existing("account.journal", "journal_id") or Journal.search(
+            [("type", "=", "purchase")] + company_dom, limit=1
+        ).id
+        bank_journal_id = _existing("account.journal", "bank_journal_payment_id")
+        if not bank_journal_id:
+            for dom in ([("code", "=", "BNK5")], [("name", "ilike", "Banco")], []):
+                bank_journal_id = Journal.search([("type", "=", "bank")] + company_dom + dom, limit=1).id
+                if bank_journal_id:
+                    break
+
+        return InfortisaConfig.from_params(
+            params,
+            vendor_id=_existing("res.partner", "vendor_id"),
+            product_purchase_id=_existing("product.product", "product_purchase_id"),
+            product_shipping_id=_existing("product.product", "product_shipping_id"),
+            purchase_journal_id=purchase_journal_id or 0,
+            bank_journal_id=bank_journal_id or 0,
+        )
+
     def _infortisa_vendor_partner(self):
-        ICP = self.env["ir.config_parameter"].sudo()
-        vid = ICP.get_param("infortisa.vendor_id")
-        try:
-            vid_int = int(vid or 0)
-        except Exception:
-            vid_int = 0
-        return self.env["res.partner"].browse(vid_int) if vid_int else self.env["res.partner"].browse(False)
+        return self.env["res.partner"].browse(self._infortisa_config().vendor_id)
 
-    def _line_has_infortisa_vendor(self, line, vendor_partner):
-        if not vendor_partner or not vendor_partner.exists():
-            return False
+    def _line_has_infortisa_vendor(self, line):
         if not line or line.display_type or getattr(line, "is_delivery", False):
             return False
-        product = line.product_id
-        if not product:
-            return False
-        sellers = product.seller_ids.filtered(lambda s: s.partner_id and s.partner_id.id == vendor_partner.id)
-        return bool(sellers)
+        return bool(line.product_id.infortisa_product)
 
     @api.depends(
         "order_line.product_id",
-        "order_line.product_id.seller_ids.partner_id",
         "order_line.display_type",
         "order_line.is_delivery",
     )
     def _compute_infortisa_allowed(self):
-        vendor = self._infortisa_vendor_partner()
+        # El flag del producto lo mantiene product.supplierinfo; los cambios de proveedor
+        # se propagan con _infortisa_recompute_allowed_sql sólo a pedidos abiertos.
         for order in self:
-            allowed = False
-            if vendor and vendor.exists():
-                for l in order.order_line:
-                    try:
-                        if order._line_has_infortisa_vendor(l, vendor):
-                            allowed = True
-                            break
-                    except Exception:
-                        continue
-            order.infortisa_allowed = allowed
+            order.infortisa_allowed = any(order._line_has_infortisa_vendor(l) for l in order.order_line)
+
+    @api.model
+    def _infortisa_recompute_allowed_sql(self, template_ids=None):
+        """Recalcula ``infortisa_allowed`` en bloque para pedidos en borrador/abiertos aún no enviados.
+
+        Con ``template_ids`` sólo se revisan los pedidos que contienen esos productos.
+        """
+        if template_ids is not None and not template_ids:
+            return []
+        self.env["sale.order.line"].flush_model(["order_id", "product_id", "display_type", "is_delivery"])
+        self.env["product.product"].flush_model(["product_tmpl_id"])
+        self.env["product.template"].flush_model(["infortisa_product"])
+        self.flush_model(["state", "infortisa_sent", "infortisa_allowed"])
+        query = """
+            UPDATE sale_order so
+               SET infortisa_allowed = t.allowed
+              FROM (
+                    SELECT o.id,
+                           EXISTS (
+                               SELECT 1
+                                 FROM sale_order_line l
+                                 JOIN product_product pp ON pp.id = l.product_id
+                                 JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                                WHERE l.order_id = o.id
+                                  AND l.display_type IS NULL
+                                  AND NOT COALESCE(l.is_delivery, FALSE)
+                                  AND pt.infortisa_product
+                           ) AS allowed
+                      FROM sale_order o
+                     WHERE o.state IN ('draft', 'sent', 'sale')
+                       AND NOT COALESCE(o.infortisa_sent, FALSE)
+                       AND (%(all)s OR o.id IN (
+                               SELECT l.order_id
+                                 FROM sale_order_line l
+                                 JOIN product_product pp ON pp.id = l.product_id
+                                WHERE pp.product_tmpl_id = ANY(%(ids)s)
+                           ))
+                   ) t
+             WHERE so.id = t.id
+               AND COALESCE(so.infortisa_allowed, FALSE) IS DISTINCT FROM t.allowed
+         RETURNING so.id
+        """
+        self.env.cr.execute(query, {"all": template_ids is None, "ids": list(template_ids or [])})
+        changed = [r[0] for r in self.env.cr.fetchall()]
+        if changed:
+            self.invalidate_model(["infortisa_allowed"])
+            _logger.info("Infortisa: infortisa_allowed recalculado en %s pedidos abiertos.", len(changed))
+        return changed
 
     def _is_ceuta_address(self, partner):
         if not partner:
@@ -255,14 +579,17 @@ class SaleOrder(models.Model):
             }
         return ship, use_ceuta
 
-    def _icp_bool(self, key, default=False):
-        val = self.env["ir.config_parameter"].sudo().get_param(key, str(bool(default)))
-        return str(val).strip().lower() in ("true", "1", "yes", "y", "t")
-
-    @api.depends("partner_shipping_id", "partner_id", "note")
+    @api.depends(
+        "note",
+        "partner_shipping_id",
+        "partner_id",
+        *(f"partner_shipping_id.{f}" for f in SHIPPING_ADDRESS_FIELDS),
+        *(f"partner_id.{f}" for f in SHIPPING_ADDRESS_FIELDS),
+    )
     def _compute_infortisa_summary(self):
+        # infortisa_mode_display depende del ajuste infortisa.test_mode: ver _infortisa_refresh_mode_display
+        test_mode = self._infortisa_config().test_mode
         for order in self:
-            test_mode = order._icp_bool("infortisa.test_mode", False)
             order.infortisa_mode_display = "TEST" if test_mode else "REAL"
             order.infortisa_delivery_type = "ENV"
             ship, _use_ceuta = order._infortisa_build_shipping_values()
@@ -280,8 +607,23 @@ class SaleOrder(models.Model):
                 txt = (order.note or "").strip().replace("<br/>", " ").replace("<br>", " ")
                 order.infortisa_comment_display = " ".join(re.sub(r"<[^>]*>", " ", txt).split())[:100]
 
+    @api.model
+    def _infortisa_refresh_mode_display(self):
+        """Actualiza en bloque el modo mostrado de los pedidos aún no enviados tras cambiar el modo TEST."""
+        mode = "TEST" if self._infortisa_config().test_mode else "REAL"
+        self.flush_model(["infortisa_sent", "infortisa_mode_display"])
+        self.env.cr.execute(
+            """
+            UPDATE sale_order SET infortisa_mode_display = %s
+             WHERE NOT COALESCE(infortisa_sent, FALSE)
+               AND infortisa_mode_display IS DISTINCT FROM %s
+            """,
+            (mode, mode),
+        )
+        self.invalidate_model(["infortisa_mode_display"])
+
     def _get_infortisa_headers(self):
-        api_key = self.env["ir.config_parameter"].sudo().get_param("infortisa.api_key")
+        api_key = self._infortisa_config().api_key
         if not api_key:
             raise UserError(_("Falta la API Key de Infortisa (Ajustes > Infortisa)."))
         return {
@@ -290,6 +632,108 @@ class SaleOrder(models.Model):
             "Content-Type": "text/xml; charset=utf-16",
         }
 
+    def _infortisa_client(self, breaker=None, limiter=None):
+        """Cliente con sesión keep-alive compartida por proceso y las cabeceras de la API Key."""
+        cfg = self._infortisa_config()
+        read_timeout = breaker.read_timeout if breaker is not None and breaker.read_timeout else cfg.read_timeout
+        return InfortisaClient(
+            cfg.base_url or INFORTISA_BASE,
+            self._get_infortisa_headers(),
+            connect_timeout=max(1, cfg.connect_timeout),
+            read_timeout=max(1, read_timeout),
+            get_retries=max(0, cfg.get_retries),
+            pool_size=max(1, cfg.poll_workers),
+            breaker=breaker,
+            limiter=limiter,
+        )
+
+    @contextmanager
+    def _infortisa_api(self, lane=None):
+        """Cliente protegido por el circuit breaker y el límite de llamadas compartidos.
+
+        Lanza ``InfortisaCircuitOpen`` (un ``UserError``) si la API se considera
+        caída. El timeout de lectura se adapta a la latencia observada y, al
+        salir, los resultados de las llamadas se suman al estado compartido.
+
+        ``lane`` es el carril del límite de llamadas: ``interactive`` (por
+        defecto, botones) o ``bulk`` (crons, cola y envío masivo; también con
+        el contexto ``infortisa_lane``). El carril ``bulk`` no gasta la reserva
+        de usuarios y pide las fichas por bloques para los hilos del pool.
+        """
+        self._get_infortisa_headers()  # sin API Key no se toca el circuito
+        lane = lane or self.env.context.get("infortisa_lane") or LANE_INTERACTIVE
+        cfg = self._infortisa_config()
+        Circuit = self.env["infortisa.api.circuit"]
+        Bucket = self.env["infortisa.rate.bucket"]
+        breaker = Circuit._acquire()
+        limiter = Bucket._limiter(lane, prefetch=max(1, cfg.poll_workers) if lane == LANE_BULK else 1)
+        try:
+            yield self._infortisa_client(breaker=breaker, limiter=limiter)
+        except RateLimitedError as e:
+            if lane == LANE_INTERACTIVE:
+                raise UserError(_("Se ha alcanzado el límite de llamadas a la API de Infortisa; inténtalo de nuevo en unos segundos.")) from e
+            raise
+        finally:
+            Circuit._report(breaker)
+            Bucket._give_back(limiter)
+
+    def _compute_infortisa_last_exchange(self):
+        Log = self.env["infortisa.api.log"].sudo()
+        for order in self:
+            if not order.id:
+                order.infortisa_last_payload = order.infortisa_last_response = False
+                continue
+            last = Log.search([("order_id", "=", order.id)], limit=1)
+            last_req = Log.search([
+                ("order_id", "=", order.id),
+                ("endpoint", "in", ("order/create", "order/blockorder")),
+            ], limit=1)
+            order.infortisa_last_payload = last_req.request_body or False
+            order.infortisa_last_response = last.response_body or False
+
+    @contextmanager
+    def _infortisa_log_failures(self, endpoint, request=None, correlation_id=None):
+        """Registra en el historial API las llamadas que no obtuvieron respuesta (red, timeout)."""
+        try:
+            yield
+        except requests.RequestException as e:
+            self._infortisa_log_api(endpoint, request=request, error=e, correlation_id=correlation_id)
+            raise
+
+    def _infortisa_log_api(self, endpoint, request=None, resp=None, error=None, latency_ms=None, correlation_id=None):
+        """Registra una llamada en infortisa.api.log (cuerpos comprimidos)."""
+        if latency_ms is None:
+            latency_ms = resp.elapsed.total_seconds() * 1000 if resp is not None else 0
+        # Los workers HTTP no pasan por los crons: vuelco oportunista, como mucho cada FLUSH_INTERVAL
+        self.env["infortisa.metric"]._flush_metrics(min_interval=FLUSH_INTERVAL)
+        return self.env["infortisa.api.log"]._log(
+            self[:1], endpoint,
+            request=request,
+            response=resp.text if resp is not None else None,
+            http_status=resp.status_code if resp is not None else 0,
+            latency_ms=latency_ms,
+            error=error,
+            correlation_id=correlation_id,
+        )
+
+    def _infortisa_new_trace(self, correlation_id=None):
+        """Traza de la consulta de estado del pedido.
+
+        Con el contexto ``infortisa_profile`` (True o una fracción de muestreo,
+        p. ej. 0.01) se perfila además con cProfile y la traza se guarda siempre.
+        """
+        self.ensure_one()
+        sample = self.env.context.get("infortisa_profile")
+        return OrderTrace(
+            self.name, correlation_id=correlation_id, profile=bool(sample) and random.random() < float(sample)
+        )
+
+    def action_infortisa_open_api_log(self):
+        self.ensure_one()
+        action = self.env["ir.actions.act_window"]._for_xml_id("infortisa_orders.action_infortisa_api_log")
+        action["domain"] = [("order_id", "=", self.id)]
+        return action
+
     def action_infortisa_open_raw(self):
         self.ensure_one()
         return self.env["infortisa.raw.wizard"].open_for_order(self.id)
@@ -305,7 +749,6 @@ class SaleOrder(models.Model):
 
     # ---------- Métodos soporte ISO20022/SEPA ----------
     def _get_iso20022_method_line(self, bank_journal):
-        self.ensure_one()
         pm_line = self.env["account.payment.method.line"].search([
             ("journal_id", "=", bank_journal.id),
             ("payment_type", "=", "outbound"),
@@ -330,21 +773,26 @@ class SaleOrder(models.Model):
         return bank
 
     def _find_bank_journal(self):
-        ICP = self.env["ir.config_parameter"].sudo()
-        j_id = ICP.get_param("infortisa.bank_journal_payment_id")
-        if j_id:
-            j = self.env["account.journal"].browse(int(j_id))
-            if j and j.exists():
-                return j
-        j = self.env["account.journal"].search([("type", "=", "bank"), ("code", "=", "BNK5")], limit=1)
-        if j:
-            return j
-        j = self.env["account.journal"].search([("type", "=", "bank"), ("name", "ilike", "Banco")], limit=1)
-        if j:
-            return j
-        return self.env["account.journal"].search([("type", "=", "bank")], limit=1)
-
-    def _create_vendor_payment_and_xml(self):
+        # Configurado -> BNK5 -> "Banco" -> cualquier banco; resuelto en _infortisa_config
+        return self.env["account.journal"].browse(self._infortisa_config().bank_journal_id)
+
+    @api.model
+    def _infortisa_payment_context(self):
+        """Resuelve una vez lo común a todos los pagos (diario, método, módulos instalados)."""
+        bank_journal = self._find_bank_journal()
+        pm_line = self._get_iso20022_method_line(bank_journal) if bank_journal else self.env["account.payment.method.line"]
+        installed = set(self.env["ir.module.module"].sudo().search([
+            ("name", "in", ("account_batch_payment", "account_iso20022")),
+            ("state", "=", "installed"),
+        ]).mapped("name"))
+        modules_error = ""
+        for name in ("account_batch_payment", "account_iso20022"):
+            if name not in installed:
+                modules_error = _("El módulo '%s' no está instalado.") % name
+                break
+        return InfortisaPaymentContext(bank_journal=bank_journal, pm_line=pm_line, modules_error=modules_error)
+
+    def _create_vendor_payment_and_xml(self, pay_ctx=None):
         self.ensure_one()
         order = self
         code = (order.infortisa_op_code or "")
@@ -354,6 +802,9 @@ class SaleOrder(models.Model):
             return False
 
         bill = order.infortisa_vendor_bill_id
+        if bill.infortisa_consolidation and bill.state == "draft":
+            # Factura consolidada abierta: se contabiliza (y se paga) al cerrar el periodo
+            return False
         if not bill or bill.state != "posted":
             if bill and bill.state == "draft":
                 bill.action_post()
@@ -363,32 +814,45 @@ class SaleOrder(models.Model):
         if not order.infortisa_transfer_ref:
             return False
 
-        bank_journal = order._find_bank_journal()
+        if pay_ctx is None:
+            pay_ctx = order._infortisa_payment_context()
+        bank_journal = pay_ctx.bank_journal
         if not bank_journal:
             order.infortisa_payment_state = "failed"
             order.message_post(body=_("No se encontró un diario de banco para crear el pago ISO20022."))
             return False
 
-        pm_line = order._get_iso20022_method_line(bank_journal)
+        pm_line = pay_ctx.pm_line
         if not pm_line:
             order.infortisa_payment_state = "failed"
             order.message_post(body=_("No se encontró/creó el método 'ISO20022 Credit Transfer' en el diario de banco."))
             return False
 
         vendor = bill.partner_id
-        partner_bank = order._get_vendor_bank_account(vendor)
+        if vendor.id not in pay_ctx.vendor_banks:
+            pay_ctx.vendor_banks[vendor.id] = order._get_vendor_bank_account(vendor)
+        partner_bank = pay_ctx.vendor_banks[vendor.id]
         if not partner_bank:
             order.infortisa_payment_state = "failed"
             order.message_post(body=_("El proveedor no tiene cuenta bancaria configurada (Contabilidad > Proveedores > Proveedor)."))
             return False
 
         payment = order.infortisa_vendor_payment_id
+        if not payment and bill.infortisa_consolidation == "transfer":
+            # Una sola transferencia por referencia: el pago lo comparten todos los pedidos de la factura
+            sibling = (bill.infortisa_order_ids - order).filtered("infortisa_vendor_payment_id")[:1]
+            if sibling:
+                order.write({
+                    "infortisa_vendor_payment_id": sibling.infortisa_vendor_payment_id.id,
+                    "infortisa_payment_state": sibling.infortisa_payment_state,
+                })
+                return True
         if not payment:
             pay_vals = {
                 "payment_type": "outbound",
                 "partner_type": "supplier",
                 "partner_id": vendor.id,
-                "amount": abs(bill.amount_residual),
+                "amount": order._infortisa_bill_amount_to_pay(bill),
                 "currency_id": bill.currency_id.id,
                 "date": fields.Date.context_today(self),
                 "journal_id": bank_journal.id,
@@ -427,13 +891,8 @@ class SaleOrder(models.Model):
             pass
 
         try:
-            mod = self.env["ir.module.module"].sudo().search([("name", "=", "account_batch_payment")], limit=1)
-            if not (mod and mod.state == "installed"):
-                raise UserError(_("El módulo 'account_batch_payment' no está instalado."))
-
-            mod2 = self.env["ir.module.module"].sudo().search([("name", "=", "account_iso20022")], limit=1)
-            if not (mod2 and mod2.state == "installed"):
-                raise UserError(_("El módulo 'account_iso20022' no está instalado."))
+            if pay_ctx.modules_error:
+                raise UserError(pay_ctx.modules_error)
 
             Batch = self.env["account.batch.payment"].sudo()
             pm = pm_line.payment_method_id
@@ -452,8 +911,22 @@ class SaleOrder(models.Model):
             if upd:
                 payment.write(upd)
 
+            if order._infortisa_config().payment_batch_mode == "daily":
+                # Modo agregado: el pago espera en el lote diario; el XML se genera al cerrarlo
+                batch = Batch._infortisa_open_daily_batch(payment, pm)
+                if not batch:
+                    order.infortisa_payment_state = "to_export"
+                    order.message_post(body=_("Pago creado; otro proceso está abriendo el lote diario y se añadirá al cerrarlo."))
+                    return True
+                if payment.id not in batch.payment_ids.ids:
+                    batch.write({"payment_ids": [(4, payment.id)]})
+                order.infortisa_payment_state = "to_export"
+                order.message_post(body=_("Pago añadido al lote diario: %s") % (batch.display_name,))
+                return True
+
             batch = payment.batch_payment_id
             compatible = bool(batch and
+                              not batch.infortisa_aggregate and
                               batch.journal_id.id == payment.journal_id.id and
                               batch.batch_type == payment.payment_type and
                               (batch.payment_method_id.id == pm.id or batch.payment_method_code == pm.code))
@@ -483,122 +956,8 @@ class SaleOrder(models.Model):
                     order.message_post(body=_("Pago añadido al lote existente: %s") % (batch.display_name,))
 
             try:
-                def _normalize_export(ret, batch, payment):
-                    filename = f"iso20022_{batch.name or batch.id}.xml"
-                    candidates = []
-
-                    if isinstance(ret, dict):
-                        f = ret.get("file")
-                        if isinstance(f, dict):
-                            if f.get("filename"):
-                                filename = f["filename"]
-                            candidates.append(f.get("file"))
-                        else:
-                            candidates.append(f)
-                        if ret.get("filename"):
-                            filename = ret["filename"]
-
-                    xml_field = getattr(batch, "export_file", False)
-                    if xml_field:
-                        candidates.append(xml_field)
-                    export_file_id = getattr(batch, "export_file_id", False)
-                    if export_file_id and getattr(export_file_id, "datas", False):
-                        candidates.append(export_file_id.datas)
-                        filename = export_file_id.name or filename
-                    sepa_xml = getattr(batch, "sepa_xml_file", False)
-                    if sepa_xml:
-                        candidates.append(sepa_xml)
-
-                    Att = self.env["ir.attachment"].sudo()
-                    xml_att = Att.search([
-                        ("res_model", "=", "account.batch.payment"),
-                        ("res_id", "=", batch.id),
-                        "|", ("mimetype", "ilike", "xml"), ("name", "ilike", ".xml"),
-                    ], order="id desc", limit=1)
-                    if xml_att and xml_att.datas:
-                        import base64 as _b64
-                        try:
-                            decoded = _b64.b64decode(xml_att.datas)
-                        except Exception:
-                            decoded = b""
-                        if decoded:
-                            return decoded, (xml_att.name or filename)
-
-                    if payment:
-                        xml_att2 = Att.search([
-                            ("res_model", "=", "account.payment"),
-                            ("res_id", "=", payment.id),
-                            "|", ("mimetype", "ilike", "xml"), ("name", "ilike", ".xml"),
-                        ], order="id desc", limit=1)
-                        if xml_att2 and xml_att2.datas:
-                            import base64 as _b64
-                            try:
-                                decoded = _b64.b64decode(xml_att2.datas)
-                            except Exception:
-                                decoded = b""
-                            if decoded:
-                                return decoded, (xml_att2.name or filename)
-
-                    if hasattr(batch, "_generate_export_file"):
-                        try:
-                            candidates.append(batch._generate_export_file())
-                        except Exception:
-                            pass
-
-                    import base64 as _b64
-                    for c in candidates:
-                        if not c:
-                            continue
-                        if isinstance(c, (bytes, bytearray, memoryview)):
-                            raw = bytes(c)
-                            try:
-                                decoded = _b64.b64decode(raw, validate=True)
-                                if decoded.strip().startswith(b'<?xml'):
-                                    return decoded, filename
-                            except Exception:
-                                pass
-                            if raw.strip().startswith(b'<?xml'):
-                                return raw, filename
-                            return raw, filename
-                        if isinstance(c, str):
-                            s = c.strip()
-                            try:
-                                decoded = _b64.b64decode(s, validate=True)
-                                if decoded.strip().startswith(b'<?xml'):
-                                    return decoded, filename
-                            except Exception:
-                                pass
-                            return s.encode("utf-8"), filename
-                    return None, filename
-
-                ret = None
-                if hasattr(batch, "action_validate_generate_file"):
-                    ret = batch.action_validate_generate_file()
-                elif hasattr(batch, "action_validate_generate_xml"):
-                    ret = batch.action_validate_generate_xml()
-
-                xml_bytes, export_name = _normalize_export(ret, batch, payment)
-
-                if xml_bytes:
-                    Att = self.env["ir.attachment"].sudo()
-                    existing = Att.search([
-                        ("res_model", "=", "account.batch.payment"),
-                        ("res_id",   "=", batch.id),
-                        ("name",     "=", export_name),
-                    ], limit=1)
-                    if not existing:
-                        att = Att.create({
-                            "name": export_name,
-                            "res_model": "account.batch.payment",
-                            "res_id": batch.id,
-                            "type": "binary",
-                            "datas": base64.b64encode(xml_bytes),
-                            "mimetype": "application/xml",
-                        })
-                    else:
-                        att = existing
-
-                    batch.message_post(body=_("XML ISO20022 generado."), attachment_ids=[att.id])
+                att = batch._infortisa_generate_export(payment)
+                if att:
                     order.message_post(body=_("XML ISO20022 generado en el lote de pagos."), attachment_ids=[att.id])
                     order.infortisa_payment_state = "exported"
                 else:
@@ -616,41 +975,64 @@ class SaleOrder(models.Model):
 
         return True
 
-    def _auto_make_payment_if_ready(self):
+    def _infortisa_bill_amount_to_pay(self, bill):
+        """Importe a transferir: la factura entera, o sólo las líneas del pedido en la factura diaria."""
+        self.ensure_one()
+        if bill.infortisa_consolidation == "daily":
+            lines = self.infortisa_vendor_bill_line_ids.filtered(lambda l: l.move_id == bill)
+            return abs(sum(lines.mapped("price_total")))
+        return abs(bill.amount_residual)
+
+    def _auto_make_payment_if_ready(self, pay_ctx=None, traces=None):
+        traces = traces or {}
+        ready = self.browse()
         for order in self:
-            if not order.infortisa_allowed:
+            if not order.infortisa_allowed or not order.infortisa_sent:
                 continue
+            code = (order.infortisa_op_code or "").strip()
+            if any(code.startswith(p) for p in BLOCKED_CODE_PREFIXES):
+                if order.infortisa_payment_state != "missing":
+                    order.infortisa_payment_state = "missing"
+                order.message_post(body=_("Cron: Code=%s indica estado no pagadero; no se crea factura/pago/XML.") % (code or "(vacío)"))
+                continue
+            if code.startswith("VR/") and order.infortisa_transfer_ref:
+                ready |= order
+
+        # Facturas de todos los pedidos listos en un único create()
+        if ready and self._infortisa_config().auto_create_bill:
+            started = time.monotonic()
+            ready._infortisa_create_bills_safe()
+            # El lote es compartido: cada pedido de la traza lleva su duración completa
+            elapsed = time.monotonic() - started
+            for order in ready:
+                if order.id in traces:
+                    traces[order.id].add("billing", elapsed)
+
+        to_pay = ready.filtered(lambda o: o.infortisa_vendor_bill_id and not o.infortisa_vendor_payment_id)
+        if to_pay and pay_ctx is None:
+            # Una vez para todo el recordset y fuera de los savepoints por pedido: el rollback de
+            # un pago no debe deshacer la línea de método de pago que usan los demás
+            pay_ctx = self._infortisa_payment_context()
+        # Todas las facturas nuevas se contabilizan juntas; si una falla, cada
+        # pedido contabiliza la suya en su savepoint (``_create_vendor_payment_and_xml``)
+        drafts = to_pay.infortisa_vendor_bill_id.filtered(lambda m: m.state == "draft" and not m.infortisa_consolidation)
+        if drafts:
+            started = time.monotonic()
             try:
-                if not order.infortisa_sent:
-                    continue
-                code = (order.infortisa_op_code or "").strip()
-                if any(code.startswith(p) for p in BLOCKED_CODE_PREFIXES):
-                    if order.infortisa_payment_state != "missing":
-                        order.infortisa_payment_state = "missing"
-                    order.message_post(body=_("Cron: Code=%s indica estado no pagadero; no se crea factura/pago/XML.") % (code or "(vacío)"))
-                    continue
-                if not code.startswith("VR/"):
-                    continue
-                if not order.infortisa_transfer_ref:
-                    continue
-                auto_bill = order._icp_bool("infortisa.auto_create_bill", False)
-                if auto_bill and not order.infortisa_vendor_bill_id:
-                    try:
-                        order.action_infortisa_create_bill()
-                        bill2 = order.infortisa_vendor_bill_id
-                        if bill2 and order.infortisa_transfer_ref:
-                            vals = {}
-                            if getattr(bill2, "payment_reference", None) != order.infortisa_transfer_ref:
-                                vals["payment_reference"] = order.infortisa_transfer_ref
-                            if (bill2.ref or "") != order.infortisa_transfer_ref:
-                                vals["ref"] = order.infortisa_transfer_ref
-                            if vals:
-                                bill2.write(vals)
-                                bill2.message_post(body=_("Factura creada automaticamente y referenciada: %s") % order.infortisa_transfer_ref)
-                    except Exception as e:
-                        order.message_post(body=_("No se pudo crear la factura automaticamente: %s") % e)
-                if order.infortisa_vendor_bill_id and not order.infortisa_vendor_payment_id:
-                    order._create_vendor_payment_and_xml()
+                with self.env.cr.savepoint():
+                    drafts.action_post()
+            except Exception as e:
+                _logger.warning("Infortisa: contabilización en bloque de %s facturas fallida, se hace una a una: %s",
+                                len(drafts), e)
+            elapsed = time.monotonic() - started
+            for order in to_pay:
+                if order.id in traces:
+                    traces[order.id].add("billing", elapsed)
+        for order in to_pay:
+            trace = traces.get(order.id) or OrderTrace(order.name)
+            try:
+                with self.env.cr.savepoint(), trace.run(), trace.span("payment"):
+                    order._create_vendor_payment_and_xml(pay_ctx)
             except Exception as e:
                 order.infortisa_payment_state = "failed"
                 order.message_post(body=_("Error en auto-generacion de pago ISO20022: %s") % e)
@@ -662,455 +1044,404 @@ class SaleOrder(models.Model):
                 continue
             if order.infortisa_sent:
                 raise UserError(_("Este pedido ya fue enviado a Infortisa."))
+            cfg = order._infortisa_config()
             if test is None:
-                test = order._icp_bool("infortisa.test_mode", False)
+                test = cfg.test_mode
             if block is None:
-                block = order._icp_bool("infortisa.default_block", False)
-            if not order.infortisa_customer_ref:
-                order.infortisa_customer_ref = (order.name or "").replace("/", "").replace(" ", "")
-            _x = lambda s: xml_escape((s or "").strip())
-            delivery_comment = self._clean_text_for_xml(order.note) or "Pedido web"
-            delivery_type = "ENV"
-            ship, use_ceuta_override = order._infortisa_build_shipping_values()
-            if use_ceuta_override:
-                order.message_post(body=_("Dirección CEUTA detectada en el envío efectivo (checkout): se fuerza envío a almacén de San Roque en el XML de Infortisa."))
-            shop_number = "OL001" if use_ceuta_override else ""
-
-            xml_parts = [
-                '<?xml version="1.0" encoding="utf-16"?>',
-                '<Order xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">',
-                f"  <Test>{str(test).lower()}</Test>",
-                f"  <CustomerReference>{_x(order.infortisa_customer_ref)}</CustomerReference>",
-                f"  <ShopNumber>{_x(shop_number)}</ShopNumber>",
-                f"  <DeliveryType>{_x(delivery_type)}</DeliveryType>",
-                f"  <BlockOrder>{str(block).lower()}</BlockOrder>",
-                f"  <DeliveryComment>{_x(delivery_comment)}</DeliveryComment>",
-                "  <ShippingAddress>",
-                f"    <Company>{_x((ship.get('company') or 'Cliente')[:50])}</Company>",
-                f"    <Contact>{_x(ship.get('contact'))}</Contact>",
-                f"    <PhoneNumber>{_x(ship.get('phone') or '')}</PhoneNumber>",
-                f"    <Address1>{_x((ship.get('addr1') or '')[:40])}</Address1>",
-                f"    <Address2>{_x((ship.get('addr2') or '')[:40])}</Address2>",
-                f"    <ZipCode>{_x(ship.get('zip') or '')}</ZipCode>",
-                f"    <City>{_x(ship.get('city') or '')}</City>",
-                f"    <CountryTwoLetterCode>{_x(ship.get('cc') or 'ES')}</CountryTwoLetterCode>",
-                "  </ShippingAddress>",
-                "  <Products>",
-            ]
-
-            has_any_product = False
-            for line in order.order_line:
-                if line.display_type:
-                    continue
-                if getattr(line, "is_delivery", False):
-                    continue
-                if not line.product_id:
-                    continue
-                sku = (line.product_id.default_code or "").strip()
-                if not sku:
-                    continue
-                qty = int(round(line.product_uom_qty))
-                if qty <= 0:
-                    continue
-                has_any_product = True
-                xml_parts += [
-                    "    <Product>",
-                    f"      <SKU>{_x(sku)}</SKU>",
-                    "      <Partnumber></Partnumber>",
-                    f"      <Quantity>{qty}</Quantity>",
-                    "    </Product>",
-                ]
-
-            if not has_any_product:
-                raise UserError(_("No hay líneas válidas para enviar a Infortisa (SKU y cantidad)."))
+                block = cfg.default_block
+            xml_body = order._infortisa_build_order_payload(block, test)
+            with order._infortisa_log_failures("order/create", request=xml_body), order._infortisa_api() as client:
+                resp = client.post("/api/order/create", data=xml_body.encode("utf-16"))
+            order._infortisa_log_api("order/create", request=xml_body, resp=resp)
+            order._infortisa_apply_send_response(resp.status_code, resp.text, block, test)
+
+    def _infortisa_ensure_customer_ref(self):
+        """CustomerReference del pedido (el nombre sin "/" ni espacios); se guarda la primera vez."""
+        self.ensure_one()
+        if not self.infortisa_customer_ref:
+            self.infortisa_customer_ref = (self.name or "").replace("/", "").replace(" ", "")
+        return self.infortisa_customer_ref
+
+    def _infortisa_recover_sent(self):
+        """Comprueba por /api/order/status si Infortisa ya tiene el pedido antes de reenviarlo.
+
+        Un envío que falló de nuestro lado (timeout de lectura tras aceptarlo
+        Infortisa, error al procesar la respuesta) se deshace sólo aquí: volver
+        a hacer POST crearía un segundo pedido en el proveedor. Si ya existe,
+        lo marca como enviado, aplica su estado y devuelve True. HTTP 404 o una
+        respuesta vacía o de "no encontrado" significan que el POST anterior no
+        llegó: devuelve False y se envía.
+        """
+        self.ensure_one()
+        params = {"CustomerReference": self._infortisa_ensure_customer_ref()}
+        with self._infortisa_log_failures("order/status"), self._infortisa_api() as client:
+            resp = client.get("/api/order/status", params=params)
+        self._infortisa_log_api("order/status", resp=resp)
+        if resp.status_code == 404:
+            return False
+        if resp.status_code != 200:
+            raise InfortisaSendError(
+                _("No se pudo comprobar si el pedido ya existe en Infortisa (HTTP %s).") % resp.status_code,
+                retryable=True,
+            )
+        st = parse_order_status(resp.text)
+        if not st.has_operation and (st.state == "Desconocido" or _NOT_FOUND_STATUS_RE.search(st.state or "")):
+            return False
+        self.write({
+            "infortisa_sent": True,
+            "infortisa_poll_tier": "fast",
+            "infortisa_poll_misses": 0,
+        })
+        self.message_post(body=_(
+            "El pedido ya estaba en Infortisa (un envío anterior no llegó a confirmarse); no se vuelve a enviar."
+        ))
+        self._infortisa_apply_status_response(resp.status_code, resp.text)
+        return True
 
+    def _infortisa_build_order_payload(self, block, test):
+        """XML de /api/order/create (sin llamar a la API). Lanza UserError si no hay líneas válidas."""
+        self.ensure_one()
+        self._infortisa_ensure_customer_ref()
+        _x = lambda s: xml_escape((s or "").strip())
+        delivery_comment = self._clean_text_for_xml(self.note) or "Pedido web"
+        delivery_type = "ENV"
+        ship, use_ceuta_override = self._infortisa_build_shipping_values()
+        if use_ceuta_override:
+            self.message_post(body=_("Dirección CEUTA detectada en el envío efectivo (checkout): se fuerza envío a almacén de San Roque en el XML de Infortisa."))
+        shop_number = "OL001" if use_ceuta_override else ""
+
+        xml_parts = [
+            '<?xml version="1.0" encoding="utf-16"?>',
+            '<Order xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">',
+            f"  <Test>{str(test).lower()}</Test>",
+            f"  <CustomerReference>{_x(self.infortisa_customer_ref)}</CustomerReference>",
+            f"  <ShopNumber>{_x(shop_number)}</ShopNumber>",
+            f"  <DeliveryType>{_x(delivery_type)}</DeliveryType>",
+            f"  <BlockOrder>{str(block).lower()}</BlockOrder>",
+            f"  <DeliveryComment>{_x(delivery_comment)}</DeliveryComment>",
+            "  <ShippingAddress>",
+            f"    <Company>{_x((ship.get('company') or 'Cliente')[:50])}</Company>",
+            f"    <Contact>{_x(ship.get('contact'))}</Contact>",
+            f"    <PhoneNumber>{_x(ship.get('phone') or '')}</PhoneNumber>",
+            f"    <Address1>{_x((ship.get('addr1') or '')[:40])}</Address1>",
+            f"    <Address2>{_x((ship.get('addr2') or '')[:40])}</Address2>",
+            f"    <ZipCode>{_x(ship.get('zip') or '')}</ZipCode>",
+            f"    <City>{_x(ship.get('city') or '')}</City>",
+            f"    <CountryTwoLetterCode>{_x(ship.get('cc') or 'ES')}</CountryTwoLetterCode>",
+            "  </ShippingAddress>",
+            "  <Products>",
+        ]
+
+        has_any_product = False
+        for line in self.order_line:
+            if line.display_type:
+                continue
+            if getattr(line, "is_delivery", False):
+                continue
+            if not line.product_id:
+                continue
+            sku = (line.product_id.default_code or "").strip()
+            if not sku:
+                continue
+            qty = int(round(line.product_uom_qty))
+            if qty <= 0:
+                continue
+            has_any_product = True
             xml_parts += [
-                "  </Products>",
-                "</Order>",
+                "    <Product>",
+                f"      <SKU>{_x(sku)}</SKU>",
+                "      <Partnumber></Partnumber>",
+                f"      <Quantity>{qty}</Quantity>",
+                "    </Product>",
             ]
-            xml_body = "\n".join(xml_parts)
-            payload_bytes = xml_body.encode("utf-16")
 
-            headers = order._get_infortisa_headers()
-            url = f"{INFORTISA_BASE}/api/order/create"
+        if not has_any_product:
+            raise UserError(_("No hay líneas válidas para enviar a Infortisa (SKU y cantidad)."))
 
-            resp = requests.post(url, headers=headers, data=payload_bytes, timeout=60)
-            order.write({
-                "infortisa_last_payload": xml_body,
-                "infortisa_last_response": resp.text,
-            })
-            if resp.status_code not in (200, 201):
-                raise UserError(_("Error Infortisa (HTTP %s): %s") % (resp.status_code, resp.text))
-
-            internal_ref = None
-            try:
-                root = ET.fromstring(resp.text)
-                NS = {'n': 'http://schemas.datacontract.org/2004/07/BackEnd.Data.Npoco.Models'}
-                el = root.find(".//n:InternalReference", NS) or root.find(".//InternalReference")
-                if el is not None and (el.text or "") and not el.attrib.get("{http://www.w3.org/2001/XMLSchema-instance}nil"):
-                    internal_ref = (el.text or "").strip()
-                if not internal_ref:
-                    dc = root.find(".//n:DeliveryComment", NS) or root.find(".//DeliveryComment")
-                    if dc is not None and dc.text:
-                        m = re.search(r"\bEXT\d+\b", dc.text)
-                        if m:
-                            internal_ref = m.group(0)
-            except Exception:
-                if "<InternalReference>" in resp.text:
-                    internal_ref = resp.text.split("<InternalReference>")[1].split("</InternalReference>")[0].strip()
+        xml_parts += [
+            "  </Products>",
+            "</Order>",
+        ]
+        return "\n".join(xml_parts)
 
-            if "<HasErrors>true</HasErrors>" in resp.text:
-                raise UserError(_("Infortisa devolvió errores: %s") % resp.text)
+    def _infortisa_apply_send_response(self, status_code, text, block, test):
+        """Procesa la respuesta de /api/order/create. Lanza UserError si Infortisa la rechaza.
 
-            order.message_post(
-                body=_("Pedido enviado a Infortisa. TEST=%s, BLOQUEADO=%s.<br/>Resp: %s")
-                    % (test, block, resp.text[:500])
+        Devuelve la referencia interna asignada (o cadena vacía).
+        """
+        self.ensure_one()
+        text = text or ""
+        if status_code not in (200, 201):
+            raise InfortisaSendError(
+                _("Error Infortisa (HTTP %s): %s") % (status_code, text),
+                retryable=status_code in InfortisaClient.RETRY_STATUSES,
             )
-            order.write({
-                "infortisa_internal_ref": internal_ref or "",
-                "infortisa_state": "Importing" if not test else "Test OK",
-                "infortisa_sent": True,
-            })
+
+        internal_ref = None
+        try:
+            root = ET.fromstring(text)
+            NS = {'n': 'http://schemas.datacontract.org/2004/07/BackEnd.Data.Npoco.Models'}
+            el = root.find(".//n:InternalReference", NS) or root.find(".//InternalReference")
+            if el is not None and (el.text or "") and not el.attrib.get("{http://www.w3.org/2001/XMLSchema-instance}nil"):
+                internal_ref = (el.text or "").strip()
+            if not internal_ref:
+                dc = root.find(".//n:DeliveryComment", NS) or root.find(".//DeliveryComment")
+                if dc is not None and dc.text:
+                    m = re.search(r"\bEXT\d+\b", dc.text)
+                    if m:
+                        internal_ref = m.group(0)
+        except Exception:
+            if "<InternalReference>" in text:
+                internal_ref = text.split("<InternalReference>")[1].split("</InternalReference>")[0].strip()
+
+        if "<HasErrors>true</HasErrors>" in text:
+            raise InfortisaSendError(_("Infortisa devolvió errores: %s") % text)
+
+        self.message_post(
+            body=_("Pedido enviado a Infortisa. TEST=%s, BLOQUEADO=%s.<br/>Resp: %s")
+                % (test, block, text[:500])
+        )
+        self.write({
+            "infortisa_internal_ref": internal_ref or "",
+            "infortisa_state": "Importing" if not test else "Test OK",
+            "infortisa_sent": True,
+            "infortisa_poll_tier": "fast",
+            "infortisa_next_poll_at": fields.Datetime.now() + timedelta(minutes=POLL_TIERS["fast"][0]),
+            "infortisa_poll_misses": 0,
+        })
+        return internal_ref or ""
 
     # ========== 2) CONSULTAR ESTADO & GUARDAR IMPORTES ==========
     def action_infortisa_status(self):
-        ns = {"n": "http://schemas.datacontract.org/2004/07/BackEnd.Data.Npoco.Models"}
-        from_cron = self.env.context.get("infortisa_from_cron")
-
+        pay_ctx = self._infortisa_payment_context()
         for order in self:
             if not order.infortisa_allowed:
                 continue
             if not order.infortisa_customer_ref:
                 raise UserError(_("No hay CustomerReference en este pedido."))
+            with order._infortisa_manual_poll_lock():
+                trace = order._infortisa_new_trace()
+                params = {"CustomerReference": order.infortisa_customer_ref}
+                with order._infortisa_log_failures("order/status", correlation_id=trace.correlation_id), \
+                        order._infortisa_api() as client, trace.span("http"):
+                    resp = client.get("/api/order/status", params=params, headers=trace.headers)
+                order._infortisa_log_api("order/status", resp=resp, correlation_id=trace.correlation_id)
+                with trace.run():
+                    order._infortisa_apply_status_response(resp.status_code, resp.text, pay_ctx=pay_ctx, trace=trace)
+            self.env["infortisa.order.trace"]._record({order: trace}, "manual")
+        self.env["infortisa.tracking.outbox"]._trigger_send()
 
-            headers = order._get_infortisa_headers()
-            url = f"{INFORTISA_BASE}/api/order/status"
-            params = {"CustomerReference": order.infortisa_customer_ref}
-            resp = requests.get(url, headers=headers, params=params, timeout=60)
-            previous = {
-                "state": order.infortisa_state,
-                "base": order.infortisa_amount_base,
-                "ship": order.infortisa_amount_shipping,
-                "tax": order.infortisa_amount_tax,
-                "total": order.infortisa_amount_total,
-                "canon": order.infortisa_amount_canon_op,
-                "other": order.infortisa_amount_other_op,
-                "ref": order.infortisa_transfer_ref,
-                "tracking_url": order.infortisa_tracking_url,
-                "tracking_number": order.infortisa_tracking_number,
-                "tracking_status": order.infortisa_tracking_status,
-                "tracking_detail": order.infortisa_tracking_status_detail,
-            }
-            order.write({"infortisa_last_response": resp.text})
+    @staticmethod
+    def _infortisa_status_digest(body):
+        """Huella de la parte significativa de la respuesta (sin campos volátiles ni espacios)."""
+        text = _VOLATILE_STATUS_RE.sub("", body or "")
+        text = re.sub(r">\s+<", "><", text).strip()
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
-            if resp.status_code != 200:
-                raise UserError(_("Error estado (HTTP %s): %s") % (resp.status_code, resp.text))
+    @staticmethod
+    def _infortisa_render_products_html(st):
+        """Tabla HTML de productos y totales (API) a partir de un ``OrderStatus`` parseado."""
+        def _fmt(v):
+            try:
+                return f"{float(v):.2f}"
+            except Exception:
+                return "0.00"
+
+        canon_is_unit = st.canon_is_unit
+        prods_html = [
+            '<table class="table table-sm o_list_view">',
+            "<thead><tr>",
+            "<th>Nombre</th><th>SKU</th><th>Partnumber</th>"
+            "<th style='text-align:right'>Cantidad</th>"
+            "<th style='text-align:right'>Precio</th>"
+            "<th style='text-align:right'>Canon LPI</th>"
+            "<th style='text-align:right'>Total linea (API)</th>",
+            "</tr></thead><tbody>",
+        ]
+
+        canon_total_lines = 0.0
+        for r in st.products:
+            canon_unit = r.canon_raw if canon_is_unit else (r.canon_raw / r.qty if r.qty else r.canon_raw)
+            canon_total_lines += canon_unit * r.qty
+            line_total = r.qty * (r.price_wo + canon_unit)
+            prods_html.append(
+                "<tr>"
+                f"<td>{r.name}</td>"
+                f"<td>{r.sku}</td>"
+                f"<td>{r.pn}</td>"
+                f"<td style='text-align:right'>{_fmt(r.qty)}</td>"
+                f"<td style='text-align:right'>{_fmt(r.price_wo)}</td>"
+                f"<td style='text-align:right'>{_fmt(canon_unit)}</td>"
+                f"<td style='text-align:right'>{_fmt(line_total)}</td>"
+                "</tr>"
+            )
 
-            state = None
-            changed_bits = []
+        prods_html.append("</tbody><tfoot>")
+        prods_html.append(
+            f"<tr><td colspan='6' style='text-align:right'><b>Canon LPI (operacion)</b></td>"
+            f"<td style='text-align:right'><b>{_fmt(st.canon_op if st.canon_op else canon_total_lines)}</b></td></tr>"
+        )
+        prods_html.append(
+            f"<tr><td colspan='6' style='text-align:right'><b>Otros costes (operacion)</b></td>"
+            f"<td style='text-align:right'><b>{_fmt(st.other_cost)}</b></td></tr>"
+        )
+        prods_html.append(
+            f"<tr><td colspan='6' style='text-align:right'>Portes (API)</td>"
+            f"<td style='text-align:right'>{_fmt(st.shipping)}</td></tr>"
+        )
+        prods_html.append(
+            f"<tr><td colspan='6' style='text-align:right'>Impuestos (API)</td>"
+            f"<td style='text-align:right'>{_fmt(st.tax)}</td></tr>"
+        )
+        prods_html.append(
+            f"<tr><td colspan='6' style='text-align:right'><b>TOTAL (API)</b></td>"
+            f"<td style='text-align:right'><b>{_fmt(st.total)}</b></td></tr>"
+        )
+        prods_html.append("</tfoot></table>")
+        return "\n".join(prods_html)
 
-            try:
-                op = None
-                if "<OrderStatusResponse" in resp.text:
-                    root = ET.fromstring(resp.text)
-                    op = root.find(".//n:Operation", ns)
-
-                if op is not None:
-                    def _f(tag):
-                        el = op.find(f"n:{tag}", ns)
-                        return float(el.text) if el is not None and el.text else 0.0
-
-                    ship = _f("Shippingcost")
-                    tax = _f("Tax")
-                    total = _f("Total")
-                    canon_op = _f("CanonLPI")
-                    other_cost = _f("OtherCost")
-
-                    internal_ref = None
-                    el_int = op.find("n:InternalReference", ns)
-                    if el_int is not None and el_int.text:
-                        internal_ref = el_int.text.strip()
-                    if not internal_ref:
-                        el_dc = op.find("n:DeliveryComment", ns)
-                        if el_dc is not None and el_dc.text:
-                            import re as _re
-                            m = _re.search(r'\bEXT\d+\b', el_dc.text)
-                            if m:
-                                internal_ref = m.group(0)
-
-                    if internal_ref and internal_ref != (order.infortisa_internal_ref or ""):
-                        order.infortisa_internal_ref = internal_ref
-                        changed_bits.append(_("Ref. Interna Infortisa actualizada: %s") % internal_ref)
-                        if not order.infortisa_sent:
-                            order.infortisa_sent = True
-                            changed_bits.append(_("Marcado como enviado a Infortisa."))
-
-                    code_el = op.find("n:Code", ns)
-                    code = (code_el.text.strip() if (code_el is not None and code_el.text) else "") or ""
-                    if code and code != (order.infortisa_op_code or ""):
-                        order.infortisa_op_code = code
-                        changed_bits.append(_("Codigo operacion (Infortisa) actualizado: %s") % code)
-
-                    transfer_ref = None
-                    for tag in ("PaymentReference", "BankTransferReference", "TransferReference", "Reference", "Code"):
-                        el = op.find(f"n:{tag}", ns)
-                        if el is not None and el.text:
-                            transfer_ref = el.text.strip()
-                            break
-                    if not transfer_ref:
-                        el_int = op.find("n:InternalReference", ns)
-                        if el_int is not None and el_int.text:
-                            transfer_ref = el_int.text.strip()
-
-                    if transfer_ref and transfer_ref != order.infortisa_transfer_ref:
-                        order.infortisa_transfer_ref = transfer_ref
-                        changed_bits.append(_("Referencia de transferencia actualizada: %s") % transfer_ref)
-                        bill = order.infortisa_vendor_bill_id
-                        if bill:
-                            to_write = {}
-                            if getattr(bill, "payment_reference", None) != transfer_ref:
-                                to_write["payment_reference"] = transfer_ref
-                            if (bill.ref or "") != transfer_ref:
-                                to_write["ref"] = transfer_ref
-                            if to_write:
-                                bill.write(to_write)
-                                bill.message_post(body=_("Referencia establecida desde Infortisa: %s") % transfer_ref)
-
-                    # --- Tracking (URL, número, estado, transportista) ---
-                    trk_url_el = op.find("n:TrackingUrl", ns)
-                    trk_num_el = op.find("n:TrackingNumber", ns)
-                    trk_status_el = op.find("n:TrackingStatus", ns)
-                    trk_status_dt_el = op.find("n:TrackingStatusDateTime", ns)
-                    trk_status_det_el = op.find("n:TrackingStatusDetail", ns)
-                    trk_agent_el = op.find("n:ShippingAgent", ns)
-
-                    trk_url = (trk_url_el.text or "").strip() if trk_url_el is not None and trk_url_el.text else ""
-                    trk_num = (trk_num_el.text or "").strip() if trk_num_el is not None and trk_num_el.text else ""
-                    trk_status = (trk_status_el.text or "").strip() if trk_status_el is not None and trk_status_el.text else ""
-                    trk_status_dt = (trk_status_dt_el.text or "").strip() if trk_status_dt_el is not None and trk_status_dt_el.text else ""
-                    trk_status_det = (trk_status_det_el.text or "").strip() if trk_status_det_el is not None and trk_status_det_el.text else ""
-                    trk_agent = (trk_agent_el.text or "").strip() if trk_agent_el is not None and trk_agent_el.text else _("(desconocido)")
-
-                    updates = {}
-                    updates["infortisa_tracking_url"] = trk_url or order.infortisa_tracking_url
-                    updates["infortisa_tracking_number"] = trk_num or order.infortisa_tracking_number
-                    updates["infortisa_tracking_status"] = trk_status or order.infortisa_tracking_status
-                    updates["infortisa_tracking_status_detail"] = trk_status_det or order.infortisa_tracking_status_detail
-                    updates["infortisa_tracking_agent"] = trk_agent or order.infortisa_tracking_agent
-                    order.write(updates)
-
-                    # Notificar automáticamente UNA VEZ si aparece URL y aún no se notificó
-                    if trk_url and not order.infortisa_tracking_notified:
-                        order._infortisa_send_tracking_to_customer(trk_url, trk_num, trk_status, trk_status_dt, trk_status_det, trk_agent, mark_notified=True)
-                        changed_bits.append(_("Tracking URL detectada y enviada al cliente."))
-                    else:
-                        upd = {}
-                        if trk_num and trk_num != (previous["tracking_number"] or ""):
-                            upd["infortisa_tracking_number"] = trk_num
-                        if trk_status and trk_status != (previous["tracking_status"] or ""):
-                            upd["infortisa_tracking_status"] = trk_status
-                        if trk_status_det and trk_status_det != (previous["tracking_detail"] or ""):
-                            upd["infortisa_tracking_status_detail"] = trk_status_det
-                        if upd:
-                            order.write(upd)
-                            changed_bits.append(_("Información de tracking actualizada."))
-
-                    # --- Productos -> Base propia (cálculos y render) ---
-                    rows = []
-                    for p in op.findall(".//n:Products/n:Product", ns):
-                        sku = (p.find("n:SKU", ns).text if p.find("n:SKU", ns) is not None else "") or ""
-                        pn = (p.find("n:Partnumber", ns).text if p.find("n:Partnumber", ns) is not None else "") or ""
-                        desc = (p.find("n:ProductDescription", ns).text
-                                if p.find("n:ProductDescription", ns) is not None else "") or ""
-                        name = desc or pn or sku
-                        qty_s = (p.find("n:Quantity", ns).text if p.find("n:Quantity", ns) is not None else "0") or "0"
-                        price_wo = (p.find("n:PriceWithoutCanon", ns).text
-                                    if p.find("n:PriceWithoutCanon", ns) is not None else "0") or "0"
-                        canon_raw = (p.find("n:CanonLPI", ns).text if p.find("n:CanonLPI", ns) is not None else "0") or "0"
-
-                        try:
-                            qty = float(qty_s)
-                        except Exception:
-                            qty = 0.0
-                        try:
-                            price_wo_f = float(price_wo)
-                        except Exception:
-                            price_wo_f = 0.0
-                        try:
-                            canon_raw_f = float(canon_raw)
-                        except Exception:
-                            canon_raw_f = 0.0
-
-                        rows.append({
-                            "name": name,
-                            "sku": sku,
-                            "pn": pn,
-                            "qty": qty,
-                            "price_wo": price_wo_f,
-                            "canon_raw": canon_raw_f,
-                        })
-
-                    sum_canon_units = sum(r["canon_raw"] * r["qty"] for r in rows)
-                    sum_canon_as_is = sum(r["canon_raw"] for r in rows)
-
-                    def _close(a, b):
-                        return abs(a - b) <= max(0.01, 0.01 * max(a, b))
-
-                    canon_is_unit = True
-                    if _close(canon_op, sum_canon_as_is) and not _close(canon_op, sum_canon_units):
-                        canon_is_unit = False
-
-                    base_products = sum(r["price_wo"] * r["qty"] for r in rows)
-
-                    if base_products != previous["base"]:
-                        changed_bits.append(_("Base (API) actualizada."))
-                    if canon_op != previous["canon"]:
-                        changed_bits.append(_("Canon LPI (operacion) actualizado."))
-                    if other_cost != previous["other"]:
-                        changed_bits.append(_("Otros costes (operacion) actualizados."))
-                    if ship != previous["ship"]:
-                        changed_bits.append(_("Portes (API) actualizados."))
-                    if tax != previous["tax"]:
-                        changed_bits.append(_("Impuestos (API) actualizados."))
-                    if total != previous["total"]:
-                        changed_bits.append(_("Total (API) actualizado."))
-
-                    order.infortisa_amount_base = base_products
-                    order.infortisa_amount_canon_op = canon_op if canon_op else (sum_canon_units if canon_is_unit else sum_canon_as_is)
-                    order.infortisa_amount_other_op = other_cost
-                    order.infortisa_amount_shipping = ship
-                    order.infortisa_amount_tax = tax
-                    order.infortisa_amount_total = total
-
-                    st_el = op.find("n:Status", ns)
-                    state = st_el.text if st_el is not None else None
-
-                    def _fmt(v):
-                        try:
-                            return f"{float(v):.2f}"
-                        except Exception:
-                            return "0.00"
-
-                    prods_html = [
-                        '<table class="table table-sm o_list_view">',
-                        "<thead><tr>",
-                        "<th>Nombre</th><th>SKU</th><th>Partnumber</th>"
-                        "<th style='text-align:right'>Cantidad</th>"
-                        "<th style='text-align:right'>Precio</th>"
-                        "<th style='text-align:right'>Canon LPI</th>"
-                        "<th style='text-align:right'>Total linea (API)</th>",
-                        "</tr></thead><tbody>",
-                    ]
-
-                    canon_total_lines = 0.0
-                    for r in rows:
-                        canon_unit = r["canon_raw"] if canon_is_unit else (r["canon_raw"] / r["qty"] if r["qty"] else r["canon_raw"])
-                        canon_line_total = canon_unit * r["qty"]
-                        canon_total_lines += canon_line_total
-                        line_total = r["qty"] * (r["price_wo"] + canon_unit)
-                        prods_html.append(
-                            "<tr>"
-                            f"<td>{r['name']}</td>"
-                            f"<td>{r['sku']}</td>"
-                            f"<td>{r['pn']}</td>"
-                            f"<td style='text-align:right'>{_fmt(r['qty'])}</td>"
-                            f"<td style='text-align:right'>{_fmt(r['price_wo'])}</td>"
-                            f"<td style='text-align:right'>{_fmt(canon_unit)}</td>"
-                            f"<td style='text-align:right'>{_fmt(line_total)}</td>"
-                            "</tr>"
-                        )
+    def _infortisa_apply_status_response(self, status_code, body, pay_ctx=None, trace=None):
+        """Procesa una respuesta de /api/order/status ya descargada (parseo + escrituras ORM).
 
-                    prods_html.append("</tbody><tfoot>")
-                    prods_html.append(
-                        f"<tr><td colspan='6' style='text-align:right'><b>Canon LPI (operacion)</b></td>"
-                        f"<td style='text-align:right'><b>{_fmt(canon_op if canon_op else canon_total_lines)}</b></td></tr>"
-                    )
-                    prods_html.append(
-                        f"<tr><td colspan='6' style='text-align:right'><b>Otros costes (operacion)</b></td>"
-                        f"<td style='text-align:right'><b>{_fmt(other_cost)}</b></td></tr>"
-                    )
-                    prods_html.append(
-                        f"<tr><td colspan='6' style='text-align:right'>Portes (API)</td>"
-                        f"<td style='text-align:right'>{_fmt(ship)}</td></tr>"
-                    )
-                    prods_html.append(
-                        f"<tr><td colspan='6' style='text-align:right'>Impuestos (API)</td>"
-                        f"<td style='text-align:right'>{_fmt(tax)}</td></tr>"
-                    )
-                    prods_html.append(
-                        f"<tr><td colspan='6' style='text-align:right'><b>TOTAL (API)</b></td>"
-                        f"<td style='text-align:right'><b>{_fmt(total)}</b></td></tr>"
-                    )
-                    prods_html.append("</tfoot></table>")
-                    order.infortisa_products_html = "\n".join(prods_html)
-
-                    try:
-                        ICP = order.env["ir.config_parameter"].sudo()
-                        auto_bill = ICP.get_param("infortisa.auto_create_bill") in ("True", "true", "1")
-
-                        code_prefix_ok = code.startswith("VR/")
-                        code_prefix_block = code.startswith(BLOCKED_CODE_PREFIXES)
-
-                        if code_prefix_block:
-                            msg = _("No se genera factura/pago/XML: Code=%s indica estado no pagadero.") % (code or "(vacío)")
-                            order.message_post(body=msg)
-                            if order.infortisa_payment_state != "missing":
-                                order.infortisa_payment_state = "missing"
-
-                        elif code_prefix_ok:
-                            if transfer_ref and auto_bill and not order.infortisa_vendor_bill_id:
-                                order.action_infortisa_create_bill()
-                                bill2 = order.infortisa_vendor_bill_id
-                                if bill2:
-                                    vals = {}
-                                    if getattr(bill2, "payment_reference", None) != transfer_ref:
-                                        vals["payment_reference"] = transfer_ref
-                                    if (bill2.ref or "") != transfer_ref:
-                                        vals["ref"] = transfer_ref
-                                    if vals:
-                                        bill2.write(vals)
-                                        bill2.message_post(body=_("Factura creada automáticamente y referenciada: %s") % transfer_ref)
-
-                            if transfer_ref and order.infortisa_vendor_bill_id and not order.infortisa_vendor_payment_id:
-                                order._create_vendor_payment_and_xml()
-
-                        else:
-                            if not from_cron and not code:
-                                order.message_post(body=_("Code no disponible aún; se pospone la generación de factura/pago/XML."))
-
-                    except Exception as e:
-                        order.message_post(body=_("Error al procesar pago/lote tras recibir referencia: %s") % e)
-
-                elif "State of Order:" in resp.text:
-                    state = resp.text.split("State of Order:")[1].split("<")[0].strip()
-                else:
-                    state = "Desconocido"
+        Se ejecuta siempre en el hilo del cursor de la petición/cron: las descargas
+        concurrentes (ver ``_infortisa_fetch_status_many``) no tocan el ORM. El
+        tiempo de cada etapa se anota en ``trace`` (``OrderTrace``).
+        """
+        self.ensure_one()
+        order = self
+        if trace is None:
+            trace = OrderTrace(order.name)
+        from_cron = self.env.context.get("infortisa_from_cron")
 
-            except Exception as parse_err:
-                _logger.exception("No se pudo parsear OrderStatusResponse: %s", parse_err)
-                state = state or "Desconocido"
+        digest = self._infortisa_status_digest(body) if status_code == 200 else False
+        if from_cron and digest and digest == order.infortisa_status_digest:
+            # Misma respuesta que la última procesada: sin parseo, HTML, importes ni chatter
+            vals = order._infortisa_poll_schedule_vals(False)
+            vals["infortisa_poll_skipped_count"] = order.infortisa_poll_skipped_count + 1
+            order.write(vals)
+            return False
 
-            if state != previous["state"]:
-                changed_bits.append(_("Estado Infortisa actualizado: %s") % (state or ""))
+        if status_code != 200:
+            raise UserError(_("Error estado (HTTP %s): %s") % (status_code, body))
 
-            order.write({"infortisa_state": state or ""})
+        # Todos los cambios del pedido se acumulan y se aplican en un único write
+        cs = InfortisaChangeSet(order)
+        state = None
+        code = transfer_ref = ""
 
-            if from_cron:
-                if changed_bits:
-                    order.message_post(body="<br/>".join(changed_bits))
-            else:
-                order.message_post(
-                    body=_("Estado Infortisa actualizado: <b>%s</b><br/>Resp: %s")
-                    % (state or "", (resp.text or "")[:500])
+        try:
+            with trace.span("parse"), METRICS.timer("infortisa_phase_seconds", phase="parse"):
+                st = parse_order_status(body)
+            state = st.state
+            if st.has_operation:
+                internal_ref = st.internal_ref
+                if internal_ref and cs.set(
+                    "infortisa_internal_ref", internal_ref,
+                    _("Ref. Interna Infortisa actualizada: %s") % internal_ref,
+                ):
+                    cs.set("infortisa_sent", True, _("Marcado como enviado a Infortisa."))
+
+                code = st.code
+                code_changed = bool(code) and cs.set(
+                    "infortisa_op_code", code, _("Codigo operacion (Infortisa) actualizado: %s") % code
                 )
 
+                transfer_ref = st.transfer_ref
+                if transfer_ref and cs.set(
+                    "infortisa_transfer_ref", transfer_ref,
+                    _("Referencia de transferencia actualizada: %s") % transfer_ref,
+                ):
+                    bill = order.infortisa_vendor_bill_id
+                    if bill and not bill.infortisa_consolidation:
+                        to_write = {}
+                        if getattr(bill, "payment_reference", None) != transfer_ref:
+                            to_write["payment_reference"] = transfer_ref
+                        if (bill.ref or "") != transfer_ref:
+                            to_write["ref"] = transfer_ref
+                        if to_write:
+                            bill.write(to_write)
+                            bill.message_post(body=_("Referencia establecida desde Infortisa: %s") % transfer_ref)
+
+                # --- Tracking (URL, número, estado, transportista) ---
+                with trace.span("tracking"):
+                    trk_agent = st.shipping_agent or order.infortisa_tracking_agent or _("(desconocido)")
+                    cs.set("infortisa_tracking_url", st.tracking_url or order.infortisa_tracking_url)
+                    cs.set("infortisa_tracking_agent", trk_agent)
+                    trk_changed = False
+                    for fname, value in (
+                        ("infortisa_tracking_number", st.tracking_number),
+                        ("infortisa_tracking_status", st.tracking_status),
+                        ("infortisa_tracking_status_detail", st.tracking_status_detail),
+                    ):
+                        if value and cs.set(fname, value):
+                            trk_changed = True
+
+                    # Notificar automáticamente UNA VEZ si aparece URL y aún no se notificó.
+                    # Sólo se encola: el email lo renderiza y envía cron_infortisa_send_tracking.
+                    if st.tracking_url and not order.infortisa_tracking_notified and order.partner_id:
+                        self.env["infortisa.tracking.outbox"]._enqueue(
+                            order, st.tracking_url, st.tracking_number, st.tracking_status,
+                            st.tracking_status_dt, st.tracking_status_detail, trk_agent,
+                        )
+                        cs.set("infortisa_tracking_notified", True, _("Tracking URL detectada; notificación al cliente en cola."))
+                    elif trk_changed:
+                        cs.note(_("Información de tracking actualizada."))
+
+                # --- Productos -> Base propia ---
+                cs.set("infortisa_amount_base", st.base_products, _("Base (API) actualizada."))
+                cs.set("infortisa_amount_canon_op", st.canon_amount, _("Canon LPI (operacion) actualizado."))
+                cs.set("infortisa_amount_other_op", st.other_cost, _("Otros costes (operacion) actualizados."))
+                cs.set("infortisa_amount_shipping", st.shipping, _("Portes (API) actualizados."))
+                cs.set("infortisa_amount_tax", st.tax, _("Impuestos (API) actualizados."))
+                cs.set("infortisa_amount_total", st.total, _("Total (API) actualizado."))
+                with trace.span("html"):
+                    cs.set("infortisa_products_html", order._infortisa_render_products_html(st))
+
+                if code.startswith(BLOCKED_CODE_PREFIXES):
+                    cs.set("infortisa_payment_state", "missing")
+                    if code_changed:
+                        cs.note(_("No se genera factura/pago/XML: Code=%s indica estado no pagadero.") % code)
+                elif not code and not from_cron:
+                    cs.note(_("Code no disponible aún; se pospone la generación de factura/pago/XML."))
+
+        except Exception as parse_err:
+            _logger.exception("No se pudo parsear OrderStatusResponse: %s", parse_err)
+            state = state or "Desconocido"
+
+        state_changed = cs.set("infortisa_state", state or "")
+        if state_changed and from_cron:
+            cs.note(_("Estado Infortisa actualizado: %s") % (state or ""))
+        cs.update({"infortisa_status_digest": digest})
+        cs.update(order._infortisa_poll_schedule_vals(state_changed or bool(cs.messages), pending=cs.vals))
+        with trace.span("orm_write"), METRICS.timer("infortisa_phase_seconds", phase="orm_write"):
+            cs.flush()
+
+        # Factura/pago necesitan los importes y referencias ya escritos. El cron los
+        # difiere (infortisa_defer_billing) para crear las facturas del bloque de una vez.
+        if code.startswith("VR/") and transfer_ref and not self.env.context.get("infortisa_defer_billing"):
+            try:
+                if order._infortisa_config().auto_create_bill and not order.infortisa_vendor_bill_id:
+                    with trace.span("billing"):
+                        order._infortisa_create_bills()
+
+                if order.infortisa_vendor_bill_id and not order.infortisa_vendor_payment_id:
+                    with trace.span("payment"):
+                        order._create_vendor_payment_and_xml(pay_ctx)
+            except Exception as e:
+                cs.note(_("Error al procesar pago/lote tras recibir referencia: %s") % e)
+
+        if not from_cron:
+            cs.messages.insert(0, _("Estado Infortisa actualizado: <b>%s</b><br/>Resp: %s") % (state or "", (body or "")[:500]))
+        if cs.messages:
+            with trace.span("chatter"):
+                order.message_post(body=cs.message_body())
+        return True
+
     # ========== 3) BLOQUEAR / DESBLOQUEAR / ANULAR ==========
     def _action_infortisa_block_cancel(self, cancel=False, block=False):
         for order in self:
             if not order.infortisa_customer_ref:
                 raise UserError(_("No hay CustomerReference en este pedido."))
-            headers = order._get_infortisa_headers()
-            url = f"{INFORTISA_BASE}/api/order/blockorder"
             xml = f"""<?xml version="1.0" encoding="utf-16"?>
             <BlockOrder xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
             <CustomerReference>{order.infortisa_customer_ref}</CustomerReference>
@@ -1118,8 +1449,9 @@ class SaleOrder(models.Model):
             <CancelOrder>{str(cancel).lower()}</CancelOrder>
             </BlockOrder>
             """
-            resp = requests.post(url, headers=headers, data=xml.encode("utf-16"), timeout=60)
-            order.write({"infortisa_last_response": resp.text})
+            with order._infortisa_log_failures("order/blockorder", request=xml), order._infortisa_api() as client:
+                resp = client.post("/api/order/blockorder", data=xml.encode("utf-16"))
+            order._infortisa_log_api("order/blockorder", request=xml, resp=resp)
             if resp.status_code != 200:
                 raise UserError(_("Error bloquear/anular (HTTP %s): %s") % (resp.status_code, resp.text))
             order.message_post(
@@ -1138,29 +1470,457 @@ class SaleOrder(models.Model):
         self._action_infortisa_block_cancel(cancel=True, block=False)
 
     # ========== 4) CRON: poll estado ==========
-    @api.model
-    def cron_infortisa_poll_status(self):
-        orders = self.sudo().search([
+    def _infortisa_poll_tier_for(self, pending=None):
+        """Tier de consulta según estado Infortisa, código de operación, tracking y pago.
+
+        ``pending`` son valores aún no escritos (change-set) que prevalecen sobre el registro.
+        """
+        self.ensure_one()
+        pending = pending or {}
+
+        def get(fname):
+            return pending[fname] if fname in pending else self[fname]
+
+        state = get("infortisa_state") or ""
+        code = (get("infortisa_op_code") or "").strip()
+        if code.startswith(CANCELLED_CODE_PREFIXES):
+            return "stopped"
+        paid = get("infortisa_payment_state") in ("exported", "posted")
+        trk_status = (get("infortisa_tracking_status") or "").upper()
+        delivered = any(m in trk_status for m in DELIVERED_TRACKING_MARKERS)
+        if delivered and (paid or not code.startswith("VR/")):
+            # Entregado y sin nada pendiente de pagar: ya no puede cambiar nada relevante
+            return "stopped"
+        if state == "Importing" or not code:
+            return "fast"
+        if get("infortisa_tracking_url") or get("infortisa_tracking_number") or paid:
+            return "transit"
+        return "normal"
+
+    def _infortisa_poll_schedule_vals(self, changed, pending=None):
+        """Valores de planificación para la próxima consulta (backoff si no hubo cambios).
+
+        Con notificaciones push activas (``infortisa.push_token``) la consulta
+        sólo sirve de conciliación y los intervalos se multiplican por
+        ``infortisa.push_poll_factor``.
+        """
+        self.ensure_one()
+        tier = self._infortisa_poll_tier_for(pending=pending)
+        if tier == "stopped":
+            return {
+                "infortisa_poll_tier": tier,
+                "infortisa_next_poll_at": False,
+                "infortisa_poll_misses": 0,
+            }
+        misses = 0 if (changed or tier != self.infortisa_poll_tier) else self.infortisa_poll_misses + 1
+        base, cap = POLL_TIERS[tier]
+        cfg = self._infortisa_config()
+        if cfg.push_token:
+            factor = max(1, cfg.push_poll_factor)
+            base, cap = base * factor, cap * factor
+        minutes = min(base * (2 ** min(misses, 16)), cap)
+        return {
+            "infortisa_poll_tier": tier,
+            "infortisa_next_poll_at": fields.Datetime.now() + timedelta(minutes=minutes),
+            "infortisa_poll_misses": misses,
+        }
+
+    def _infortisa_reschedule_poll(self, changed=False):
+        for order in self:
+            order.write(order._infortisa_poll_schedule_vals(changed))
+
+    def _infortisa_due_poll_domain(self):
+        return [
             ("infortisa_sent", "=", True),
             ("infortisa_allowed", "=", True),
+            ("infortisa_poll_tier", "!=", "stopped"),
+            "|",
+            ("infortisa_next_poll_at", "=", False),
+            ("infortisa_next_poll_at", "<=", fields.Datetime.now()),
+        ]
+
+    @api.model
+    def _infortisa_claim_due_orders(self, limit, lease):
+        """Reserva hasta ``limit`` pedidos vencidos que ningún otro cron esté consultando.
+
+        Mismo criterio que ``_infortisa_due_poll_domain``, más los pedidos sin
+        reserva vigente. Con ``FOR UPDATE SKIP LOCKED`` dos crons que reclaman a
+        la vez reciben bloques disjuntos sin esperarse; la reserva (``lease``)
+        debe confirmarse (commit) antes de consultar, y si el worker muere
+        caduca sola y otro cron retoma los pedidos.
+        """
+        self.flush_model([
+            "infortisa_sent", "infortisa_allowed", "infortisa_poll_tier",
+            "infortisa_next_poll_at", "infortisa_poll_lease_until",
         ])
-        for order in orders:
+        now = fields.Datetime.now()
+        self.env.cr.execute(
+            """
+            UPDATE sale_order so
+               SET infortisa_poll_lease_until = %(until)s
+              FROM (
+                    SELECT id
+                      FROM sale_order
+                     WHERE infortisa_sent AND infortisa_allowed
+                       AND infortisa_poll_tier IS DISTINCT FROM 'stopped'
+                       AND (infortisa_next_poll_at IS NULL OR infortisa_next_poll_at <= %(now)s)
+                       AND (infortisa_poll_lease_until IS NULL OR infortisa_poll_lease_until < %(now)s)
+                       AND pg_try_advisory_xact_lock(%(lock_key)s, id)
+                     ORDER BY infortisa_next_poll_at, id
+                     LIMIT %(limit)s
+                       FOR UPDATE SKIP LOCKED
+                   ) due
+             WHERE so.id = due.id
+         RETURNING so.id
+            """,
+            {"now": now, "until": now + lease, "limit": limit, "lock_key": MANUAL_POLL_LOCK_KEY},
+        )
+        ids = sorted(row[0] for row in self.env.cr.fetchall())
+        orders = self.browse(ids)
+        orders.invalidate_recordset(["infortisa_poll_lease_until"])
+        return orders
+
+    def _infortisa_claim_poll_lease(self, lease):
+        """Reserva los pedidos de ``self`` que nadie esté procesando y devuelve los reservados.
+
+        Igual que ``_infortisa_claim_due_orders`` pero sobre pedidos concretos
+        (notificaciones push), sin mirar si la consulta está vencida.
+        """
+        if not self:
+            return self
+        self.flush_recordset(["infortisa_poll_lease_until"])
+        now = fields.Datetime.now()
+        self.env.cr.execute(
+            """
+            UPDATE sale_order so
+               SET infortisa_poll_lease_until = %(until)s
+              FROM (
+                    SELECT id
+                      FROM sale_order
+                     WHERE id = ANY(%(ids)s)
+                       AND (infortisa_poll_lease_until IS NULL OR infortisa_poll_lease_until < %(now)s)
+                       AND pg_try_advisory_xact_lock(%(lock_key)s, id)
+                     ORDER BY id
+                       FOR UPDATE SKIP LOCKED
+                   ) free
+             WHERE so.id = free.id
+         RETURNING so.id
+            """,
+            {"now": now, "until": now + lease, "ids": self.ids, "lock_key": MANUAL_POLL_LOCK_KEY},
+        )
+        orders = self.browse(sorted(row[0] for row in self.env.cr.fetchall()))
+        self.invalidate_recordset(["infortisa_poll_lease_until"])
+        return orders
+
+    def _infortisa_release_poll_lease(self):
+        if not self:
+            return
+        self.env.cr.execute(
+            "UPDATE sale_order SET infortisa_poll_lease_until = NULL WHERE id = ANY(%s)", (self.ids,)
+        )
+        self.invalidate_recordset(["infortisa_poll_lease_until"])
+
+    def _infortisa_lock_rows(self):
+        """Bloquea las filas de los pedidos hasta el final de la transacción.
+
+        Si otra transacción ya los modificó (otro cron, otro usuario), PostgreSQL
+        lanza un error de serialización en vez de dejar que ambas sigan: es lo
+        que impide consultar o facturar un pedido dos veces a la vez.
+        """
+        if not self:
+            return
+        self.env.cr.execute("SELECT id FROM sale_order WHERE id = ANY(%s) ORDER BY id FOR UPDATE", (self.ids,))
+        self.invalidate_recordset()
+
+    @contextmanager
+    def _infortisa_manual_poll_lock(self):
+        """Consulta manual: reserva los pedidos mientras dura el bloque y rechaza los que otro proceso está consultando.
+
+        La reserva es un advisory lock de sesión en una conexión propia: no
+        escribe la fila del pedido (la transacción del usuario la actualiza
+        después sin errores de serialización), no confirma la transacción del
+        usuario y se suelta al salir del bloque aunque la llamada falle. Los
+        crons de estado y de notificaciones no reservan pedidos con el lock
+        tomado (``pg_try_advisory_xact_lock`` en sus reclamaciones).
+        """
+        cr = self.env.registry.cursor()
+        locked = []
+        try:
+            cr.execute(
+                "SELECT id FROM unnest(%s::int[]) AS id WHERE pg_try_advisory_lock(%s, id)",
+                (self.ids, MANUAL_POLL_LOCK_KEY),
+            )
+            locked = [row[0] for row in cr.fetchall()]
+            cr.commit()
+            # Transacción nueva: ve las reservas que un cron confirmó antes de tomar el lock
+            cr.execute(
+                "SELECT id FROM sale_order WHERE id = ANY(%s) AND infortisa_poll_lease_until >= %s",
+                (self.ids, fields.Datetime.now()),
+            )
+            leased = {row[0] for row in cr.fetchall()}
+            cr.commit()
+            busy = self.filtered(lambda o: o.id not in locked or o.id in leased)
+            if busy:
+                raise UserError(_("Otro proceso está consultando ahora mismo %s; inténtalo de nuevo en unos instantes.")
+                                % ", ".join(busy.mapped("name")))
+            yield
+        finally:
+            try:
+                if locked:
+                    cr.rollback()
+                    cr.execute(
+                        "SELECT pg_advisory_unlock(%s, id) FROM unnest(%s::int[]) AS id",
+                        (MANUAL_POLL_LOCK_KEY, locked),
+                    )
+                    cr.commit()
+            finally:
+                cr.close()
+
+    @api.model
+    def _infortisa_poll_crons(self):
+        """Crons de estado activos (el principal y los adicionales)."""
+        crons = self.env["ir.cron"].sudo()
+        for xmlid in ("infortisa_orders.ir_cron_infortisa_poll_status",) + POLL_SHARD_CRONS:
+            cron = self.env.ref(xmlid, raise_if_not_found=False)
+            if cron and cron.active:
+                crons |= cron
+        return crons
+
+    @api.model
+    def _infortisa_apply_poll_shards(self, shards):
+        """Activa tantos crons de estado adicionales como ``shards - 1``."""
+        for number, xmlid in enumerate(POLL_SHARD_CRONS, start=2):
+            cron = self.env.ref(xmlid, raise_if_not_found=False)
+            if cron and cron.sudo().active != (number <= shards):
+                cron.sudo().active = number <= shards
+
+    def _infortisa_fetch_status_many(self, max_workers=8, traces=None):
+        """Fase 1 del cron: descarga concurrente de /api/order/status.
+
+        Los hilos sólo hacen HTTP (nada de ORM ni cursor). Con ``traces``
+        (``{order_id: OrderTrace}``) cada petición lleva su id de correlación.
+        Devuelve ``{order_id: (status_code, body, error, latency_ms)}``.
+        """
+        traces = traces or {}
+        results = {}
+        jobs = {}
+        for order in self:
+            if not order.infortisa_customer_ref:
+                results[order.id] = (None, None, UserError(_("No hay CustomerReference en este pedido.")), 0)
+            else:
+                trace = traces.get(order.id)
+                jobs[order.id] = (order.infortisa_customer_ref, trace.headers if trace else None)
+        if not jobs:
+            return results
+
+        with self._infortisa_api(lane=LANE_BULK) as client:
+
+            def _fetch(job):
+                customer_ref, headers = job
+                started = time.monotonic()
+                try:
+                    resp = client.get("/api/order/status", params={"CustomerReference": customer_ref}, headers=headers)
+                    return resp.status_code, resp.text, None, (time.monotonic() - started) * 1000
+                except Exception as e:
+                    return None, None, e, (time.monotonic() - started) * 1000
+
+            workers = max(1, min(max_workers, len(jobs)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="infortisa_poll") as pool:
+                fetched = pool.map(_fetch, jobs.values())
+                for order_id, res in zip(jobs.keys(), fetched):
+                    results[order_id] = res
+        return results
+
+    def _infortisa_post_orders_many(self, payloads, max_workers=8):
+        """POST concurrente de /api/order/create para ``{order_id: xml_body}`` ya construidos.
+
+        Igual que ``_infortisa_fetch_status_many``: los hilos sólo hacen HTTP.
+        Devuelve ``{order_id: (status_code, body, error, latency_ms)}``.
+        """
+        if not payloads:
+            return {}
+        with self._infortisa_api(lane=LANE_BULK) as client:
+
+            def _post(xml_body):
+                started = time.monotonic()
+                try:
+                    resp = client.post("/api/order/create", data=xml_body.encode("utf-16"))
+                    return resp.status_code, resp.text, None, (time.monotonic() - started) * 1000
+                except Exception as e:
+                    return None, None, e, (time.monotonic() - started) * 1000
+
+            workers = max(1, min(max_workers, len(payloads)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="infortisa_send") as pool:
+                posted = pool.map(_post, payloads.values())
+                return dict(zip(payloads.keys(), posted))
+
+    def _infortisa_poll_chunk(self, max_workers=8, pay_ctx=None):
+        """Consulta y procesa un bloque de pedidos (fase HTTP concurrente + fase ORM en serie).
+
+        ``pay_ctx`` debe venir resuelto fuera de los savepoints por pedido (ver
+        ``cron_infortisa_poll_status``): un rollback no debe dejarlo apuntando a
+        registros deshechos. Devuelve ``(procesados, omitidos_sin_cambios, fallidos)``.
+
+        Lanza ``CircuitOpenError`` si la API se considera caída. Los pedidos que
+        el circuit breaker o el límite de llamadas cortan a mitad de bloque siguen vencidos, y los fallos
+        de red o HTTP 429/5xx sólo se registran en el historial API, sin chatter.
+        """
+        traces = {order.id: order._infortisa_new_trace() for order in self}
+        fetched = self._infortisa_fetch_status_many(max_workers=max_workers, traces=traces)
+        processed, skipped, errors = self._infortisa_apply_status_many(fetched, pay_ctx=pay_ctx, traces=traces)
+        return processed, skipped, len(errors)
+
+    def _infortisa_apply_status_many(self, fetched, pay_ctx=None, traces=None, source="cron"):
+        """Fase ORM del cron de estado, común a las notificaciones push (``source="push"``).
+
+        ``fetched`` es ``{order_id: (status_code, body, error, latency_ms)}``, como
+        lo devuelve ``_infortisa_fetch_status_many``. Cada pedido se aplica en su
+        savepoint con ``_infortisa_apply_status_response``; después van las
+        facturas del bloque y los pagos. Devuelve
+        ``(procesados, omitidos_sin_cambios, {order_id: error})``; los pedidos
+        cortados por el circuit breaker o el límite de llamadas no cuentan.
+        """
+        traces = traces if traces is not None else {order.id: order._infortisa_new_trace() for order in self}
+        endpoint = "push/status" if source == "push" else "order/status"
+        Log = self.env["infortisa.api.log"]
+        log_vals = []
+        processed = skipped = 0
+        errors = {}
+        applied_orders = self.browse()
+        for order in self.with_context(infortisa_from_cron=True, infortisa_defer_billing=True):
+            status_code, body, error, latency_ms = fetched[order.id]
+            if isinstance(error, (CircuitOpenError, RateLimitedError)):
+                continue
+            trace = traces[order.id]
+            trace.add("http", (latency_ms or 0) / 1000)
+            transient = error is not None or status_code in InfortisaClient.RETRY_STATUSES
+            applied = False
             try:
-                order.with_context(infortisa_from_cron=True).action_infortisa_status()
-                order._auto_make_payment_if_ready()
+                with self.env.cr.savepoint(), trace.run():
+                    if error:
+                        raise error
+                    applied = order._infortisa_apply_status_response(status_code, body, pay_ctx=pay_ctx, trace=trace)
+                    if applied:
+                        processed += 1
+                    else:
+                        skipped += 1
+                # Respuesta idéntica a la anterior: ni facturas ni pagos ni chatter
+                if applied:
+                    applied_orders |= order
             except Exception as e:
-                _logger.exception("Poll estado Infortisa falló para SO %s: %s", order.name, e)
-                order.message_post(body=_("Cron Infortisa: error al actualizar o procesar: %s") % e)
+                error = error or e
+                errors[order.id] = error
+                if transient:
+                    _logger.warning("Estado Infortisa (%s) falló para SO %s: %s", source, order.name, e)
+                else:
+                    _logger.exception("Estado Infortisa (%s) falló para SO %s: %s", source, order.name, e)
+                    if source == "push":
+                        order.message_post(body=_("Notificación Infortisa: error al actualizar o procesar: %s") % e)
+                    else:
+                        order.message_post(body=_("Cron Infortisa: error al actualizar o procesar: %s") % e)
+                order._infortisa_reschedule_poll(changed=False)
+            # Las respuestas idénticas a la anterior no se vuelven a guardar
+            if applied or error:
+                log_vals.append(Log._prepare_vals(
+                    order, endpoint, response=body, http_status=status_code,
+                    latency_ms=latency_ms, error=error, correlation_id=trace.correlation_id,
+                ))
+        if log_vals:
+            Log.sudo().create(log_vals)
+        # Facturas del bloque en un único create(), luego pagos (cada uno en su savepoint)
+        applied_orders._auto_make_payment_if_ready(pay_ctx, traces=traces)
+        self.env["infortisa.order.trace"]._record({order: traces[order.id] for order in self}, source)
+        return processed, skipped, errors
+
+    @api.model
+    def cron_infortisa_poll_status(self):
+        """Procesa los pedidos vencidos en bloques, con commit tras cada bloque.
+
+        Cada bloque se reclama con una reserva (``_infortisa_claim_due_orders``),
+        así que varios crons (``infortisa.poll_shards``), en distintos workers o
+        nodos, pueden ejecutarse a la vez sin consultar el mismo pedido. Se
+        detiene al agotar el presupuesto de tiempo; los pedidos procesados ya
+        tienen su próxima consulta reprogramada, así que la siguiente ejecución
+        continúa por los que quedaron pendientes.
+        """
+        cfg = self._infortisa_config()
+        limit = max(1, cfg.poll_batch_limit)
+        workers = max(1, cfg.poll_workers)
+        chunk_size = max(1, cfg.poll_chunk_size)
+        budget = max(1, cfg.poll_time_budget)
+        # Margen para el último bloque, que puede empezar justo antes de agotar el presupuesto
+        lease = timedelta(seconds=2 * budget + cfg.connect_timeout + cfg.read_timeout)
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        started = time.monotonic()
+
+        try:
+            self._get_infortisa_headers()
+        except UserError as e:
+            # Sin API Key: nada que consultar
+            _logger.warning("Cron Infortisa: %s", e)
+            return
+
+        Order = self.sudo()
+        pay_ctx = None
+        done = processed = skipped = failed = 0
+        circuit_open = backlog = False
+        while True:
+            if done >= limit or time.monotonic() - started >= budget:
+                backlog = True
+                break
+            chunk = Order._infortisa_claim_due_orders(min(chunk_size, limit - done), lease)
+            if not chunk:
+                break
+            if auto_commit:
+                # La reserva tiene que verse ya en los demás crons
+                self.env.cr.commit()
+            if pay_ctx is None:
+                # Diario, método y módulos de pago: una vez por ejecución, no por pedido
+                pay_ctx = self._infortisa_payment_context()
+            try:
+                p, sk, f = chunk._infortisa_poll_chunk(max_workers=workers, pay_ctx=pay_ctx)
+            except CircuitOpenError as e:
+                # API caída: nada de esperar timeouts pedido a pedido; se sigue tras el enfriamiento
+                _logger.warning("Cron Infortisa: %s", e)
+                chunk._infortisa_release_poll_lease()
+                circuit_open = True
+                break
+            chunk._infortisa_release_poll_lease()
+            processed, skipped, failed = processed + p, skipped + sk, failed + f
+            done += len(chunk)
+            if auto_commit:
+                self.env.cr.commit()
+
+        if not done and not circuit_open:
+            return
+        _logger.info(
+            "Cron Infortisa: %s consultados, %s sin cambios (omitidos), %s con error.",
+            processed, skipped, failed,
+        )
+        METRICS.inc("infortisa_cron_runs_total", cron="poll_status")
+        METRICS.observe("infortisa_cron_duration_seconds", time.monotonic() - started, cron="poll_status")
+        for result, count in (("processed", processed), ("skipped", skipped), ("failed", failed)):
+            if count:
+                METRICS.inc("infortisa_cron_orders_total", count, cron="poll_status", result=result)
+        self.env["infortisa.metric"]._flush_metrics()
+        if self.env["infortisa.tracking.outbox"].sudo().search_count([("state", "=", "pending")], limit=1):
+            self.env["infortisa.tracking.outbox"]._trigger_send()
+
+        if backlog and not circuit_open:
+            _logger.info(
+                "Cron Infortisa: %s pedidos en %.1fs; quedan pendientes, se reprograma.",
+                done, time.monotonic() - started,
+            )
+            for cron in self._infortisa_poll_crons():
+                cron._trigger()
 
     # ========== 5) AUTO-ENVÍO cuando está pagado ==========
     def action_confirm(self):
         res = super().action_confirm()
-        for order in self:
-            try:
-                if order.infortisa_allowed and not order.infortisa_sent:
-                    order.action_infortisa_send(block=None, test=None)
-            except Exception as e:
-                order.message_post(body=_("Fallo al enviar a Infortisa automáticamente: %s") % e)
+        # El envío real lo hace el cron de la cola: la confirmación no espera a la API
+        to_send = self.filtered(lambda o: o.infortisa_allowed and not o.infortisa_sent)
+        if to_send:
+            self.env["infortisa.send.queue"].sudo()._enqueue(to_send)
         return res
 
     # ========== 6) CREAR FACTURA DE PROVEEDOR DESDE IMPORTES API ==========
@@ -1169,47 +1929,40 @@ class SaleOrder(models.Model):
         if self.infortisa_vendor_bill_id:
             raise UserError(_("Ya existe una factura de proveedor enlazada a este pedido."))
 
-        ICP = self.env["ir.config_parameter"].sudo()
-        vendor_id = ICP.get_param("infortisa.vendor_id")
-        journal_id = ICP.get_param("infortisa.journal_id")
-        product_purchase_id = ICP.get_param("infortisa.product_purchase_id")
-        product_shipping_id = ICP.get_param("infortisa.product_shipping_id")
-
-        partner = self.env["res.partner"].browse(int(vendor_id or 0)) if vendor_id else False
-        if not partner:
-            raise UserError(_("Configura el 'Proveedor Infortisa' en Ajustes > Infortisa."))
+        bill = self._infortisa_create_bills()
+        if not bill:
+            raise UserError(_("No hay importes de API para facturar. Pulsa 'Actualizar estado' antes."))
 
-        journal = False
-        if journal_id:
-            journal = self.env["account.journal"].browse(int(journal_id))
-        if not journal or not journal.exists():
-            journal = self.env["account.journal"].search([("type", "=", "purchase")], limit=1)
-        if not journal:
-            raise UserError(_("No se ha encontrado un diario de compras. Configúralo en Ajustes > Infortisa."))
+        action = self.env.ref("account.action_move_in_invoice_type").read()[0]
+        action["views"] = [(self.env.ref("account.view_move_form").id, "form")]
+        action["res_id"] = bill.id
+        return action
 
-        lines = []
+    def _infortisa_prepare_bill_vals(self, partner, journal, cfg):
+        """Valores de la factura de proveedor (base + portes del API); False si no hay importes."""
+        self.ensure_one()
+        Product = self.env["product.product"]
 
         def _line_from_product(prod_id, name, qty, price):
-            vals = {"name": name, "quantity": qty, "price_unit": price}
+            vals = {"name": name, "quantity": qty, "price_unit": price, "infortisa_order_id": self.id}
             if prod_id:
-                prod = self.env["product.product"].browse(int(prod_id))
-                if prod and prod.exists():
-                    vals.update({"product_id": prod.id, "product_uom_id": prod.uom_id.id})
+                prod = Product.browse(prod_id)
+                vals.update({"product_id": prod.id, "product_uom_id": prod.uom_id.id})
             return (0, 0, vals)
 
+        lines = []
         if self.infortisa_amount_base and self.infortisa_amount_base > 0:
             lines.append(_line_from_product(
-                product_purchase_id, _("Compra Infortisa %s - Base API") % (self.name,), 1.0, self.infortisa_amount_base
+                cfg.product_purchase_id, _("Compra Infortisa %s - Base API") % (self.name,), 1.0, self.infortisa_amount_base
             ))
         if self.infortisa_amount_shipping and self.infortisa_amount_shipping > 0:
             lines.append(_line_from_product(
-                product_shipping_id, _("Portes Infortisa %s - API") % (self.name,), 1.0, self.infortisa_amount_shipping
+                cfg.product_shipping_id, _("Portes Infortisa %s - API") % (self.name,), 1.0, self.infortisa_amount_shipping
             ))
-
         if not lines:
-            raise UserError(_("No hay importes de API para facturar. Pulsa 'Actualizar estado' antes."))
+            return False
 
-        bill = self.env["account.move"].create({
+        vals = {
             "move_type": "in_invoice",
             "partner_id": partner.id,
             "journal_id": journal.id,
@@ -1218,20 +1971,161 @@ class SaleOrder(models.Model):
             "currency_id": self.currency_id.id,
             "invoice_payment_term_id": partner.property_supplier_payment_term_id.id or False,
             "invoice_line_ids": lines,
-        })
-        vals_ref = {}
+        }
         if self.infortisa_transfer_ref:
-            vals_ref["payment_reference"] = self.infortisa_transfer_ref
-            vals_ref["ref"] = self.infortisa_transfer_ref
-        if vals_ref:
-            bill.write(vals_ref)
-        bill.message_post(body=_("Factura generada desde pedido %s (Infortisa).") % self.name)
-        self.infortisa_vendor_bill_id = bill.id
+            vals["payment_reference"] = self.infortisa_transfer_ref
+            vals["ref"] = self.infortisa_transfer_ref
+        return vals
+
+    def _infortisa_create_bills(self):
+        """Crea las facturas de proveedor de los pedidos que aún no la tienen en un único ``create()``.
+
+        Los pedidos sin importes del API se omiten. Devuelve las facturas creadas.
+        """
+        # Bloqueo de fila: otro worker no puede facturar el mismo pedido a la vez
+        self._infortisa_lock_rows()
+        orders = self.filtered(lambda o: not o.infortisa_vendor_bill_id)
+        Move = self.env["account.move"]
+        if not orders:
+            return Move
+
+        cfg = self._infortisa_config()
+        partner = self.env["res.partner"].browse(cfg.vendor_id)
+        if not partner:
+            raise UserError(_("Configura el 'Proveedor Infortisa' en Ajustes > Infortisa."))
+        journal = self.env["account.journal"].browse(cfg.purchase_journal_id)
+        if not journal:
+            raise UserError(_("No se ha encontrado un diario de compras. Configúralo en Ajustes > Infortisa."))
 
-        action = self.env.ref("account.action_move_in_invoice_type").read()[0]
-        action["views"] = [(self.env.ref("account.view_move_form").id, "form")]
-        action["res_id"] = bill.id
-        return action
+        with METRICS.timer("infortisa_phase_seconds", phase="billing"):
+            if cfg.bill_mode in ("daily", "transfer"):
+                return orders._infortisa_add_to_consolidated_bills(partner, journal, cfg)
+            return orders._infortisa_create_order_bills(partner, journal, cfg)
+
+    def _infortisa_create_order_bills(self, partner, journal, cfg):
+        """Una factura por pedido (base + portes), todas en un único ``create()``."""
+        Move = self.env["account.move"]
+        billed, vals_list = [], []
+        for order in self:
+            vals = order._infortisa_prepare_bill_vals(partner, journal, cfg)
+            if vals:
+                billed.append(order)
+                vals_list.append(vals)
+        if not vals_list:
+            return Move
+
+        bills = Move.create(vals_list)
+        for order, bill in zip(billed, bills):
+            order.infortisa_vendor_bill_id = bill
+        bills._message_log_batch(bodies={
+            bill.id: _("Factura generada desde pedido %s (Infortisa).") % order.name
+            for order, bill in zip(billed, bills)
+        })
+        return bills
+
+    def _infortisa_prepare_consolidated_line_vals(self, cfg):
+        """Una sola línea por pedido (base + portes del API) para la factura consolidada."""
+        self.ensure_one()
+        base = self.infortisa_amount_base if self.infortisa_amount_base > 0 else 0.0
+        shipping = self.infortisa_amount_shipping if self.infortisa_amount_shipping > 0 else 0.0
+        if not (base or shipping):
+            return False
+        vals = {
+            "name": _("Pedido Infortisa %s (base %.2f + portes %.2f)") % (self.name, base, shipping),
+            "quantity": 1.0,
+            "price_unit": base + shipping,
+            "infortisa_order_id": self.id,
+        }
+        if cfg.product_purchase_id:
+            prod = self.env["product.product"].browse(cfg.product_purchase_id)
+            vals.update({"product_id": prod.id, "product_uom_id": prod.uom_id.id})
+        return vals
+
+    def _infortisa_add_to_consolidated_bills(self, partner, journal, cfg):
+        """Añade una línea por pedido a la factura consolidada abierta de su periodo o
+        referencia de transferencia (creándola si no existe). Devuelve las facturas tocadas.
+        """
+        mode = cfg.bill_mode
+        Move = self.env["account.move"]
+        today = fields.Date.context_today(self)
+        groups = {}
+        singles = self.browse()
+        for order in self:
+            if mode == "transfer" and not order.infortisa_transfer_ref:
+                singles |= order  # sin referencia no hay con quién agrupar
+                continue
+            line_vals = order._infortisa_prepare_consolidated_line_vals(cfg)
+            if not line_vals:
+                continue
+            ref = order.infortisa_transfer_ref if mode == "transfer" else False
+            groups.setdefault((order.currency_id.id, ref), []).append((order, line_vals))
+
+        touched = singles._infortisa_create_order_bills(partner, journal, cfg) if singles else Move
+        new_vals, new_groups = [], []
+        for (currency_id, ref), items in groups.items():
+            currency = self.env["res.currency"].browse(currency_id)
+            names = ", ".join(o.name for o, _l in items)
+            bill = Move.search(
+                Move._infortisa_open_consolidated_bill_domain(mode, partner, journal, currency, ref), limit=1
+            )
+            if bill:
+                bill.write({
+                    "invoice_origin": ", ".join(filter(None, (bill.invoice_origin, names))),
+                    "invoice_line_ids": [(0, 0, l) for _o, l in items],
+                })
+                for order, _l in items:
+                    order.infortisa_vendor_bill_id = bill
+                touched |= bill
+                continue
+            label = ref or _("Infortisa %s") % fields.Date.to_string(today)
+            new_vals.append({
+                "move_type": "in_invoice",
+                "partner_id": partner.id,
+                "journal_id": journal.id,
+                "invoice_origin": names,
+                "invoice_date": today,
+                "currency_id": currency_id,
+                "invoice_payment_term_id": partner.property_supplier_payment_term_id.id or False,
+                "ref": label,
+                "payment_reference": label,
+                "infortisa_consolidation": mode,
+                "infortisa_period_date": today,
+                "infortisa_transfer_ref": ref,
+                "invoice_line_ids": [(0, 0, l) for _o, l in items],
+            })
+            new_groups.append(items)
+        if new_vals:
+            bills = Move.create(new_vals)
+            for bill, items in zip(bills, new_groups):
+                for order, _l in items:
+                    order.infortisa_vendor_bill_id = bill
+            touched |= bills
+
+        consolidated = touched.filtered("infortisa_consolidation")
+        if consolidated:
+            added = {}
+            for items in groups.values():
+                for order, _l in items:
+                    added.setdefault(order.infortisa_vendor_bill_id.id, []).append(order.name)
+            consolidated._message_log_batch(bodies={
+                bill.id: _("Pedidos Infortisa añadidos a la factura consolidada: %s") % ", ".join(added.get(bill.id, []))
+                for bill in consolidated
+            })
+        return touched
+
+    def _infortisa_create_bills_safe(self):
+        """``_infortisa_create_bills`` para el cron: si falla el bloque, reintenta pedido a pedido."""
+        try:
+            with self.env.cr.savepoint():
+                return self._infortisa_create_bills()
+        except Exception as e:
+            if len(self) == 1:
+                self.message_post(body=_("No se pudo crear la factura automaticamente: %s") % e)
+                return self.env["account.move"]
+        bills = self.env["account.move"]
+        for order in self:
+            bills |= order._infortisa_create_bills_safe()
+        return bills
 
     # ========= 7) MÉTODOS PÚBLICOS PARA ENVIAR / REENVIAR TRACKING =========
     def _infortisa_send_tracking_to_customer(self, url, number, status, status_dt, status_detail, agent, mark_notified=True):
@@ -0,0 +1,220 @@
+# infortisa_orders/models/send_queue.py
+import logging
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from psycopg2 import errors as pg_errors
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+from .infortisa_breaker import CircuitOpenError
+from .infortisa_ratelimit import LANE_BULK, RateLimitedError
+from .infortisa_metrics import METRICS
+from .sale_order import InfortisaSendError
+
+_logger = logging.getLogger(__name__)
+
+
+class InfortisaSendQueue(models.Model):
+    _name = "infortisa.send.queue"
+    _description = "Cola de envío de pedidos a Infortisa"
+    _order = "next_attempt_at, id"
+    _rec_name = "order_id"
+
+    order_id = fields.Many2one("sale.order", string="Pedido", required=True, ondelete="cascade", index=True)
+    state = fields.Selection(
+        [
+            ("pending", "Pendiente"),
+            ("done", "Enviado"),
+            ("dead", "Fallido (sin más reintentos)"),
+        ],
+        string="Estado",
+        default="pending",
+        required=True,
+        index=True,
+    )
+    attempt_count = fields.Integer("Intentos", default=0, readonly=True)
+    next_attempt_at = fields.Datetime("Próximo intento", default=fields.Datetime.now, index=True)
+    last_error = fields.Text("Último error", readonly=True)
+    attempt_ids = fields.One2many("infortisa.send.attempt", "queue_id", string="Historial de intentos", readonly=True)
+
+    _sql_constraints = [
+        ("order_uniq", "unique(order_id)", "El pedido ya está en la cola de envío a Infortisa."),
+    ]
+
+    @api.model
+    def _enqueue(self, orders):
+        """Pone los pedidos en cola (o reactiva su entrada) y despierta al dispatcher."""
+        existing = self.search([("order_id", "in", orders.ids)])
+        existing.filtered(lambda q: q.state != "done").write({
+            "state": "pending",
+            "next_attempt_at": fields.Datetime.now(),
+        })
+        new_orders = orders - existing.order_id
+        if new_orders:
+            self.create([{"order_id": o.id} for o in new_orders])
+        cron = self.env.ref("infortisa_orders.ir_cron_infortisa_send_queue", raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+        return True
+
+    def _backoff_minutes(self, attempts):
+        # 1, 2, 4, 8... minutos, como máximo un día
+        return min(2 ** max(attempts - 1, 0), 24 * 60)
+
+    @staticmethod
+    def _is_retryable(error):
+        """Errores de red y HTTP 429/5xx se reintentan; los de validación o ``HasErrors`` no."""
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        if isinstance(error, InfortisaSendError):
+            return error.retryable
+        # UserError: el pedido no es válido para Infortisa; reintentar no cambia nada
+        return not isinstance(error, UserError)
+
+    def action_retry(self):
+        self.write({"state": "pending", "next_attempt_at": fields.Datetime.now()})
+        return True
+
+    @api.model
+    def _claim_orders(self, orders):
+        """Entradas de cola de ``orders`` bloqueadas por esta transacción, creando las que falten.
+
+        Para quien envía fuera del dispatcher (envío masivo): ``FOR UPDATE SKIP
+        LOCKED`` deja fuera los pedidos cuya entrada tiene otra transacción
+        (el dispatcher u otro envío masivo), que no deben enviarse ahora.
+        Devuelve ``(entradas, pedidos_ocupados)``.
+        """
+        existing = self.search([("order_id", "in", orders.ids)])
+        locked_ids = []
+        if existing:
+            self.env.cr.execute(
+                "SELECT id FROM infortisa_send_queue WHERE id = ANY(%s) ORDER BY id FOR UPDATE SKIP LOCKED",
+                (existing.ids,),
+            )
+            locked_ids = [row[0] for row in self.env.cr.fetchall()]
+            existing.invalidate_recordset()
+        locked = existing.filtered(lambda q: q.id in locked_ids)
+        new_orders = orders - existing.order_id
+        created = self.create([{"order_id": o.id} for o in new_orders]) if new_orders else self.browse()
+        return locked | created, (existing - locked).order_id
+
+    def _lock_pending(self):
+        """Bloquea la entrada para procesarla; False si otra transacción la tiene o ya no está pendiente."""
+        self.ensure_one()
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute(
+                    "SELECT id FROM infortisa_send_queue WHERE id = %s AND state = 'pending' FOR UPDATE SKIP LOCKED",
+                    (self.id,),
+                )
+                locked = bool(self.env.cr.fetchone())
+        except pg_errors.SerializationFailure:
+            # Otra transacción la modificó después de empezar esta: ya no está pendiente
+            return False
+        self.invalidate_recordset()
+        return locked
+
+    def _record_attempt(self, error=False, retryable=True, duration_ms=0):
+        """Anota un intento de envío: hecho, reintento con backoff o dead-letter.
+
+        Cualquier intento (del dispatcher o de un envío masivo) cuenta para
+        ``attempt_count``: a partir del primero, antes de volver a hacer POST
+        se comprueba si Infortisa ya tiene el pedido (``_infortisa_recover_sent``).
+        """
+        self.ensure_one()
+        order = self.order_id
+        attempts = self.attempt_count + 1
+        vals = {
+            "attempt_count": attempts,
+            "attempt_ids": [(0, 0, {"success": not error, "error": error or False, "duration_ms": duration_ms})],
+        }
+        if not error:
+            vals.update({"state": "done", "last_error": False})
+        else:
+            max_attempts = max(1, order._infortisa_config().send_max_attempts)
+            vals["last_error"] = error
+            if not retryable:
+                vals["state"] = "dead"
+                order.message_post(body=_("Envío a Infortisa rechazado (no se reintenta): %s") % error)
+            elif attempts >= max_attempts:
+                vals["state"] = "dead"
+                order.message_post(
+                    body=_("Envío a Infortisa abandonado tras %s intentos: %s") % (attempts, error)
+                )
+            else:
+                vals["next_attempt_at"] = fields.Datetime.now() + timedelta(minutes=self._backoff_minutes(attempts))
+        self.write(vals)
+
+    def _process_one(self):
+        self.ensure_one()
+        order = self.order_id
+        if order.infortisa_sent:
+            self.write({"state": "done"})
+            return True
+        if not order.infortisa_allowed:
+            self.write({"state": "done", "last_error": _("El pedido ya no usa el flujo Infortisa; no se envía.")})
+            return True
+
+        started = time.monotonic()
+        error = False
+        retryable = True
+        try:
+            with self.env.cr.savepoint():
+                bulk_order = order.with_context(infortisa_lane=LANE_BULK)
+                # Un intento anterior pudo crear el pedido en Infortisa aunque aquí se deshiciera
+                if not (self.attempt_count and bulk_order._infortisa_recover_sent()):
+                    bulk_order.action_infortisa_send(block=None, test=None)
+        except (CircuitOpenError, RateLimitedError):
+            # API caída o sin cupo: no cuenta como intento; la entrada sigue pendiente
+            raise
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            retryable = self._is_retryable(e)
+        self._record_attempt(error, retryable, int((time.monotonic() - started) * 1000))
+        return not error
+
+    @api.model
+    def cron_infortisa_dispatch_send_queue(self):
+        batch = max(1, self.env["sale.order"]._infortisa_config().send_batch_size)
+        entries = self.sudo().search([
+            ("state", "=", "pending"),
+            ("next_attempt_at", "<=", fields.Datetime.now()),
+        ], limit=batch)
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        circuit_open = False
+        for entry in entries:
+            # Un envío masivo puede tener la entrada bloqueada (y estar haciendo el POST)
+            if not entry._lock_pending():
+                continue
+            try:
+                entry._process_one()
+            except (CircuitOpenError, RateLimitedError) as e:
+                _logger.warning("Cola Infortisa: %s", e)
+                circuit_open = True
+                break
+            except Exception as e:
+                _logger.exception("Cola Infortisa: error procesando %s: %s", entry.order_id.name, e)
+            if auto_commit:
+                # El pedido ya existe en Infortisa: no perder ese hecho por un fallo posterior
+                self.env.cr.commit()
+        if entries:
+            METRICS.inc("infortisa_cron_runs_total", cron="send_queue")
+            self.env["infortisa.metric"]._flush_metrics()
+        if len(entries) == batch and not circuit_open:
+            self.env.ref("infortisa_orders.ir_cron_infortisa_send_queue")._trigger()
+
+
+class InfortisaSendAttempt(models.Model):
+    _name = "infortisa.send.attempt"
+    _description = "Intento de envío a Infortisa"
+    _order = "id desc"
+
+    queue_id = fields.Many2one("infortisa.send.queue", required=True, ondelete="cascade", index=True)
+    order_id = fields.Many2one(related="queue_id.order_id", string="Pedido")
+    success = fields.Boolean("Correcto", readonly=True)
+    error = fields.Text("Error", readonly=True)
+    duration_ms = fields.Integer("Duración (ms)", readonly=True)
@@ -0,0 +1,173 @@
+# infortisa_orders/models/send_wizard.py
+import logging
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+from .infortisa_breaker import CircuitOpenError
+from .infortisa_ratelimit import LANE_BULK, RateLimitedError
+
+_logger = logging.getLogger(__name__)
+
+
+class InfortisaSendWizard(models.TransientModel):
+    """Envío masivo de pedidos a Infortisa.
+
+    Construye todos los XML primero (ORM, en serie), los envía en paralelo con un
+    pool acotado (sólo HTTP) y aplica las respuestas de nuevo en serie, cada pedido
+    en su propio savepoint: un fallo no aborta el resto del lote.
+
+    Cada pedido enviado pasa por su entrada de ``infortisa.send.queue``: se
+    bloquea antes del POST (el dispatcher no lo envía a la vez) y el resultado
+    se anota como un intento más, así la cola no repite a ciegas un envío
+    que pudo llegar a Infortisa.
+    """
+
+    _name = "infortisa.send.wizard"
+    _description = "Envío masivo a Infortisa"
+
+    order_ids = fields.Many2many("sale.order", string="Pedidos")
+    block = fields.Boolean("Crear bloqueados")
+    test = fields.Boolean("Modo TEST")
+    max_workers = fields.Integer("Envíos simultáneos")
+    state = fields.Selection([("draft", "Preparado"), ("done", "Terminado")], default="draft")
+    line_ids = fields.One2many("infortisa.send.wizard.line", "wizard_id", string="Resultado", readonly=True)
+    sent_count = fields.Integer("Enviados", compute="_compute_counts")
+    failed_count = fields.Integer("Con error", compute="_compute_counts")
+    skipped_count = fields.Integer("Omitidos", compute="_compute_counts")
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        cfg = self.env["sale.order"]._infortisa_config()
+        res.setdefault("block", cfg.default_block)
+        res.setdefault("test", cfg.test_mode)
+        res.setdefault("max_workers", cfg.poll_workers)
+        if self.env.context.get("active_model") == "sale.order" and "order_ids" in fields_list:
+            res["order_ids"] = [(6, 0, self.env.context.get("active_ids") or [])]
+        return res
+
+    @api.depends("line_ids.result")
+    def _compute_counts(self):
+        for wiz in self:
+            results = wiz.line_ids.mapped("result")
+            wiz.sent_count = results.count("sent")
+            wiz.failed_count = results.count("error")
+            wiz.skipped_count = results.count("skipped")
+
+    def action_send(self):
+        self.ensure_one()
+        if not self.order_ids:
+            raise UserError(_("No hay pedidos seleccionados."))
+        orders = self.order_ids
+        orders._get_infortisa_headers()  # falla pronto si no hay API Key
+
+        lines = []
+        payloads = {}
+        # 1) Construir todos los XML (ORM, en serie)
+        for order in orders:
+            if not order.infortisa_allowed:
+                lines.append({"order_id": order.id, "result": "skipped", "error": _("No usa el flujo Infortisa.")})
+                continue
+            if order.infortisa_sent:
+                lines.append({"order_id": order.id, "result": "skipped", "error": _("Ya enviado a Infortisa.")})
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    payloads[order.id] = order._infortisa_build_order_payload(self.block, self.test)
+            except Exception as e:
+                lines.append({"order_id": order.id, "result": "error", "error": str(e) or e.__class__.__name__})
+
+        # 2) Reservar sus entradas de la cola de envío
+        Queue = self.env["infortisa.send.queue"].sudo()
+        entries, busy = Queue._claim_orders(orders.filtered(lambda o: o.id in payloads))
+        for order in busy:
+            del payloads[order.id]
+            lines.append({"order_id": order.id, "result": "skipped", "error": _("Se está enviando desde la cola de envío.")})
+        entry_by_order = {entry.order_id.id: entry for entry in entries}
+        # Un intento anterior (de la cola o de otro envío masivo) pudo crear ya el pedido en Infortisa
+        for entry in entries.filtered("attempt_count"):
+            order = entry.order_id
+            try:
+                with self.env.cr.savepoint():
+                    recovered = order.with_context(infortisa_lane=LANE_BULK)._infortisa_recover_sent()
+            except Exception as e:
+                del payloads[order.id]
+                lines.append({"order_id": order.id, "result": "error", "error": str(e) or e.__class__.__name__})
+                continue
+            if recovered:
+                del payloads[order.id]
+                entry._record_attempt()
+                lines.append({"order_id": order.id, "result": "sent", "internal_ref": order.infortisa_internal_ref})
+
+        # 3) POST concurrente (sólo HTTP)
+        posted = orders._infortisa_post_orders_many(payloads, max_workers=max(1, self.max_workers))
+
+        # 4) Aplicar respuestas (ORM, en serie, un savepoint por pedido)
+        Log = self.env["infortisa.api.log"]
+        log_vals = []
+        for order in orders.filtered(lambda o: o.id in posted):
+            status_code, body, error, latency_ms = posted[order.id]
+            entry = entry_by_order[order.id]
+            log_vals.append(Log._prepare_vals(
+                order, "order/create",
+                request=payloads[order.id], response=body,
+                http_status=status_code, latency_ms=latency_ms, error=error,
+            ))
+            try:
+                if error:
+                    raise error
+                with self.env.cr.savepoint():
+                    internal_ref = order._infortisa_apply_send_response(status_code, body, self.block, self.test)
+                lines.append({
+                    "order_id": order.id,
+                    "result": "sent",
+                    "internal_ref": internal_ref,
+                    "duration_ms": int(latency_ms or 0),
+                })
+                entry._record_attempt(duration_ms=int(latency_ms or 0))
+            except Exception as e:
+                message = str(e) or e.__class__.__name__
+                lines.append({
+                    "order_id": order.id,
+                    "result": "error",
+                    "error": message,
+                    "duration_ms": int(latency_ms or 0),
+                })
+                # API caída o sin cupo: el POST no llegó a hacerse y no cuenta como intento
+                if not isinstance(e, (CircuitOpenError, RateLimitedError)):
+                    entry._record_attempt(message, Queue._is_retryable(e), int(latency_ms or 0))
+        if log_vals:
+            Log.sudo().create(log_vals)
+
+        self.write({"state": "done", "line_ids": [(0, 0, vals) for vals in lines]})
+        self.env["infortisa.metric"]._flush_metrics()
+        _logger.info(
+            "Infortisa: envío masivo de %s pedidos: %s enviados, %s con error, %s omitidos.",
+            len(orders), self.sent_count, self.failed_count, self.skipped_count,
+        )
+        return {
+            "type": "ir.actions.act_window",
+            "name": _("Envío masivo a Infortisa"),
+            "res_model": self._name,
+            "view_mode": "form",
+            "res_id": self.id,
+            "target": "new",
+        }
+
+
+class InfortisaSendWizardLine(models.TransientModel):
+    _name = "infortisa.send.wizard.line"
+    _description = "Resultado de envío masivo a Infortisa"
+    _order = "result, id"
+
+    wizard_id = fields.Many2one("infortisa.send.wizard", required=True, ondelete="cascade")
+    order_id = fields.Many2one("sale.order", string="Pedido", readonly=True)
+    result = fields.Selection(
+        [("error", "Error"), ("sent", "Enviado"), ("skipped", "Omitido")],
+        string="Resultado",
+        readonly=True,
+    )
+    internal_ref = fields.Char("Ref. Interna (Infortisa)", readonly=True)
+    error = fields.Text("Error", readonly=True)
+    duration_ms = fields.Integer("Duración (ms)", readonly=True)
@@ -0,0 +1,170 @@
+# infortisa_orders/models/status_inbox.py
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+from .infortisa_metrics import METRICS
+
+_logger = logging.getLogger(__name__)
+
+
+class InfortisaStatusInbox(models.Model):
+    """Notificaciones de estado recibidas en ``/infortisa/status`` pendientes de aplicar.
+
+    El controlador sólo inserta aquí el XML (el mismo ``OrderStatusResponse``
+    que devuelve /api/order/status) y lanza ``cron_infortisa_process_status_inbox``,
+    que lo aplica por el mismo camino que el cron de estado
+    (``SaleOrder._infortisa_apply_status_many``): parseo, tracking, facturas y pagos.
+    """
+
+    _name = "infortisa.status.inbox"
+    _description = "Notificación de estado Infortisa recibida"
+    _order = "id desc"
+    _rec_name = "customer_ref"
+
+    order_id = fields.Many2one("sale.order", string="Pedido", required=True, ondelete="cascade", index=True, readonly=True)
+    customer_ref = fields.Char("Ref. Cliente (Infortisa)", required=True, readonly=True)
+    correlation_id = fields.Char("Id. de correlación", index="btree_not_null", readonly=True)
+    # Se vacía al aplicarla: la respuesta queda en el historial API
+    body = fields.Text("XML recibido", readonly=True)
+    state = fields.Selection(
+        [("pending", "Pendiente"), ("done", "Aplicada"), ("superseded", "Sustituida"), ("error", "Error")],
+        string="Estado",
+        default="pending",
+        required=True,
+        index=True,
+        readonly=True,
+    )
+    error = fields.Text("Error", readonly=True)
+    processed_at = fields.Datetime("Procesada el", readonly=True)
+
+    @api.model
+    def _receive(self, customer_ref, body, correlation_id=None):
+        """Encola una notificación; None si no hay un pedido enviado a Infortisa con esa CustomerReference."""
+        order = self.env["sale.order"].sudo().search([
+            ("infortisa_customer_ref", "=", customer_ref),
+            ("infortisa_sent", "=", True),
+            ("infortisa_allowed", "=", True),
+        ], limit=1)
+        if not order:
+            return None
+        entry = self.sudo().create({
+            "order_id": order.id,
+            "customer_ref": customer_ref,
+            "correlation_id": correlation_id or False,
+            "body": body,
+        })
+        self._trigger_process()
+        return entry
+
+    @api.model
+    def _purge(self, limit_date):
+        """Sólo las ya aplicadas o sustituidas: las pendientes y con error se conservan."""
+        self.env.cr.execute(
+            "DELETE FROM infortisa_status_inbox WHERE create_date < %s AND state IN ('done', 'superseded')",
+            (limit_date,),
+        )
+        count = self.env.cr.rowcount
+        self.invalidate_model()
+        return count
+
+    @api.model
+    def _trigger_process(self, at=None):
+        cron = self.env.ref("infortisa_orders.ir_cron_infortisa_process_status_inbox", raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger(at=at)
+
+    def action_retry(self):
+        self.write({"state": "pending", "error": False})
+        self._trigger_process()
+        return True
+
+    @api.model
+    def cron_infortisa_process_status_inbox(self):
+        """Aplica las notificaciones pendientes en bloques, con commit tras cada bloque.
+
+        Cada notificación trae el estado completo del pedido, así que sólo se
+        aplica la más reciente de cada uno y las anteriores quedan sustituidas.
+        Los pedidos se reservan como en el cron de estado
+        (``_infortisa_claim_poll_lease``): los que un cron está consultando en
+        ese momento se dejan pendientes y se reintentan al minuto.
+        """
+        Order = self.env["sale.order"].sudo()
+        cfg = Order._infortisa_config()
+        chunk_size = max(1, cfg.poll_chunk_size)
+        budget = max(1, cfg.poll_time_budget)
+        lease = timedelta(seconds=2 * budget)
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        started = time.monotonic()
+
+        Inbox = self.sudo()
+        pay_ctx = None
+        busy = Order.browse()
+        processed = skipped = failed = 0
+        backlog = False
+        while True:
+            if time.monotonic() - started >= budget:
+                backlog = True
+                break
+            entries = Inbox.search(
+                [("state", "=", "pending"), ("order_id", "not in", busy.ids)], order="id", limit=chunk_size
+            )
+            if not entries:
+                break
+            claimed = entries.order_id._infortisa_claim_poll_lease(lease)
+            busy |= entries.order_id - claimed
+            if not claimed:
+                continue
+            if auto_commit:
+                # La reserva tiene que verse ya en los crons de estado
+                self.env.cr.commit()
+            if pay_ctx is None:
+                pay_ctx = Order._infortisa_payment_context()
+
+            pending = Inbox.search([("state", "=", "pending"), ("order_id", "in", claimed.ids)], order="id")
+            latest = {}
+            for entry in pending:
+                latest[entry.order_id.id] = entry
+            # Otra ejecución pudo aplicarlas entre la búsqueda y la reserva
+            orders = claimed.filtered(lambda o: o.id in latest)
+            applying = Inbox.browse([entry.id for entry in latest.values()])
+            now = fields.Datetime.now()
+            (pending - applying).write({"state": "superseded", "processed_at": now, "body": False})
+
+            fetched = {order_id: (200, entry.body, None, 0) for order_id, entry in latest.items()}
+            traces = {
+                order.id: order._infortisa_new_trace(latest[order.id].correlation_id) for order in orders
+            }
+            p, sk, errors = orders._infortisa_apply_status_many(fetched, pay_ctx=pay_ctx, traces=traces, source="push")
+            processed, skipped, failed = processed + p, skipped + sk, failed + len(errors)
+            for order_id, entry in latest.items():
+                if order_id in errors:
+                    entry.write({"state": "error", "error": str(errors[order_id]), "processed_at": now})
+                else:
+                    entry.write({"state": "done", "error": False, "processed_at": now, "body": False})
+            claimed._infortisa_release_poll_lease()
+            if auto_commit:
+                self.env.cr.commit()
+
+        if busy:
+            # Pedidos reservados por un cron de estado: se reintentan cuando haya terminado
+            self._trigger_process(at=fields.Datetime.now() + timedelta(minutes=1))
+        if not (processed or skipped or failed):
+            return
+        _logger.info(
+            "Infortisa: %s notificaciones de estado aplicadas, %s sin cambios, %s con error.",
+            processed, skipped, failed,
+        )
+        METRICS.inc("infortisa_cron_runs_total", cron="status_inbox")
+        METRICS.observe("infortisa_cron_duration_seconds", time.monotonic() - started, cron="status_inbox")
+        for result, count in (("processed", processed), ("skipped", skipped), ("failed", failed)):
+            if count:
+                METRICS.inc("infortisa_cron_orders_total", count, cron="status_inbox", result=result)
+        self.env["infortisa.metric"]._flush_metrics()
+        if self.env["infortisa.tracking.outbox"].sudo().search_count([("state", "=", "pending")], limit=1):
+            self.env["infortisa.tracking.outbox"]._trigger_send()
+        if backlog:
+            self._trigger_process()
@@ -0,0 +1,159 @@
+# infortisa_orders/models/tracking_outbox.py
+import logging
+import threading
+from datetime import timedelta
+
+from odoo import api, fields, models, _
+
+_logger = logging.getLogger(__name__)
+
+# Reintentos de un email fallido antes de darlo por perdido (10, 20, 40, 80 minutos)
+MAX_ATTEMPTS = 5
+
+
+class InfortisaTrackingOutbox(models.Model):
+    """Notificaciones de seguimiento pendientes de enviar al cliente.
+
+    La consulta de estado sólo inserta aquí una fila; el renderizado del email
+    (``mail.template``) y su puesta en cola los hace ``cron_infortisa_send_tracking``
+    en bloque, opcionalmente agrupando varios envíos del mismo cliente en un
+    único email (resumen). Si el email falla, la entrada sigue pendiente y se
+    reintenta con espera creciente; tras ``MAX_ATTEMPTS`` pasa a error y se
+    avisa en el chatter del pedido.
+    """
+
+    _name = "infortisa.tracking.outbox"
+    _description = "Notificación de seguimiento Infortisa pendiente"
+    _order = "id"
+    _rec_name = "order_id"
+
+    order_id = fields.Many2one("sale.order", string="Pedido", required=True, ondelete="cascade", index=True)
+    partner_id = fields.Many2one("res.partner", string="Cliente", required=True, ondelete="cascade")
+    state = fields.Selection(
+        [("pending", "Pendiente"), ("sent", "Enviado"), ("error", "Error")],
+        string="Estado",
+        default="pending",
+        required=True,
+        index=True,
+    )
+    tracking_url = fields.Char("Tracking URL")
+    tracking_number = fields.Char("Nº de seguimiento")
+    tracking_status = fields.Char("Estado del envío")
+    tracking_status_dt = fields.Char("Fecha estado")
+    tracking_status_detail = fields.Char("Detalle")
+    tracking_agent = fields.Char("Transportista")
+    error = fields.Text("Error", readonly=True)
+    attempt_count = fields.Integer("Intentos", default=0, readonly=True)
+    next_attempt_at = fields.Datetime("Próximo intento", readonly=True)
+    sent_at = fields.Datetime("Enviado el", readonly=True)
+    # Resumen: el email se renderiza sobre la primera entrada del cliente y lista también las demás
+    digest_parent_id = fields.Many2one("infortisa.tracking.outbox", string="Incluido en", readonly=True, index="btree_not_null")
+    digest_child_ids = fields.One2many("infortisa.tracking.outbox", "digest_parent_id", readonly=True)
+    digest_entry_ids = fields.Many2many("infortisa.tracking.outbox", compute="_compute_digest_entry_ids")
+
+    @api.depends("digest_child_ids")
+    def _compute_digest_entry_ids(self):
+        for entry in self:
+            entry.digest_entry_ids = entry | entry.digest_child_ids
+
+    @api.model
+    def _enqueue(self, order, url, number=None, status=None, status_dt=None, status_detail=None, agent=None):
+        """Deja la notificación en cola (sustituye la pendiente del mismo pedido, si la hay)."""
+        vals = {
+            "partner_id": order.partner_id.id,
+            "tracking_url": url,
+            "tracking_number": number or False,
+            "tracking_status": status or False,
+            "tracking_status_dt": status_dt or False,
+            "tracking_status_detail": status_detail or False,
+            "tracking_agent": agent or False,
+            "attempt_count": 0,
+            "next_attempt_at": False,
+        }
+        pending = self.sudo().search([("order_id", "=", order.id), ("state", "=", "pending")], limit=1)
+        if pending:
+            pending.write(vals)
+            return pending
+        return self.sudo().create(dict(vals, order_id=order.id))
+
+    @api.model
+    def _trigger_send(self):
+        cron = self.env.ref("infortisa_orders.ir_cron_infortisa_send_tracking", raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    @staticmethod
+    def _backoff_minutes(attempts):
+        return min(10 * 2 ** max(attempts - 1, 0), 24 * 60)
+
+    def _record_failure(self, error):
+        """Email no generado: vuelve a la cola con espera creciente, o a error tras ``MAX_ATTEMPTS``."""
+        now = fields.Datetime.now()
+        for entry in self:
+            attempts = entry.attempt_count + 1
+            vals = {"attempt_count": attempts, "error": error, "digest_parent_id": False}
+            if attempts < MAX_ATTEMPTS:
+                vals.update(state="pending", next_attempt_at=now + timedelta(minutes=self._backoff_minutes(attempts)))
+            else:
+                vals["state"] = "error"
+                entry.order_id.message_post(body=_(
+                    "No se pudo enviar el seguimiento al cliente tras %s intentos: %s"
+                ) % (attempts, error))
+            entry.write(vals)
+
+    def action_retry(self):
+        self.write({
+            "state": "pending",
+            "error": False,
+            "digest_parent_id": False,
+            "attempt_count": 0,
+            "next_attempt_at": False,
+        })
+        self._trigger_send()
+        return True
+
+    @api.model
+    def cron_infortisa_send_tracking(self):
+        cfg = self.env["sale.order"]._infortisa_config()
+        batch = max(1, cfg.send_batch_size)
+        entries = self.sudo().search([
+            ("state", "=", "pending"),
+            "|", ("next_attempt_at", "=", False), ("next_attempt_at", "<=", fields.Datetime.now()),
+        ], limit=batch * 4)
+        if not entries:
+            return
+        template = self.env.ref("infortisa_orders.mail_template_infortisa_tracking", raise_if_not_found=False)
+        if not template:
+            _logger.warning("Infortisa: falta la plantilla de email de seguimiento.")
+            return
+
+        # Un email por entrada o, en modo resumen, uno por cliente
+        groups = {}
+        for entry in entries:
+            key = entry.partner_id.id if cfg.tracking_digest else entry.id
+            groups.setdefault(key, self.browse())
+            groups[key] |= entry
+        leaders = self.browse()
+        for group in list(groups.values())[:batch]:
+            leader = group[0]
+            (group - leader).write({"digest_parent_id": leader.id})
+            leaders |= leader
+        sending = leaders | leaders.digest_child_ids
+
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        try:
+            with self.env.cr.savepoint():
+                template.send_mail_batch(leaders.ids, force_send=False)
+        except Exception as e:
+            _logger.exception("Infortisa: error generando emails de seguimiento")
+            sending._record_failure(str(e))
+        else:
+            sending.write({"state": "sent", "sent_at": fields.Datetime.now(), "error": False, "next_attempt_at": False})
+            sending.order_id._message_log_batch(bodies={
+                o.id: _("Seguimiento enviado al cliente por email.") for o in sending.order_id
+            })
+        if auto_commit:
+            self.env.cr.commit()
+        _logger.info("Infortisa: %s notificaciones de seguimiento en %s emails.", len(sending), len(leaders))
+        if len(groups) > batch or len(entries) == batch * 4:
+            self._trigger_send()
@@ -0,0 +1,16 @@
+# infortisa_orders/tests/__init__.py
+from . import test_infortisa_parser
+from . import test_infortisa_breaker
+from . import test_infortisa_ratelimit
+from . import test_poll_schedule
+from . import test_poll_cron
+from . import test_poll_lease
+from . import test_changeset
+from . import test_status_digest
+from . import test_vendor_bills
+from . import test_consolidated_bills
+from . import test_product_flags
+from . import test_send_queue
+from . import test_send_wizard
+from . import test_status_push
+from . import test_tracking_outbox
@@ -0,0 +1,102 @@
+# infortisa_orders/tests/common.py
+from contextlib import contextmanager
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import TransactionCase
+from odoo.tools.misc import file_open
+
+
+def fixture(name):
+    """Respuesta de ``benchmarks/fixtures`` (las mismas que usan el mock y el benchmark del parser)."""
+    with file_open("infortisa_orders/benchmarks/fixtures/%s" % name) as fh:
+        return fh.read()
+
+
+def set_params(env, **params):
+    """``infortisa.<clave>`` en ir.config_parameter (invalida la instantánea de configuración)."""
+    ICP = env["ir.config_parameter"].sudo()
+    for key, value in params.items():
+        ICP.set_param("infortisa.%s" % key, value)
+
+
+def api_response(status_code=200, text=""):
+    """Respuesta HTTP mínima: lo que leen el parseo y el Historial API."""
+    return SimpleNamespace(status_code=status_code, text=text, elapsed=timedelta(milliseconds=10))
+
+
+class InfortisaCommon(TransactionCase):
+    """Base de los tests con pedidos Infortisa: nunca llama a la API."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Los cursores propios (circuito, cubo de llamadas, métricas, reserva manual)
+        # comparten la transacción del test y se deshacen con ella
+        cls.registry.enter_test_mode(cls.cr)
+        cls.addClassCleanup(cls.registry.leave_test_mode)
+        cls.customer = cls.env["res.partner"].create({"name": "Cliente Infortisa"})
+
+    @classmethod
+    def _set_params(cls, **params):
+        set_params(cls.env, **params)
+
+    @classmethod
+    def _create_orders(cls, count=1, sent=True, **vals):
+        """Pedidos del flujo Infortisa, enviados (``sent``) con su CustomerReference."""
+        orders = cls.env["sale.order"].create([{"partner_id": cls.customer.id} for _i in range(count)])
+        # Sin líneas de un proveedor Infortisa: el flag se marca a mano
+        orders.write({"infortisa_allowed": True})
+        for order in orders:
+            order.write(dict(
+                {"infortisa_sent": sent, "infortisa_customer_ref": order.name.replace("/", "")}, **vals
+            ))
+        return orders
+
+    def _patch_api(self, *responses):
+        """``_infortisa_api`` con un cliente simulado que devuelve ``responses`` en orden.
+
+        Devuelve ``(patcher, client)``; el patcher se usa como context manager.
+        """
+        client = MagicMock()
+        client.get.side_effect = responses
+        client.post.side_effect = responses
+
+        @contextmanager
+        def api(*args, **kwargs):
+            yield client
+
+        return patch.object(self.registry["sale.order"], "_infortisa_api", side_effect=api), client
+
+
+class InfortisaBillingCommon(AccountTestInvoicingCommon):
+    """Base de los tests de facturas de proveedor: compañía con plan contable de prueba."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.vendor = cls.partner_b
+        cls.purchase_journal = cls.company_data["default_journal_purchase"]
+        cls._set_params(vendor_id=cls.vendor.id, journal_id=cls.purchase_journal.id, bill_mode="order")
+
+    @classmethod
+    def _set_params(cls, **params):
+        set_params(cls.env, **params)
+
+    @classmethod
+    def _create_billable_orders(cls, amounts, transfer_ref="VR/000123"):
+        """Pedidos enviados con importes del API, uno por ``(base, portes)`` de ``amounts``."""
+        orders = cls.env["sale.order"].create([{"partner_id": cls.partner_a.id} for _a in amounts])
+        for order, (base, shipping) in zip(orders, amounts):
+            order.write({
+                "infortisa_allowed": True,
+                "infortisa_sent": True,
+                "infortisa_customer_ref": order.name.replace("/", ""),
+                "infortisa_op_code": transfer_ref or "VR/",
+                "infortisa_transfer_ref": transfer_ref,
+                "infortisa_amount_base": base,
+                "infortisa_amount_shipping": shipping,
+            })
+        return orders
@@ -0,0 +1,55 @@
+# infortisa_orders/tests/test_changeset.py
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from ..models.infortisa_changeset import FLOAT_TOLERANCE, InfortisaChangeSet
+from .common import InfortisaCommon, fixture
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaChangeSet(InfortisaCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.order = cls._create_orders()
+
+    def test_changeset_float_tolerance(self):
+        self.order.write({"infortisa_amount_total": 100.0})
+        cs = InfortisaChangeSet(self.order)
+        self.assertFalse(cs.set("infortisa_amount_total", 100.0 + FLOAT_TOLERANCE / 2, "total"))
+        self.assertFalse(cs.vals)
+        self.assertFalse(cs.messages)
+        self.assertTrue(cs.set("infortisa_amount_total", 100.0 + FLOAT_TOLERANCE * 2, "total"))
+        self.assertEqual(cs.messages, ["total"])
+        cs.flush()
+        self.assertAlmostEqual(self.order.infortisa_amount_total, 100.0 + FLOAT_TOLERANCE * 2)
+        self.assertFalse(cs.vals)
+
+    def test_changeset_empty_values(self):
+        cs = InfortisaChangeSet(self.order)
+        # False, None y "" son el mismo valor vacío: no hay cambio
+        self.assertFalse(cs.set("infortisa_state", ""))
+        self.assertFalse(cs.set("infortisa_amount_tax", None))
+        self.assertTrue(cs.set("infortisa_state", "Importing"))
+        self.assertEqual(cs.get("infortisa_state"), "Importing")
+        self.assertFalse(self.order.infortisa_state)
+
+    def test_status_update_is_one_write_and_one_message(self):
+        order = self.order.with_context(infortisa_from_cron=True, infortisa_defer_billing=True)
+        SaleOrder = self.registry["sale.order"]
+        messages_before = len(self.order.message_ids)
+        with patch.object(SaleOrder, "write", autospec=True, side_effect=SaleOrder.write) as write:
+            applied = order._infortisa_apply_status_response(200, fixture("status_pending_transfer.xml"))
+        self.assertTrue(applied)
+        order_writes = [c for c in write.call_args_list if c.args[0].ids == self.order.ids]
+        self.assertEqual(len(order_writes), 1)
+        self.assertEqual(len(self.order.message_ids), messages_before + 1)
+        self.assertEqual(self.order.infortisa_op_code, "VR/000123")
+        self.assertEqual(self.order.infortisa_internal_ref, "EXT1234567")
+        self.assertEqual(self.order.infortisa_state, "Pendiente de transferencia")
+        self.assertAlmostEqual(self.order.infortisa_amount_total, 329.91)
+        body = self.order.message_ids[:1].body
+        self.assertIn("VR/000123", body)
+        self.assertIn("Total (API) actualizado", body)
@@ -0,0 +1,62 @@
+# infortisa_orders/tests/test_consolidated_bills.py
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import InfortisaBillingCommon
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaConsolidatedBills(InfortisaBillingCommon):
+    """Facturas consolidadas: una línea por pedido en la factura abierta del periodo o la referencia."""
+
+    def test_daily_bill_accumulates_orders(self):
+        self._set_params(bill_mode="daily")
+        first = self._create_billable_orders([(100.0, 5.0), (200.0, 0.0)])
+        bill = first._infortisa_create_bills()
+        self.assertEqual(len(bill), 1)
+        self.assertEqual(first.infortisa_vendor_bill_id, bill)
+        self.assertEqual((bill.infortisa_consolidation, bill.state), ("daily", "draft"))
+        self.assertEqual(bill.infortisa_period_date, fields.Date.context_today(bill))
+        self.assertEqual(len(bill.invoice_line_ids), 2)
+        self.assertEqual(bill.amount_untaxed, 305.0)
+
+        # Pedidos posteriores del mismo día van a la misma factura
+        later = self._create_billable_orders([(50.0, 0.0)], transfer_ref="VR/000999")
+        self.assertEqual(later._infortisa_create_bills(), bill)
+        self.assertEqual(len(bill.invoice_line_ids), 3)
+        self.assertEqual(bill.amount_untaxed, 355.0)
+        self.assertIn(later.name, bill.invoice_origin)
+        self.assertEqual(bill.infortisa_order_ids, first | later)
+
+    def test_transfer_bills_group_by_reference(self):
+        self._set_params(bill_mode="transfer")
+        same_ref = self._create_billable_orders([(100.0, 0.0), (20.0, 0.0)], transfer_ref="VR/000123")
+        other_ref = self._create_billable_orders([(30.0, 0.0)], transfer_ref="VR/000456")
+        no_ref = self._create_billable_orders([(40.0, 0.0)], transfer_ref=False)
+        bills = (same_ref | other_ref | no_ref)._infortisa_create_bills()
+        self.assertEqual(len(bills), 3)
+        grouped = same_ref.infortisa_vendor_bill_id
+        self.assertEqual(len(grouped), 1)
+        self.assertEqual((grouped.infortisa_transfer_ref, grouped.payment_reference), ("VR/000123", "VR/000123"))
+        self.assertEqual(grouped.amount_untaxed, 120.0)
+        self.assertEqual(other_ref.infortisa_vendor_bill_id.infortisa_transfer_ref, "VR/000456")
+        # Sin referencia no hay con quién agrupar: factura propia, no consolidada
+        self.assertFalse(no_ref.infortisa_vendor_bill_id.infortisa_consolidation)
+
+    def test_close_cron_posts_previous_periods(self):
+        self._set_params(bill_mode="daily")
+        old_orders = self._create_billable_orders([(100.0, 0.0)])
+        old_bill = old_orders._infortisa_create_bills()
+        old_bill.infortisa_period_date = fields.Date.context_today(old_bill) - timedelta(days=1)
+        today_orders = self._create_billable_orders([(50.0, 0.0)])
+        today_bill = today_orders._infortisa_create_bills()
+        self.assertNotEqual(old_bill, today_bill)
+
+        with patch.object(self.registry["sale.order"], "_auto_make_payment_if_ready", autospec=True) as pay:
+            self.env["account.move"].cron_infortisa_close_consolidated_bills()
+        self.assertEqual(old_bill.state, "posted")
+        self.assertEqual(today_bill.state, "draft")
+        self.assertEqual(pay.call_args.args[0], old_orders)
@@ -0,0 +1,154 @@
+# infortisa_orders/tests/test_infortisa_breaker.py
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import BaseCase, tagged
+
+from .common import InfortisaCommon
+from ..models.api_circuit import InfortisaCircuitOpen
+from ..models.infortisa_breaker import CircuitBreaker, CircuitOpenError, adaptive_timeout, ewma
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaBreaker(BaseCase):
+
+    def test_trips_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=3)
+        for _i in range(2):
+            breaker.before_call()
+            breaker.record(False, 0, "HTTP 503")
+        self.assertFalse(breaker.tripped)
+        breaker.before_call()
+        breaker.record(False, 0, "HTTP 503")
+        self.assertTrue(breaker.tripped)
+        self.assertEqual(breaker.last_error, "HTTP 503")
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_success_resets_trailing_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, consecutive_failures=1)
+        breaker.record(True, 120)
+        self.assertEqual(breaker.trailing_failures, 0)
+        breaker.record(False, 0)
+        self.assertFalse(breaker.tripped)
+
+    def test_inherits_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, consecutive_failures=2)
+        breaker.record(False, 0)
+        self.assertTrue(breaker.tripped)
+
+    def test_slow_call_counts_as_failure(self):
+        breaker = CircuitBreaker(failure_threshold=1, slow_ms=1000)
+        breaker.record(True, 999)
+        self.assertFalse(breaker.tripped)
+        breaker.record(True, 1500)
+        self.assertTrue(breaker.tripped)
+        self.assertEqual(breaker.latencies_ms, [999, 1500])
+        self.assertIn("latencia", breaker.last_error)
+
+    def test_probe_allows_single_call(self):
+        breaker = CircuitBreaker(probe=True)
+        breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_probe_failure_trips(self):
+        breaker = CircuitBreaker(probe=True, failure_threshold=5)
+        breaker.before_call()
+        breaker.record(False, 0)
+        self.assertTrue(breaker.tripped)
+
+    def test_cancel_call_frees_probe(self):
+        breaker = CircuitBreaker(probe=True)
+        breaker.before_call()
+        breaker.cancel_call()
+        breaker.before_call()
+        self.assertEqual(breaker.calls, 1)
+
+    def test_ewma_and_adaptive_timeout(self):
+        self.assertEqual(ewma(0, [100]), 100)
+        self.assertAlmostEqual(ewma(100, [200]), 120)
+        self.assertEqual(adaptive_timeout(0, 60), 60)
+        self.assertEqual(adaptive_timeout(500, 60), 5.0)
+        self.assertEqual(adaptive_timeout(5000, 60), 20.0)
+        self.assertEqual(adaptive_timeout(50000, 60), 60)
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaApiCircuit(InfortisaCommon):
+    """Estado compartido (``infortisa.api.circuit``): apertura, sonda única y cierre."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._set_params(breaker_failures=2, breaker_cooldown=60)
+        cls.cr.execute("DELETE FROM infortisa_api_circuit")
+        cls.Circuit = cls.env["infortisa.api.circuit"]
+
+    def _fail(self, breaker, times=1):
+        for _i in range(times):
+            breaker.before_call()
+            breaker.record(False, 0, "HTTP 503")
+
+    def _circuit(self):
+        self.Circuit.invalidate_model()
+        return self.Circuit.search([("name", "=", "api")])
+
+    def _expire(self):
+        circuit = self._circuit()
+        circuit.write({"open_until": fields.Datetime.now() - timedelta(seconds=1)})
+        circuit.flush_recordset()
+
+    def test_opens_after_threshold(self):
+        breaker = self.Circuit._acquire()
+        self.assertFalse(breaker.probe)
+        self._fail(breaker, 2)
+        self.Circuit._report(breaker)
+        circuit = self._circuit()
+        self.assertEqual(circuit.state, "open")
+        self.assertEqual(circuit.consecutive_failures, 2)
+        self.assertEqual(circuit.last_error, "HTTP 503")
+        with self.assertRaises(InfortisaCircuitOpen):
+            self.Circuit._acquire()
+
+    def test_failures_add_up_across_workers(self):
+        first, second = self.Circuit._acquire(), self.Circuit._acquire()
+        self._fail(first)
+        self.Circuit._report(first)
+        self.assertEqual(self._circuit().state, "closed")
+        self._fail(second)
+        self.Circuit._report(second)
+        self.assertEqual(self._circuit().state, "open")
+
+    def test_single_probe_closes_on_success(self):
+        breaker = self.Circuit._acquire()
+        self._fail(breaker, 2)
+        self.Circuit._report(breaker)
+        self._expire()
+
+        probe = self.Circuit._acquire()
+        self.assertTrue(probe.probe)
+        self.assertEqual(self._circuit().state, "half_open")
+        # Mientras la sonda está en curso, el resto sigue viendo el circuito abierto
+        with self.assertRaises(InfortisaCircuitOpen):
+            self.Circuit._acquire()
+
+        probe.before_call()
+        probe.record(True, 100)
+        self.Circuit._report(probe)
+        circuit = self._circuit()
+        self.assertEqual(circuit.state, "closed")
+        self.assertEqual(circuit.consecutive_failures, 0)
+        self.assertFalse(self.Circuit._acquire().probe)
+
+    def test_unused_probe_is_released(self):
+        breaker = self.Circuit._acquire()
+        self._fail(breaker, 2)
+        self.Circuit._report(breaker)
+        self._expire()
+
+        probe = self.Circuit._acquire()
+        self.Circuit._report(probe)
+        self.assertEqual(self._circuit().state, "open")
+        self.assertTrue(self.Circuit._acquire().probe)
+
@@ -0,0 +1,93 @@
+# infortisa_orders/tests/test_infortisa_parser.py
+from odoo.tests import BaseCase, tagged
+from odoo.tools.misc import file_open
+
+from ..models.infortisa_parser import InfortisaParseError, customer_reference, parse_order_status
+
+
+def _fixture(name):
+    with file_open("infortisa_orders/benchmarks/fixtures/%s" % name) as fh:
+        return fh.read()
+
+
+MULTI_OPERATION = """<?xml version="1.0" encoding="utf-8"?>
+<OrderStatusResponse xmlns="http://schemas.datacontract.org/2004/07/BackEnd.Data.Npoco.Models">
+  <HasErrors>false</HasErrors>
+  <Operations>
+    <Operation>
+      <Code>VA/000001</Code>
+      <Status>Enviado</Status>
+      <Total>10.00</Total>
+    </Operation>
+    <Operation>
+      <Code>VA/000002</Code>
+      <Status>Anulado</Status>
+      <Total>20.00</Total>
+    </Operation>
+  </Operations>
+</OrderStatusResponse>
+"""
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaParser(BaseCase):
+
+    def test_malformed_xml_raises(self):
+        with self.assertRaises(InfortisaParseError):
+            parse_order_status(_fixture("status_malformed.xml"))
+
+    def test_empty_body(self):
+        for body in (None, "", "   "):
+            st = parse_order_status(body)
+            self.assertFalse(st.has_operation)
+            self.assertEqual(st.state, "Desconocido")
+
+    def test_state_of_order_text(self):
+        st = parse_order_status(_fixture("status_state_of_order.txt"))
+        self.assertFalse(st.has_operation)
+        self.assertEqual(st.state, "Importing")
+
+    def test_response_without_operation(self):
+        st = parse_order_status("<OrderStatusResponse><HasErrors>false</HasErrors><Operations/></OrderStatusResponse>")
+        self.assertFalse(st.has_operation)
+        self.assertEqual(st.state, "Desconocido")
+
+    def test_multi_operation_takes_first(self):
+        st = parse_order_status(MULTI_OPERATION)
+        self.assertTrue(st.has_operation)
+        self.assertEqual(st.code, "VA/000001")
+        self.assertEqual(st.state, "Enviado")
+        self.assertEqual(st.total, 10.0)
+
+    def test_importing_without_code(self):
+        st = parse_order_status(_fixture("status_importing.xml"))
+        self.assertEqual(st.state, "Importing")
+        self.assertEqual(st.code, "")
+        self.assertEqual(st.internal_ref, "")
+        self.assertEqual(len(st.products), 1)
+        self.assertAlmostEqual(st.base_products, 54.10)
+
+    def test_in_transit_products_and_canon(self):
+        st = parse_order_status(_fixture("status_in_transit.xml"))
+        self.assertTrue(st.tracking_number)
+        self.assertEqual([r.sku for r in st.products], ["INF-10001", "INF-20420", "INF-33017"])
+        self.assertAlmostEqual(st.canon_amount, 5.45)
+
+    def test_malformed_amount_raises(self):
+        body = MULTI_OPERATION.replace("<Total>10.00</Total>", "<Total>10,00 EUR</Total>")
+        with self.assertRaises(InfortisaParseError):
+            parse_order_status(body)
+
+    def test_decimal_comma_and_blank_amounts(self):
+        body = MULTI_OPERATION.replace("<Total>10.00</Total>", "<Total>10,50</Total><Tax> </Tax>")
+        st = parse_order_status(body)
+        self.assertEqual(st.total, 10.5)
+        self.assertEqual(st.tax, 0.0)
+
+    def test_customer_reference(self):
+        self.assertEqual(
+            customer_reference("<OrderStatusResponse><CustomerReference>S00042</CustomerReference></OrderStatusResponse>"),
+            "S00042",
+        )
+        self.assertEqual(customer_reference(_fixture("status_cancelled.xml")), "")
+        self.assertEqual(customer_reference(None), "")
@@ -0,0 +1,89 @@
+# infortisa_orders/tests/test_infortisa_ratelimit.py
+from odoo.tests import BaseCase, tagged
+
+from .common import InfortisaCommon
+from ..models.infortisa_ratelimit import LANE_BULK, LANE_INTERACTIVE, RateLimitedError, RateLimiter, grant, refill
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaRateLimit(BaseCase):
+
+    def test_refill_caps_at_capacity(self):
+        self.assertEqual(refill(2, 1.0, 3, 10), 5.0)
+        self.assertEqual(refill(8, 10.0, 3, 10), 10.0)
+        # Un reloj que retrocede no quita fichas
+        self.assertEqual(refill(4, -5.0, 3, 10), 4.0)
+
+    def test_grant_respects_floor(self):
+        self.assertEqual(grant(10, 4), 4)
+        self.assertEqual(grant(3.7, 10), 3)
+        self.assertEqual(grant(5, 4, floor=3), 2)
+        self.assertEqual(grant(2, 4, floor=3), 0)
+
+    def test_limiter_spends_prefetched_tokens(self):
+        calls = []
+
+        def take(lane, wanted):
+            calls.append((lane, wanted))
+            return wanted, 0.0
+
+        limiter = RateLimiter(take, lane=LANE_BULK, prefetch=3)
+        for _i in range(3):
+            limiter.acquire()
+        self.assertEqual(calls, [(LANE_BULK, 3)])
+        limiter.acquire()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(limiter.unused(), 2)
+        self.assertEqual(limiter.unused(), 0)
+
+    def test_limiter_gives_up_after_max_wait(self):
+        limiter = RateLimiter(lambda lane, wanted: (0, 1.0), lane=LANE_BULK, max_wait=0)
+        with self.assertRaises(RateLimitedError) as cm:
+            limiter.acquire()
+        self.assertEqual(cm.exception.lane, LANE_BULK)
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaRateBucket(InfortisaCommon):
+    """Cubo compartido (``infortisa.rate.bucket``): carriles y devolución de fichas."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._set_params(rate_limit_per_minute=60, rate_burst=5, rate_reserve=2)
+        cls.cr.execute("DELETE FROM infortisa_rate_bucket")
+        cls.Bucket = cls.env["infortisa.rate.bucket"]
+
+    def _tokens(self):
+        self.cr.execute("SELECT tokens FROM infortisa_rate_bucket WHERE name = 'api'")
+        return self.cr.fetchone()[0]
+
+    def test_no_limiter_without_rate(self):
+        self._set_params(rate_limit_per_minute=0)
+        self.assertIsNone(self.Bucket._limiter())
+
+    def test_bulk_lane_leaves_the_reserve(self):
+        bulk = self.Bucket._limiter(LANE_BULK, prefetch=10)
+        for _i in range(3):
+            bulk.acquire()
+        self.assertEqual(bulk.unused(), 0)
+        self.assertAlmostEqual(self._tokens(), 2, delta=0.5)
+        # Sin fichas por encima de la reserva el carril masivo no obtiene nada
+        granted, wait = bulk.take(LANE_BULK, 1)
+        self.assertEqual(granted, 0)
+        self.assertGreater(wait, 0)
+
+        interactive = self.Bucket._limiter(LANE_INTERACTIVE, prefetch=10)
+        interactive.acquire()
+        interactive.acquire()
+        self.assertLess(self._tokens(), 1)
+
+    def test_unused_tokens_are_given_back(self):
+        limiter = self.Bucket._limiter(LANE_INTERACTIVE, prefetch=4)
+        limiter.acquire()
+        self.assertAlmostEqual(self._tokens(), 1, delta=0.5)
+        self.Bucket._give_back(limiter)
+        self.assertAlmostEqual(self._tokens(), 4, delta=0.5)
+        # Las fichas sobrantes sólo se devuelven una vez
+        self.Bucket._give_back(limiter)
+        self.assertAlmostEqual(self._tokens(), 4, delta=0.5)
@@ -0,0 +1,67 @@
+# infortisa_orders/tests/test_poll_cron.py
+from contextlib import ExitStack
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .common import InfortisaCommon
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaPollCron(InfortisaCommon):
+    """Cron de estado por bloques: la fase HTTP/ORM de cada bloque se simula."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._set_params(poll_chunk_size=2, poll_batch_limit=500, poll_time_budget=300)
+        cls.orders = cls._create_orders(5)
+        cls.SaleOrder = cls.registry["sale.order"]
+
+    def _run_cron(self, chunk_effect=None):
+        """Ejecuta el cron y devuelve los bloques que consultó."""
+        chunks = []
+
+        def poll_chunk(chunk, max_workers=8, pay_ctx=None):
+            chunks.append(chunk)
+            if chunk_effect:
+                return chunk_effect(chunk)
+            # Como la consulta real: cada pedido procesado queda reprogramado
+            chunk._infortisa_reschedule_poll(changed=True)
+            return len(chunk), 0, 0
+
+        with ExitStack() as stack:
+            stack.enter_context(patch.object(self.SaleOrder, "_get_infortisa_headers", return_value={}))
+            stack.enter_context(patch.object(self.SaleOrder, "_infortisa_payment_context", return_value=None))
+            stack.enter_context(patch.object(
+                self.SaleOrder, "_infortisa_poll_chunk", autospec=True, side_effect=poll_chunk
+            ))
+            trigger = stack.enter_context(patch.object(self.registry["ir.cron"], "_trigger", autospec=True))
+            self.env["sale.order"].cron_infortisa_poll_status()
+        return chunks, trigger
+
+    def _due(self):
+        return self.env["sale.order"].search(self.env["sale.order"]._infortisa_due_poll_domain())
+
+    def test_polls_due_orders_in_chunks(self):
+        chunks, trigger = self._run_cron()
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(self.env["sale.order"].union(*chunks), self.orders)
+        self.assertFalse(self._due() & self.orders)
+        # Las reservas se sueltan al terminar cada bloque
+        self.assertFalse(any(self.orders.mapped("infortisa_poll_lease_until")))
+        trigger.assert_not_called()
+
+    def test_batch_limit_leaves_backlog(self):
+        self._set_params(poll_batch_limit=3)
+        chunks, trigger = self._run_cron()
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        self.assertEqual(len(self._due() & self.orders), 2)
+        # Quedan pedidos vencidos: el cron se vuelve a lanzar
+        trigger.assert_called()
+
+    def test_nothing_due(self):
+        self.orders.write({"infortisa_poll_tier": "stopped"})
+        chunks, trigger = self._run_cron()
+        self.assertEqual(chunks, [])
+        trigger.assert_not_called()
@@ -0,0 +1,93 @@
+# infortisa_orders/tests/test_poll_lease.py
+from datetime import timedelta
+
+from psycopg2 import IntegrityError
+
+from odoo import fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+from odoo.tools import mute_logger
+
+from .common import InfortisaCommon
+from ..models.sale_order import POLL_SHARD_CRONS
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaPollLease(InfortisaCommon):
+    """Reservas de los crons de estado en paralelo y de la consulta manual."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.orders = cls._create_orders(3)
+        cls.lease = timedelta(minutes=5)
+
+    def _lease(self, orders, delta):
+        orders.write({"infortisa_poll_lease_until": fields.Datetime.now() + delta})
+        orders.flush_recordset()
+
+    def test_claim_due_orders(self):
+        due, leased, later = self.orders
+        self._lease(leased, timedelta(minutes=1))
+        later.write({"infortisa_next_poll_at": fields.Datetime.now() + timedelta(hours=1)})
+        stopped = self._create_orders(infortisa_poll_tier="stopped")
+
+        claimed = self.env["sale.order"]._infortisa_claim_due_orders(10, self.lease)
+        self.assertEqual(claimed & (self.orders | stopped), due)
+        self.assertGreater(due.infortisa_poll_lease_until, fields.Datetime.now())
+        # Ya reservado: otro cron no lo vuelve a reclamar
+        self.assertFalse(self.env["sale.order"]._infortisa_claim_due_orders(10, self.lease) & self.orders)
+
+    def test_expired_lease_is_reclaimed(self):
+        self._lease(self.orders, -timedelta(minutes=1))
+        claimed = self.env["sale.order"]._infortisa_claim_due_orders(2, self.lease)
+        self.assertEqual(len(claimed & self.orders), 2)
+        claimed._infortisa_release_poll_lease()
+        self.assertFalse(any(claimed.mapped("infortisa_poll_lease_until")))
+
+    def test_claim_poll_lease_skips_leased(self):
+        free, leased, _other = self.orders
+        self._lease(leased, timedelta(minutes=1))
+        self.assertEqual((free | leased)._infortisa_claim_poll_lease(self.lease), free)
+        self.assertTrue(free.infortisa_poll_lease_until)
+        self.assertFalse((free | leased)._infortisa_claim_poll_lease(self.lease))
+
+    def test_manual_lock_rejects_leased_orders(self):
+        free, leased, _other = self.orders
+        with free._infortisa_manual_poll_lock():
+            pass
+        self._lease(leased, timedelta(minutes=1))
+        with self.assertRaisesRegex(UserError, leased.name):
+            with (free | leased)._infortisa_manual_poll_lock():
+                self.fail("La consulta manual no debe empezar con un pedido reservado por un cron")
+
+    def test_apply_poll_shards(self):
+        crons = [self.env.ref(xmlid) for xmlid in POLL_SHARD_CRONS]
+        self.env["sale.order"]._infortisa_apply_poll_shards(3)
+        self.assertEqual([cron.active for cron in crons], [True, True, False])
+        self.env["sale.order"]._infortisa_apply_poll_shards(1)
+        self.assertFalse(any(cron.active for cron in crons))
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaConsolidatedBillIndex(AccountTestInvoicingCommon):
+    """Sólo puede haber una factura consolidada abierta por periodo o por referencia."""
+
+    def _bill(self, mode, **vals):
+        return self.env["account.move"].create(dict({
+            "move_type": "in_invoice",
+            "partner_id": self.partner_a.id,
+            "journal_id": self.company_data["default_journal_purchase"].id,
+            "infortisa_consolidation": mode,
+        }, **vals))
+
+    def test_one_open_bill_per_period(self):
+        today = fields.Date.today()
+        self._bill("daily", infortisa_period_date=today)
+        self._bill("daily", infortisa_period_date=today - timedelta(days=1))
+        self._bill("transfer", infortisa_transfer_ref="VR/000123")
+        with self.assertRaises(IntegrityError), mute_logger("odoo.sql_db"), self.cr.savepoint():
+            self._bill("daily", infortisa_period_date=today)
+        with self.assertRaises(IntegrityError), mute_logger("odoo.sql_db"), self.cr.savepoint():
+            self._bill("transfer", infortisa_transfer_ref="VR/000123")
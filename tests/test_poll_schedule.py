@@ -0,0 +1,100 @@
+# infortisa_orders/tests/test_poll_schedule.py
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import InfortisaCommon
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaPollSchedule(InfortisaCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.order = cls._create_orders()
+
+    def assertPollIn(self, vals, minutes):
+        now = fields.Datetime.now()
+        self.assertGreaterEqual(vals["infortisa_next_poll_at"], now + timedelta(minutes=minutes) - timedelta(seconds=5))
+        self.assertLessEqual(vals["infortisa_next_poll_at"], now + timedelta(minutes=minutes) + timedelta(seconds=5))
+
+    def test_poll_tier(self):
+        order = self.order
+        cases = [
+            ({"infortisa_state": "Importing", "infortisa_op_code": ""}, "fast"),
+            ({"infortisa_state": "Pendiente", "infortisa_op_code": ""}, "fast"),
+            ({"infortisa_state": "Pendiente", "infortisa_op_code": "VA/000123"}, "normal"),
+            ({"infortisa_op_code": "VA/000123", "infortisa_tracking_number": "SE123"}, "transit"),
+            ({"infortisa_op_code": "VA/000123", "infortisa_payment_state": "exported"}, "transit"),
+            ({"infortisa_op_code": "VN/000123"}, "stopped"),
+            ({"infortisa_op_code": "VA/000123", "infortisa_tracking_status": "Entregado"}, "stopped"),
+            # Entregado pero pendiente de pagar la transferencia: se sigue consultando
+            ({"infortisa_op_code": "VR/000123", "infortisa_tracking_status": "ENTREGADO"}, "normal"),
+            (
+                {
+                    "infortisa_op_code": "VR/000123",
+                    "infortisa_tracking_status": "ENTREGADO",
+                    "infortisa_payment_state": "posted",
+                },
+                "stopped",
+            ),
+        ]
+        for pending, tier in cases:
+            with self.subTest(pending=pending):
+                self.assertEqual(order._infortisa_poll_tier_for(pending=pending), tier)
+
+    def test_poll_tier_pending_overrides_record(self):
+        self.order.write({"infortisa_state": "Enviado", "infortisa_op_code": "VA/000123"})
+        self.assertEqual(self.order._infortisa_poll_tier_for(), "normal")
+        self.assertEqual(self.order._infortisa_poll_tier_for(pending={"infortisa_op_code": "VN/000123"}), "stopped")
+
+    def test_backoff_without_changes(self):
+        order = self.order
+        order.write({"infortisa_state": "Enviado", "infortisa_op_code": "VA/000123", "infortisa_poll_tier": "fast"})
+        # Cambio de tier: se empieza por el intervalo base
+        vals = order._infortisa_poll_schedule_vals(changed=False)
+        self.assertEqual((vals["infortisa_poll_tier"], vals["infortisa_poll_misses"]), ("normal", 0))
+        self.assertPollIn(vals, 5)
+        order.write(vals)
+        vals = order._infortisa_poll_schedule_vals(changed=False)
+        self.assertEqual(vals["infortisa_poll_misses"], 1)
+        self.assertPollIn(vals, 10)
+        order.write(vals)
+        # Un cambio devuelve al intervalo base
+        vals = order._infortisa_poll_schedule_vals(changed=True)
+        self.assertEqual(vals["infortisa_poll_misses"], 0)
+        self.assertPollIn(vals, 5)
+
+    def test_backoff_is_capped(self):
+        self.order.write({
+            "infortisa_state": "Enviado", "infortisa_op_code": "VA/000123",
+            "infortisa_poll_tier": "normal", "infortisa_poll_misses": 40,
+        })
+        vals = self.order._infortisa_poll_schedule_vals(changed=False)
+        self.assertEqual(vals["infortisa_poll_misses"], 41)
+        self.assertPollIn(vals, 60)
+
+    def test_push_token_stretches_intervals(self):
+        self._set_params(push_token="secreto", push_poll_factor=3)
+        self.order.write({"infortisa_state": "Enviado", "infortisa_op_code": "VA/000123"})
+        self.assertPollIn(self.order._infortisa_poll_schedule_vals(changed=True), 15)
+
+    def test_stopped_orders_leave_the_schedule(self):
+        self.order.write({"infortisa_op_code": "VN/000123", "infortisa_poll_misses": 3})
+        vals = self.order._infortisa_poll_schedule_vals(changed=False)
+        self.assertEqual(vals, {"infortisa_poll_tier": "stopped", "infortisa_next_poll_at": False, "infortisa_poll_misses": 0})
+
+    def test_due_domain(self):
+        now = fields.Datetime.now()
+        due, later, stopped, unsent = self._create_orders(4)
+        due.infortisa_next_poll_at = now - timedelta(minutes=1)
+        later.infortisa_next_poll_at = now + timedelta(minutes=30)
+        stopped.write({"infortisa_poll_tier": "stopped", "infortisa_next_poll_at": now - timedelta(minutes=1)})
+        unsent.write({"infortisa_sent": False, "infortisa_next_poll_at": now - timedelta(minutes=1)})
+        found = self.env["sale.order"].search(self.order._infortisa_due_poll_domain())
+        self.assertIn(due, found)
+        self.assertNotIn(later, found)
+        self.assertNotIn(stopped, found)
+        self.assertNotIn(unsent, found)
@@ -0,0 +1,65 @@
+# infortisa_orders/tests/test_product_flags.py
+from odoo.tests import tagged
+
+from .common import InfortisaCommon
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaProductFlags(InfortisaCommon):
+    """``infortisa_product`` se mantiene desde las tarifas de proveedor y arrastra ``infortisa_allowed``."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.vendor = cls.env["res.partner"].create({"name": "Infortisa"})
+        cls.other_vendor = cls.env["res.partner"].create({"name": "Otro proveedor"})
+        cls._set_params(vendor_id=cls.vendor.id)
+        cls.product = cls.env["product.product"].create({"name": "SSD NVMe 1TB", "list_price": 80.0})
+        cls.template = cls.product.product_tmpl_id
+
+    def _order(self, **vals):
+        order = self.env["sale.order"].create({
+            "partner_id": self.customer.id,
+            "order_line": [(0, 0, {"product_id": self.product.id, "product_uom_qty": 1})],
+        })
+        if vals:
+            order.write(vals)
+        return order
+
+    def _supplierinfo(self, vendor):
+        return self.env["product.supplierinfo"].create({"partner_id": vendor.id, "product_tmpl_id": self.template.id})
+
+    def test_supplierinfo_sets_and_clears_flag(self):
+        self.assertFalse(self.template.infortisa_product)
+        other = self._supplierinfo(self.other_vendor)
+        self.assertFalse(self.template.infortisa_product)
+        info = self._supplierinfo(self.vendor)
+        self.assertTrue(self.template.infortisa_product)
+        self.assertTrue(self.product.infortisa_product)
+        info.unlink()
+        self.assertFalse(self.template.infortisa_product)
+        # Cambiar el proveedor de una tarifa también cuenta
+        other.partner_id = self.vendor
+        self.assertTrue(self.template.infortisa_product)
+
+    def test_only_open_unsent_orders_are_recomputed(self):
+        draft = self._order()
+        sent = self._order(infortisa_sent=True)
+        cancelled = self._order(state="cancel")
+        self.assertFalse((draft | sent | cancelled).filtered("infortisa_allowed"))
+        self._supplierinfo(self.vendor)
+        self.assertTrue(draft.infortisa_allowed)
+        self.assertFalse(sent.infortisa_allowed)
+        self.assertFalse(cancelled.infortisa_allowed)
+
+    def test_full_refresh_after_vendor_change(self):
+        self._supplierinfo(self.other_vendor)
+        order = self._order()
+        self.assertFalse(order.infortisa_allowed)
+        self._set_params(vendor_id=self.other_vendor.id)
+        changed = self.env["product.template"]._infortisa_refresh_product_flags()
+        self.assertIn(self.template.id, changed)
+        self.assertTrue(self.template.infortisa_product)
+        self.assertTrue(order.infortisa_allowed)
+        # Nada que cambiar la segunda vez
+        self.assertNotIn(self.template.id, self.env["product.template"]._infortisa_refresh_product_flags())
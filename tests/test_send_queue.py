@@ -0,0 +1,142 @@
+# infortisa_orders/tests/test_send_queue.py
+from datetime import timedelta
+from unittest.mock import patch
+
+import requests
+
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import InfortisaCommon, api_response, fixture
+from ..models.infortisa_breaker import CircuitOpenError
+from ..models.sale_order import InfortisaSendError
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaSendQueue(InfortisaCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._set_params(send_max_attempts=3)
+        cls.order = cls._create_orders(sent=False)
+        cls.entry = cls.env["infortisa.send.queue"].create({"order_id": cls.order.id})
+        cls.SaleOrder = cls.registry["sale.order"]
+
+    def _process(self, send_effect=None, recovered=False):
+        """``_process_one`` con el envío y la recuperación simulados (sin llamadas a la API)."""
+        with patch.object(self.SaleOrder, "action_infortisa_send", side_effect=send_effect) as send, \
+                patch.object(self.SaleOrder, "_infortisa_recover_sent", return_value=recovered) as recover:
+            result = self.entry._process_one()
+        return result, send, recover
+
+    def test_success(self):
+        result, send, recover = self._process()
+        self.assertTrue(result)
+        send.assert_called_once_with(block=None, test=None)
+        recover.assert_not_called()
+        self.assertEqual(self.entry.state, "done")
+        self.assertEqual(self.entry.attempt_count, 1)
+        self.assertTrue(self.entry.attempt_ids.success)
+
+    def test_retryable_error_backs_off(self):
+        before = fields.Datetime.now()
+        result, _send, _recover = self._process(InfortisaSendError("HTTP 503", retryable=True))
+        self.assertFalse(result)
+        self.assertEqual(self.entry.state, "pending")
+        self.assertEqual(self.entry.attempt_count, 1)
+        self.assertEqual(self.entry.last_error, "HTTP 503")
+        self.assertGreaterEqual(self.entry.next_attempt_at, before + timedelta(minutes=1))
+        self.assertFalse(self.entry.attempt_ids.success)
+
+        # Segundo fallo de red: el intervalo se duplica
+        before = fields.Datetime.now()
+        self._process(requests.ConnectionError("connection reset"))
+        self.assertEqual(self.entry.state, "pending")
+        self.assertEqual(self.entry.attempt_count, 2)
+        self.assertGreaterEqual(self.entry.next_attempt_at, before + timedelta(minutes=2))
+        self.assertEqual(len(self.entry.attempt_ids), 2)
+
+    def test_backoff_minutes(self):
+        Queue = self.env["infortisa.send.queue"]
+        self.assertEqual([Queue._backoff_minutes(n) for n in (1, 2, 3, 4)], [1, 2, 4, 8])
+        self.assertEqual(Queue._backoff_minutes(30), 24 * 60)
+
+    def test_dead_after_max_attempts(self):
+        self.entry.write({"attempt_count": 2})
+        _result, send, recover = self._process(requests.Timeout("read timeout"))
+        recover.assert_called_once()
+        send.assert_called_once()
+        self.assertEqual(self.entry.state, "dead")
+        self.assertEqual(self.entry.attempt_count, 3)
+        self.assertIn("abandonado tras 3 intentos", self.order.message_ids[:1].body)
+
+    def test_non_retryable_error_is_dead_letter(self):
+        for error in (UserError("Falta la dirección de entrega"), InfortisaSendError("HasErrors", retryable=False)):
+            with self.subTest(error=error):
+                self.entry.write({"state": "pending", "attempt_count": 0})
+                self._process(error)
+                self.assertEqual(self.entry.state, "dead")
+                self.assertEqual(self.entry.attempt_count, 1)
+                self.assertIn("no se reintenta", self.order.message_ids[:1].body)
+
+    def test_recovered_order_is_not_resent(self):
+        self.entry.write({"attempt_count": 1})
+        result, send, recover = self._process(recovered=True)
+        self.assertTrue(result)
+        recover.assert_called_once()
+        send.assert_not_called()
+        self.assertEqual(self.entry.state, "done")
+
+    def test_circuit_open_does_not_count(self):
+        with self.assertRaises(CircuitOpenError):
+            self._process(CircuitOpenError())
+        self.assertEqual(self.entry.state, "pending")
+        self.assertEqual(self.entry.attempt_count, 0)
+        self.assertFalse(self.entry.attempt_ids)
+
+@tagged("post_install", "-at_install")
+class TestInfortisaRecoverSent(InfortisaCommon):
+    """Antes de reenviar, ``_infortisa_recover_sent`` pregunta a Infortisa por el pedido."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.order = cls._create_orders(sent=False)
+
+    def _recover(self, response):
+        patcher, client = self._patch_api(response)
+        with patcher:
+            result = self.order._infortisa_recover_sent()
+        client.get.assert_called_once_with(
+            "/api/order/status", params={"CustomerReference": self.order.infortisa_customer_ref}
+        )
+        return result
+
+    def test_absent_order_is_sent_again(self):
+        responses = (
+            api_response(404, "Order not found"),
+            api_response(200, ""),
+            api_response(200, "<string>State of Order: Not found</string>"),
+            api_response(200, "<string>State of Order: Pedido no encontrado</string>"),
+        )
+        for response in responses:
+            with self.subTest(status=response.status_code, body=response.text):
+                self.assertFalse(self._recover(response))
+                self.assertFalse(self.order.infortisa_sent)
+
+    def test_unreachable_status_is_retried(self):
+        with self.assertRaises(InfortisaSendError) as cm:
+            self._recover(api_response(503, "Service Unavailable"))
+        self.assertTrue(cm.exception.retryable)
+        self.assertFalse(self.order.infortisa_sent)
+
+    def test_existing_order_is_recovered(self):
+        for count, name in enumerate(("status_state_of_order.txt", "status_in_transit.xml"), 1):
+            with self.subTest(fixture=name):
+                self.order.infortisa_sent = False
+                self.assertTrue(self._recover(api_response(200, fixture(name))))
+                self.assertTrue(self.order.infortisa_sent)
+                notes = self.order.message_ids.filtered(lambda m: "ya estaba en Infortisa" in (m.body or ""))
+                self.assertEqual(len(notes), count)
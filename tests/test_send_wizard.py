@@ -0,0 +1,97 @@
+# infortisa_orders/tests/test_send_wizard.py
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import requests
+
+from odoo.tests import tagged
+
+from .common import InfortisaCommon
+from ..models.infortisa_breaker import CircuitOpenError
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaSendWizard(InfortisaCommon):
+    """Envío masivo: cada pedido pasa por su entrada de la cola de envío."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._set_params(send_max_attempts=3)
+        cls.orders = cls._create_orders(2, sent=False)
+        cls.Queue = cls.env["infortisa.send.queue"]
+        cls.SaleOrder = cls.registry["sale.order"]
+
+    def _send(self, posted, recovered=False):
+        """``action_send`` con el XML, el POST y su respuesta simulados. Devuelve ``(wizard, post)``."""
+        wizard = self.env["infortisa.send.wizard"].create({"order_ids": [(6, 0, self.orders.ids)], "max_workers": 2})
+        with ExitStack() as stack:
+            stack.enter_context(patch.object(self.SaleOrder, "_get_infortisa_headers", return_value={}))
+            stack.enter_context(patch.object(self.SaleOrder, "_infortisa_build_order_payload", return_value="<Order/>"))
+            stack.enter_context(patch.object(self.SaleOrder, "_infortisa_apply_send_response", return_value="INT-1"))
+            stack.enter_context(patch.object(self.SaleOrder, "_infortisa_recover_sent", return_value=recovered))
+            post = stack.enter_context(patch.object(
+                self.SaleOrder, "_infortisa_post_orders_many",
+                side_effect=lambda payloads, max_workers=8: {oid: posted[oid] for oid in payloads},
+            ))
+            wizard.action_send()
+        return wizard, post
+
+    def _entry(self, order):
+        return self.Queue.search([("order_id", "=", order.id)])
+
+    def test_results_are_recorded_as_attempts(self):
+        ok, failed = self.orders
+        wizard, _post = self._send({
+            ok.id: (200, "<OrderResponse/>", None, 40),
+            failed.id: (None, None, requests.ConnectionError("connection reset"), 30),
+        })
+        self.assertEqual((wizard.sent_count, wizard.failed_count), (1, 1))
+        self.assertEqual(self._entry(ok).state, "done")
+        self.assertEqual(self._entry(ok).attempt_count, 1)
+        entry = self._entry(failed)
+        self.assertEqual(entry.state, "pending")
+        self.assertEqual(entry.attempt_count, 1)
+        self.assertEqual(entry.last_error, "connection reset")
+        self.assertFalse(entry.attempt_ids.success)
+
+    def test_circuit_open_is_not_an_attempt(self):
+        posted = {order.id: (None, None, CircuitOpenError(), 0) for order in self.orders}
+        wizard, _post = self._send(posted)
+        self.assertEqual(wizard.failed_count, 2)
+        for order in self.orders:
+            self.assertEqual(self._entry(order).state, "pending")
+            self.assertEqual(self._entry(order).attempt_count, 0)
+
+    def test_previous_attempt_is_recovered_not_resent(self):
+        first, second = self.orders
+        self.Queue.create({"order_id": first.id, "attempt_count": 1})
+        wizard, post = self._send({second.id: (200, "<OrderResponse/>", None, 40)}, recovered=True)
+        self.assertEqual(list(post.call_args.args[0]), [second.id])
+        self.assertEqual(wizard.sent_count, 2)
+        self.assertEqual(self._entry(first).state, "done")
+        self.assertEqual(self._entry(first).attempt_count, 2)
+
+    def test_busy_entries_are_skipped(self):
+        first, second = self.orders
+        entries = self.Queue.create([{"order_id": first.id}])
+        with patch.object(self.registry["infortisa.send.queue"], "_claim_orders", return_value=(entries, second)):
+            wizard, post = self._send({first.id: (200, "<OrderResponse/>", None, 40)})
+        self.assertEqual(list(post.call_args.args[0]), [first.id])
+        line = wizard.line_ids.filtered(lambda l: l.order_id == second)
+        self.assertEqual(line.result, "skipped")
+        self.assertIn("cola de envío", line.error)
+
+    def test_claim_orders_creates_missing_entries(self):
+        existing = self.Queue.create({"order_id": self.orders[0].id})
+        entries, busy = self.Queue._claim_orders(self.orders)
+        self.assertEqual(entries.order_id, self.orders)
+        self.assertIn(existing, entries)
+        self.assertFalse(busy)
+
+    def test_lock_pending_only_pending_entries(self):
+        entry = self.Queue.create({"order_id": self.orders[0].id})
+        self.assertTrue(entry._lock_pending())
+        entry.write({"state": "done"})
+        entry.flush_recordset()
+        self.assertFalse(entry._lock_pending())
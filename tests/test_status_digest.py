@@ -0,0 +1,49 @@
+# infortisa_orders/tests/test_status_digest.py
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .common import InfortisaCommon, fixture
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaStatusDigest(InfortisaCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.order = cls._create_orders()
+
+    def test_volatile_tags_do_not_change_the_digest(self):
+        Order = self.env["sale.order"]
+        body = fixture("status_in_transit.xml")
+        later = body.replace("2026-10-02T08:30:12", "2026-10-02T09:45:00")
+        self.assertNotEqual(body, later)
+        self.assertEqual(Order._infortisa_status_digest(body), Order._infortisa_status_digest(later))
+        changed = body.replace("<Status>Enviado</Status>", "<Status>Entregado</Status>")
+        self.assertNotEqual(Order._infortisa_status_digest(body), Order._infortisa_status_digest(changed))
+
+    def test_unchanged_response_is_skipped(self):
+        order = self.order.with_context(infortisa_from_cron=True, infortisa_defer_billing=True)
+        body = fixture("status_pending_transfer.xml")
+        self.assertTrue(order._infortisa_apply_status_response(200, body))
+        messages = len(self.order.message_ids)
+        self.assertFalse(order._infortisa_apply_status_response(200, body))
+        self.assertEqual(len(self.order.message_ids), messages)
+        self.assertEqual(self.order.infortisa_poll_skipped_count, 1)
+
+    def test_unchanged_blocked_order_gets_no_chatter(self):
+        body = fixture("status_cancelled.xml")
+        fetched = {self.order.id: (200, body, None, 12)}
+        SaleOrder = self.registry["sale.order"]
+        with patch.object(SaleOrder, "_auto_make_payment_if_ready", autospec=True) as pay:
+            processed, skipped, errors = self.order._infortisa_apply_status_many(fetched)
+            self.assertEqual((processed, skipped, errors), (1, 0, {}))
+            self.assertEqual(pay.call_args.args[0], self.order)
+            messages = len(self.order.message_ids)
+
+            processed, skipped, errors = self.order._infortisa_apply_status_many(fetched)
+            self.assertEqual((processed, skipped, errors), (0, 1, {}))
+            # Sin respuesta nueva no se pasa por facturas/pagos (ni su nota de "no pagadero")
+            self.assertFalse(pay.call_args.args[0])
+        self.assertEqual(len(self.order.message_ids), messages)
@@ -0,0 +1,151 @@
+# infortisa_orders/tests/test_status_push.py
+import codecs
+import io
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import BaseCase, HttpCase, tagged
+
+from .common import InfortisaCommon, fixture
+from ..controllers.main import _decode_body, _read_limited
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaPushHelpers(BaseCase):
+
+    def test_read_limited_stops_past_limit(self):
+        self.assertEqual(_read_limited(io.BytesIO(b"abc"), 10), b"abc")
+        self.assertEqual(_read_limited(io.BytesIO(b"x" * 100), 10), b"x" * 11)
+
+    def test_decode_body(self):
+        text = "<OrderStatusResponse>Envío</OrderStatusResponse>"
+        self.assertEqual(_decode_body(codecs.BOM_UTF16_LE + text.encode("utf-16-le")), text)
+        self.assertEqual(_decode_body(codecs.BOM_UTF8 + text.encode("utf-8")), text)
+        self.assertEqual(_decode_body(text.encode("latin-1"), "iso-8859-1"), text)
+        # Charset desconocido o mal declarado: no falla
+        self.assertEqual(_decode_body(text.encode("latin-1"), "utf-8"), text)
+        self.assertEqual(_decode_body(b"<OrderStatusResponse/>", "no-existe"), "<OrderStatusResponse/>")
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaStatusInbox(InfortisaCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.order = cls._create_orders()
+        cls.Inbox = cls.env["infortisa.status.inbox"]
+        cls.ref = cls.order.infortisa_customer_ref
+
+    def _process(self, errors=None):
+        """Ejecuta el cron de notificaciones con la fase ORM simulada; devuelve lo que recibió."""
+        calls = []
+
+        def apply_many(orders, fetched, pay_ctx=None, traces=None, source="cron"):
+            calls.append((orders, fetched, source))
+            failed = {oid: errors[oid] for oid in fetched if errors and oid in errors}
+            return len(fetched) - len(failed), 0, failed
+
+        SaleOrder = self.registry["sale.order"]
+        with patch.object(SaleOrder, "_infortisa_payment_context", return_value=None), \
+                patch.object(SaleOrder, "_infortisa_apply_status_many", autospec=True, side_effect=apply_many):
+            self.Inbox.cron_infortisa_process_status_inbox()
+        return calls
+
+    def test_receive_only_sent_orders(self):
+        unsent = self._create_orders(sent=False)
+        self.assertIsNone(self.Inbox._receive("NO-EXISTE", "<OrderStatusResponse/>"))
+        self.assertIsNone(self.Inbox._receive(unsent.infortisa_customer_ref, "<OrderStatusResponse/>"))
+        entry = self.Inbox._receive(self.ref, "<OrderStatusResponse/>", "corr-1")
+        self.assertEqual(entry.order_id, self.order)
+        self.assertEqual((entry.state, entry.correlation_id), ("pending", "corr-1"))
+
+    def test_latest_notification_wins(self):
+        older = self.Inbox._receive(self.ref, fixture("status_importing.xml"))
+        latest = self.Inbox._receive(self.ref, fixture("status_in_transit.xml"))
+        calls = self._process()
+        self.assertEqual(len(calls), 1)
+        orders, fetched, source = calls[0]
+        self.assertEqual((orders, source), (self.order, "push"))
+        self.assertEqual(fetched, {self.order.id: (200, fixture("status_in_transit.xml"), None, 0)})
+        self.assertEqual((older.state, latest.state), ("superseded", "done"))
+        self.assertFalse(older.body or latest.body)
+        self.assertFalse(self.order.infortisa_poll_lease_until)
+
+    def test_error_is_kept(self):
+        entry = self.Inbox._receive(self.ref, fixture("status_in_transit.xml"))
+        self._process(errors={self.order.id: ValueError("XML roto")})
+        self.assertEqual((entry.state, entry.error), ("error", "XML roto"))
+        self.assertTrue(entry.body)
+
+    def test_order_leased_by_a_cron_stays_pending(self):
+        entry = self.Inbox._receive(self.ref, fixture("status_in_transit.xml"))
+        self.order.write({"infortisa_poll_lease_until": fields.Datetime.now() + timedelta(minutes=5)})
+        self.order.flush_recordset()
+        with patch.object(self.registry["infortisa.status.inbox"], "_trigger_process") as trigger:
+            calls = self._process()
+        self.assertFalse(calls)
+        self.assertEqual(entry.state, "pending")
+        self.assertTrue(trigger.call_args.kwargs.get("at"))
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaStatusController(HttpCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env["ir.config_parameter"].sudo().set_param("infortisa.push_token", "s3cr3t")
+        partner = cls.env["res.partner"].create({"name": "Cliente Infortisa"})
+        cls.order = cls.env["sale.order"].create({"partner_id": partner.id})
+        cls.ref = cls.order.name.replace("/", "")
+        cls.order.write({"infortisa_allowed": True, "infortisa_sent": True, "infortisa_customer_ref": cls.ref})
+        cls.body = fixture("status_in_transit.xml")
+
+    def _post(self, body=None, ref=None, token="s3cr3t"):
+        url = "/infortisa/status"
+        if ref is not None:
+            url += "?CustomerReference=%s" % ref
+        headers = {"Content-Type": "application/xml", "X-Correlation-ID": "corr-push"}
+        if token:
+            headers["Authorization"] = "Bearer %s" % token
+        return self.url_open(url, data=(self.body if body is None else body).encode("utf-8"), headers=headers)
+
+    def _entries(self):
+        return self.env["infortisa.status.inbox"].search([("order_id", "=", self.order.id)])
+
+    def test_accepted(self):
+        response = self._post(ref=self.ref)
+        self.assertEqual(response.status_code, 202)
+        entry = self._entries()
+        self.assertEqual((entry.state, entry.correlation_id), ("pending", "corr-push"))
+        self.assertEqual(entry.body, self.body)
+
+    def test_rejected(self):
+        body_with_ref = self.body.replace(
+            "<Operations>", "<CustomerReference>%s</CustomerReference><Operations>" % self.ref, 1
+        )
+        cases = [
+            (dict(ref=self.ref, token="otro"), 401),
+            (dict(ref=self.ref, token=None), 401),
+            (dict(ref=self.ref, body="no es XML"), 400),
+            (dict(body=self.body), 400),
+            (dict(ref="OTRA", body=body_with_ref), 400),
+            (dict(ref="NO-EXISTE"), 404),
+        ]
+        for kwargs, status in cases:
+            with self.subTest(**kwargs):
+                self.assertEqual(self._post(**kwargs).status_code, status)
+        self.assertFalse(self._entries())
+        # La referencia también puede venir sólo en el XML
+        self.assertEqual(self._post(body=body_with_ref).status_code, 202)
+
+    def test_payload_too_large(self):
+        with patch("odoo.addons.infortisa_orders.controllers.main.PUSH_MAX_BYTES", 100):
+            self.assertEqual(self._post(ref=self.ref).status_code, 413)
+        self.assertFalse(self._entries())
+
+    def test_disabled_without_token(self):
+        self.env["ir.config_parameter"].sudo().set_param("infortisa.push_token", "")
+        self.assertEqual(self._post(ref=self.ref).status_code, 404)
@@ -0,0 +1,75 @@
+# infortisa_orders/tests/test_tracking_outbox.py
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import InfortisaCommon
+from ..models.tracking_outbox import MAX_ATTEMPTS
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaTrackingOutbox(InfortisaCommon):
+    """Cola de emails de seguimiento: reintentos con espera creciente y resumen por cliente."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.customer.email = "cliente@example.com"
+        cls.orders = cls._create_orders(2)
+        cls.Outbox = cls.env["infortisa.tracking.outbox"]
+
+    def _enqueue(self, order, number="TRK1"):
+        return self.Outbox._enqueue(order, "https://tracking.example.com/%s" % number, number=number, agent="SEUR")
+
+    def _send(self, error=None):
+        """Ejecuta el cron con el envío de la plantilla simulado; devuelve los ids enviados."""
+        effect = ValueError(error) if error else None
+        with patch.object(self.registry["mail.template"], "send_mail_batch", autospec=True, side_effect=effect) as send:
+            self.Outbox.cron_infortisa_send_tracking()
+        return send.call_args.args[1] if send.called else None
+
+    def test_enqueue_replaces_pending_entry(self):
+        entry = self._enqueue(self.orders[0])
+        self.assertEqual(self._enqueue(self.orders[0], "TRK2"), entry)
+        self.assertEqual(entry.tracking_number, "TRK2")
+
+    def test_failure_backs_off_then_gives_up(self):
+        entry = self._enqueue(self.orders[0])
+        for attempts, minutes in ((1, 10), (2, 20), (3, 40)):
+            before = fields.Datetime.now()
+            entry._record_failure("SMTP caído")
+            self.assertEqual((entry.state, entry.attempt_count), ("pending", attempts))
+            self.assertGreaterEqual(entry.next_attempt_at, before + timedelta(minutes=minutes))
+            self.assertLess(entry.next_attempt_at, before + timedelta(minutes=minutes + 1))
+        entry.attempt_count = MAX_ATTEMPTS - 1
+        entry._record_failure("SMTP caído")
+        self.assertEqual(entry.state, "error")
+        self.assertIn("tras %s intentos" % MAX_ATTEMPTS, self.orders[0].message_ids[:1].body)
+
+    def test_cron_sends_only_due_entries(self):
+        due = self._enqueue(self.orders[0])
+        waiting = self._enqueue(self.orders[1])
+        waiting.next_attempt_at = fields.Datetime.now() + timedelta(minutes=10)
+        self.assertEqual(self._send(), due.ids)
+        self.assertEqual((due.state, waiting.state), ("sent", "pending"))
+        self.assertTrue(due.sent_at)
+
+    def test_cron_failure_keeps_entries_pending(self):
+        entry = self._enqueue(self.orders[0])
+        self._send(error="Plantilla rota")
+        self.assertEqual((entry.state, entry.attempt_count), ("pending", 1))
+        self.assertEqual(entry.error, "Plantilla rota")
+        self.assertGreater(entry.next_attempt_at, fields.Datetime.now())
+        # Hasta que venza la espera no se vuelve a intentar
+        self.assertIsNone(self._send())
+
+    def test_digest_groups_entries_by_customer(self):
+        self._set_params(tracking_digest=True)
+        first = self._enqueue(self.orders[0])
+        second = self._enqueue(self.orders[1], "TRK2")
+        self.assertEqual(self._send(), first.ids)
+        self.assertEqual(second.digest_parent_id, first)
+        self.assertEqual(first.digest_entry_ids, first | second)
+        self.assertEqual(set((first | second).mapped("state")), {"sent"})
@@ -0,0 +1,70 @@
+# infortisa_orders/tests/test_vendor_bills.py
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .common import InfortisaBillingCommon
+
+
+@tagged("post_install", "-at_install")
+class TestInfortisaVendorBills(InfortisaBillingCommon):
+    """Una factura de proveedor por pedido (modo ``order``), creadas y contabilizadas en bloque."""
+
+    def _count_calls(self, model, method):
+        """Patcher que cuenta las llamadas a ``model.method`` sin cambiar su comportamiento."""
+        cls = self.registry[model]
+        return patch.object(cls, method, autospec=True, side_effect=getattr(cls, method))
+
+    def test_one_bill_per_order_in_one_create(self):
+        orders = self._create_billable_orders([(100.0, 5.0), (200.0, 0.0), (0.0, 0.0)])
+        with self._count_calls("account.move", "create") as create:
+            bills = orders._infortisa_create_bills()
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(len(bills), 2)
+        billed, other, empty = orders
+        self.assertEqual(billed.infortisa_vendor_bill_id.amount_untaxed, 105.0)
+        self.assertEqual(len(billed.infortisa_vendor_bill_id.invoice_line_ids), 2)
+        self.assertEqual(other.infortisa_vendor_bill_id.amount_untaxed, 200.0)
+        # Sin importes del API no hay factura
+        self.assertFalse(empty.infortisa_vendor_bill_id)
+        for bill in bills:
+            self.assertEqual((bill.partner_id, bill.journal_id), (self.vendor, self.purchase_journal))
+            self.assertEqual(bill.payment_reference, "VR/000123")
+            self.assertEqual(bill.state, "draft")
+        # Ya facturados: no se duplica
+        self.assertFalse(orders._infortisa_create_bills())
+
+    def test_safe_falls_back_to_one_order_at_a_time(self):
+        orders = self._create_billable_orders([(100.0, 0.0), (50.0, 0.0), (75.0, 0.0)])
+        broken = orders[1]
+        original = self.registry["sale.order"]._infortisa_prepare_bill_vals
+
+        def prepare(order, partner, journal, cfg):
+            if order == broken:
+                raise ValueError("Importe imposible")
+            return original(order, partner, journal, cfg)
+
+        with patch.object(self.registry["sale.order"], "_infortisa_prepare_bill_vals", autospec=True, side_effect=prepare):
+            bills = orders._infortisa_create_bills_safe()
+        self.assertEqual(bills, (orders - broken).infortisa_vendor_bill_id)
+        self.assertEqual(len(bills), 2)
+        self.assertFalse(broken.infortisa_vendor_bill_id)
+        self.assertIn("Importe imposible", broken.message_ids[:1].body)
+
+    def test_ready_orders_are_billed_and_posted_together(self):
+        self._set_params(auto_create_bill=True)
+        orders = self._create_billable_orders([(100.0, 5.0), (200.0, 0.0)])
+        blocked = self._create_billable_orders([(300.0, 0.0)], transfer_ref=False)
+        blocked.infortisa_op_code = "VN/000999"
+        SaleOrder = self.registry["sale.order"]
+        with self._count_calls("account.move", "action_post") as post, \
+                patch.object(SaleOrder, "_create_vendor_payment_and_xml", autospec=True) as pay:
+            (orders | blocked)._auto_make_payment_if_ready(pay_ctx="ctx")
+        bills = orders.infortisa_vendor_bill_id
+        self.assertEqual(len(bills), 2)
+        self.assertEqual(set(bills.mapped("state")), {"posted"})
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(post.call_args.args[0], bills)
+        self.assertEqual({call.args[0] for call in pay.call_args_list}, set(orders))
+        self.assertFalse(blocked.infortisa_vendor_bill_id)
+        self.assertEqual(blocked.infortisa_payment_state, "missing")